@@ -0,0 +1,113 @@
+"""
+Hot/cold split for chat history.
+
+`archive_before` moves old rows from Message into ArchivedMessage in small
+transactions. `ConversationHistory` reads both tables as one oldest-first
+sequence, which works because archived rows are always older than the
+rows still in Message.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ArchivedMessage, Message
+
+ARCHIVE_FIELDS = ('id', 'sender_id', 'receiver_id', 'room_id', 'content', 'timestamp', 'is_read')
+
+
+def archive_before(cutoff, batch_size=5000, dry_run=False, log=None):
+    """Move messages with timestamp < cutoff to the archive; returns rows moved."""
+    log = log or (lambda msg: None)
+    pending = Message.objects.filter(timestamp__lt=cutoff)
+    if dry_run:
+        return pending.count()
+
+    moved = 0
+    while True:
+        # One short transaction per chunk keeps locks and WAL bursts small
+        with transaction.atomic():
+            rows = list(pending.order_by('id').values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            ArchivedMessage.objects.bulk_create([ArchivedMessage(**row) for row in rows], ignore_conflicts=True)
+            Message.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+        log(f"archived {moved} messages (up to id {rows[-1]['id']})")
+    return moved
+
+
+class ConversationHistory:
+    """
+    Oldest-first rows of one conversation across the cold and hot tables.
+    Supports count() and slicing, so LimitOffsetPagination pages straight
+    across the boundary.
+    """
+
+    def __init__(self, cold, hot, fields):
+        self.cold = cold.order_by('timestamp', 'id').values(*fields)
+        self.hot = hot.order_by('timestamp', 'id').values(*fields)
+        self._cold_count = None
+
+    @classmethod
+    def between(cls, user_id, other_id, fields):
+        return cls(ArchivedMessage.objects.between(user_id, other_id),
+                   Message.objects.between(user_id, other_id), fields)
+
+    @classmethod
+    def in_room(cls, room_id, fields):
+        return cls(ArchivedMessage.objects.in_room(room_id), Message.objects.in_room(room_id), fields)
+
+    def cold_count(self):
+        if self._cold_count is None:
+            self._cold_count = self.cold.count()
+        return self._cold_count
+
+    def count(self):
+        return self.cold_count() + self.hot.count()
+
+    def position(self, message_id):
+        """Zero-based offset of a message in this conversation, or None if it isn't part of it."""
+        for table in (self.hot, self.cold):
+            found = table.filter(id=message_id).values_list('timestamp', flat=True).first()
+            if found is not None:
+                before = Q(timestamp__lt=found) | Q(timestamp=found, id__lt=message_id)
+                return self.cold.filter(before).count() + self.hot.filter(before).count()
+        return None
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None or key.stop is None:
+            raise TypeError("ConversationHistory only supports [start:stop] slices")
+        start, stop = key.start or 0, key.stop
+        boundary = self.cold_count()
+        rows = []
+        if start < boundary:
+            rows.extend(self.cold[start:min(stop, boundary)])
+        if stop > boundary:
+            rows.extend(self.hot[max(start - boundary, 0):stop - boundary])
+        return rows
+
+    # Async counterparts for the async history view; same queries as above
+
+    async def acold_count(self):
+        if self._cold_count is None:
+            self._cold_count = await self.cold.acount()
+        return self._cold_count
+
+    async def acount(self):
+        return await self.acold_count() + await self.hot.acount()
+
+    async def aposition(self, message_id):
+        for table in (self.hot, self.cold):
+            found = await table.filter(id=message_id).values_list('timestamp', flat=True).afirst()
+            if found is not None:
+                before = Q(timestamp__lt=found) | Q(timestamp=found, id__lt=message_id)
+                return await self.cold.filter(before).acount() + await self.hot.filter(before).acount()
+        return None
+
+    async def aslice(self, start, stop):
+        boundary = await self.acold_count()
+        rows = []
+        if start < boundary:
+            rows.extend([row async for row in self.cold[start:min(stop, boundary)].aiterator()])
+        if stop > boundary:
+            rows.extend([row async for row in self.hot[max(start - boundary, 0):stop - boundary].aiterator()])
+        return rows
@@ -1,19 +1,45 @@
-import json
+import asyncio
+import logging
+import time
 from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 from rest_framework_simplejwt.tokens import AccessToken
-from .models import Message
+from core import ratelimit
+from core.db_routers import pin_to_primary
+from users.cache import user_cache
+from .models import Message, RoomMembership
+from . import metrics, presence, protocol, rooms
+from .fast import MESSAGE_VALUES, serialize_messages
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    metrics_label = 'chat'
+    # Frame types that need more than their `type` key
+    frames_with_body = {'message', 'presence_subscribe', 'read'}
+
     async def connect(self):
+        self.accepted = False
+        self.presence_groups = set()
+        self.presence_buffer = {}
+        self.presence_flush = None
+        self.dropped_frames = 0
+        client = self.scope.get('client')
+        forwarded_for = dict(self.scope.get('headers', ())).get(b'x-forwarded-for')
+        self.client_ip = ratelimit.client_ip(forwarded_for.decode('latin-1') if forwarded_for else None,
+                                             client[0] if client else None)
+
         # 1. Get Token from URL Query Params
         query_string = self.scope['query_string'].decode()
         params = parse_qs(query_string)
         token = params.get('token', [None])[0]
+        last_message_id = params.get('last_message_id', [''])[0]
 
         # 2. Authenticate User
         self.my_id = None
@@ -23,103 +49,363 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.my_id = int(access_token['user_id'])
                 self.scope["user"] = await self.get_user(self.my_id)
             except Exception as e:
-                print(f"WebSocket Auth Error: {e}")
+                logger.info("WebSocket auth error: %s", e)
 
         # 3. Reject if authentication failed
         if not self.my_id or not self.scope["user"]:
-            print("Connection rejected: No authenticated user.")
+            logger.info("Connection rejected: no authenticated user.")
+            metrics.CONNECTS.inc(consumer=self.metrics_label, outcome='rejected')
             await self.close()
             return
 
-        # 4. Create Room Name (Sort IDs to ensure unique room: chat_1_2 is same as chat_2_1)
-        self.other_user_id = int(self.scope["url_route"]["kwargs"]["id"])
-        ids = sorted([self.my_id, self.other_user_id])
-        self.room_group_name = f"chat_{ids[0]}_{ids[1]}"
+        # 4. Work out which group this socket joins (None: not allowed in)
+        self.room_group_name = await self.resolve_group()
+        if self.room_group_name is None:
+            logger.info("Connection rejected: user %s may not join %s.", self.my_id, self.scope["url_route"]["kwargs"])
+            metrics.CONNECTS.inc(consumer=self.metrics_label, outcome='rejected')
+            await self.close()
+            return
 
         # 5. Join Group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
-        await self.accept()
-        print(f"WebSocket Connected: User {self.my_id} to Room {self.room_group_name}")
+        self.subprotocol = protocol.negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=self.subprotocol)
+        self.accepted = True
+        metrics.CONNECTS.inc(consumer=self.metrics_label, outcome='accepted')
+        metrics.ACTIVE_CONNECTIONS.inc(consumer=self.metrics_label)
+        logger.debug("WebSocket connected: user %s to room %s", self.my_id, self.room_group_name)
+
+        # 6. Presence: count this socket; clients opt in to others' status with 'presence_subscribe'
+        self.last_heartbeat = time.monotonic()
+        self.presence_session, came_online = await sync_to_async(presence.connected)(self.my_id)
+        if came_online:
+            await self.publish_presence(online=True)
+
+        # 7. Replay anything missed while disconnected. We joined the group
+        # first, so live events queue up behind the replay instead of being lost.
+        self.resynced_through = 0
+        if last_message_id.isdigit():
+            await self.resync(int(last_message_id))
+
+    async def resolve_group(self):
+        # Create Room Name (Sort IDs to ensure unique room: chat_1_2 is same as chat_2_1)
+        self.other_user_id = int(self.scope["url_route"]["kwargs"]["id"])
+        ids = sorted([self.my_id, self.other_user_id])
+        return f"chat_{ids[0]}_{ids[1]}"
+
+    def conversation(self):
+        return Message.objects.between(self.my_id, self.other_user_id)
+
+    def message_frame(self, message_id, content):
+        return {'type': 'message', 'id': message_id, 'message': content, 'sender_id': self.my_id}
+
+    async def resync(self, last_message_id):
+        """Stream messages newer than `last_message_id` in 'history' batches, oldest first."""
+        config = settings.CHAT_RESYNC
+        budget = config['MAX_MESSAGES']
+        cursor, newest = None, last_message_id
+        while True:
+            limit = min(config['BATCH_SIZE'], budget)
+            rows, more, cursor = await self.missed_messages(last_message_id, cursor, limit)
+            budget -= len(rows)
+            newest = max([newest] + [row['id'] for row in rows])
+            final = not more or budget <= 0
+            await self.send_payload({
+                'type': 'history',
+                'messages': rows,
+                'final': final,
+                # Gap too large to replay: the client pages the rest from ChatHistoryView
+                'truncated': final and more,
+            })
+            if final:
+                break
+        self.resynced_through = newest
 
     async def disconnect(self, close_code):
-        if hasattr(self, 'room_group_name'):
+        if getattr(self, 'accepted', False):
+            metrics.ACTIVE_CONNECTIONS.dec(consumer=self.metrics_label)
+            self.accepted = False
+            if await sync_to_async(presence.disconnected)(self.my_id, self.presence_session):
+                await self.publish_presence(online=False)
+        if self.presence_flush is not None:
+            self.presence_flush.cancel()
+        for group in self.presence_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        if getattr(self, 'room_group_name', None):
             await self.channel_layer.group_discard(
                 self.room_group_name,
                 self.channel_name
             )
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
+        received_at = time.time()
         try:
-            data = json.loads(text_data)
-            msg_type = data.get('type')
+            # Over-limit frames are dropped before any parsing or DB work
+            if not await self.allow_frame():
+                return
+            msg_type = protocol.peek_type(text_data) if text_data is not None else None
+            data = None
+            if msg_type is None or msg_type in self.frames_with_body:
+                data = protocol.decode(text_data, bytes_data)
+                msg_type = data.get('type')
+            metrics.FRAMES_RECEIVED.inc(consumer=self.metrics_label, type=metrics.frame_type_label(msg_type))
+
+            # Any frame doubles as a heartbeat; 'heartbeat' frames exist for idle sockets
+            if time.monotonic() - self.last_heartbeat >= settings.PRESENCE['HEARTBEAT'] / 2:
+                self.last_heartbeat = time.monotonic()
+                self.presence_session, came_online = await sync_to_async(presence.heartbeat)(
+                    self.my_id, self.presence_session)
+                if came_online:
+                    await self.publish_presence(online=True)
 
             # CASE A: Standard Chat Message
             if msg_type == 'message':
                 message_content = data.get('message')
                 if message_content:
                     # 1. Save to Database
-                    await self.save_message(message_content)
-                    
-                    # 2. Broadcast to Room
-                    await self.channel_layer.group_send(
-                        self.room_group_name,
-                        {
-                            'type': 'chat_message',
-                            'message': message_content,
-                            'sender_id': self.my_id
-                        }
-                    )
+                    start = time.perf_counter()
+                    message = await self.save_message(message_content)
+                    metrics.DB_SAVE_LATENCY.observe(time.perf_counter() - start)
+                    if message is None:
+                        return  # nothing stored, nothing to deliver
+                    message_id = message.id
+
+                    # 2. Broadcast to Room, encoded once for every recipient
+                    await self.timed_group_send({
+                        'type': 'chat_message',
+                        'frame': protocol.encode(self.message_frame(message_id, message_content)),
+                        'message_id': message_id,
+                        'sent_at': received_at,
+                    })
 
             # CASE B: Typing Indicator
             elif msg_type == 'typing':
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'user_typing',
-                        'user_id': self.my_id
-                    }
-                )
+                await self.timed_group_send({
+                    'type': 'user_typing',
+                    'frame': protocol.encode({'type': 'typing', 'user_id': self.my_id}),
+                    'sent_at': received_at,
+                })
+
+            # CASE C: Follow other users' online status, e.g. everyone in the inbox
+            elif msg_type == 'presence_subscribe':
+                ids = [int(i) for i in data.get('ids', []) if str(i).isdigit()]
+                await self.subscribe_presence(ids)
+
+            # CASE D: Read receipt, everything up to message_id has been seen
+            elif msg_type == 'read':
+                message_id = data.get('message_id')
+                if isinstance(message_id, int) and await self.mark_read(message_id):
+                    await self.timed_group_send({
+                        'type': 'read_receipt',
+                        'frame': protocol.encode({'type': 'read', 'user_id': self.my_id, 'message_id': message_id}),
+                        'sent_at': received_at,
+                    })
 
         except Exception as e:
-            print(f"Error in receive: {e}")
+            logger.exception("Error in receive: %s", e)
+
+    async def allow_frame(self):
+        """Charge the frame to the per-user and per-IP buckets; drop it, or close the socket, when empty."""
+        decision = await sync_to_async(ratelimit.check)('chat_frames', user_id=self.my_id, ip=self.client_ip)
+        if decision.allowed:
+            self.dropped_frames = 0
+            return True
+        self.dropped_frames += 1
+        if self.dropped_frames == 1:
+            await self.send_payload({'type': 'rate_limited', 'retry_after': round(decision.retry_after, 3)})
+        if self.dropped_frames >= settings.CHAT_FRAME_DROP_LIMIT:
+            logger.info("Closing socket for user %s: %s frames over the limit", self.my_id, self.dropped_frames)
+            await self.close(code=4429)
+        return False
+
+    # --- Presence ---
+
+    async def subscribe_presence(self, user_ids):
+        """Join presence groups (capped per socket) and send their current state at once."""
+        room = settings.PRESENCE['MAX_SUBSCRIPTIONS'] - len(self.presence_groups)
+        new_ids = [uid for uid in dict.fromkeys(user_ids) if presence.group_name(uid) not in self.presence_groups][:room]
+        if not new_ids:
+            return
+        for uid in new_ids:
+            group = presence.group_name(uid)
+            await self.channel_layer.group_add(group, self.channel_name)
+            self.presence_groups.add(group)
+        states = await sync_to_async(presence.lookup)(new_ids)
+        await self.send_payload({'type': 'presence', 'changes': states})
+
+    async def publish_presence(self, online):
+        await self.timed_group_send({
+            'type': 'presence_changed',
+            'state': presence.state(self.my_id, online, time.time()),
+        }, group=presence.group_name(self.my_id))
+
+    async def timed_group_send(self, event, group=None):
+        start = time.perf_counter()
+        await self.channel_layer.group_send(group or self.room_group_name, event)
+        metrics.GROUP_SEND_LATENCY.observe(time.perf_counter() - start, event=event['type'])
+
+    def observe_delivery(self, event):
+        # Wall clock, since sender and recipient may live in different processes
+        if 'sent_at' in event:
+            metrics.DELIVERY_LATENCY.observe(max(0.0, time.time() - event['sent_at']), event=event['type'])
+        depth = metrics.channel_backlog(self.channel_layer, self.channel_name)
+        if depth is not None:
+            metrics.SEND_QUEUE_DEPTH.observe(depth, consumer=self.metrics_label)
+
+    async def send_frame(self, frame):
+        if self.subprotocol == protocol.MSGPACK_SUBPROTOCOL:
+            await self.send(bytes_data=frame['msgpack'])
+        else:
+            await self.send(text_data=frame['json'])
+
+    async def send_payload(self, frame):
+        # Per-connection frames (e.g. replay) are encoded for this socket only
+        payload = protocol.dumps(frame, self.subprotocol)
+        if isinstance(payload, bytes):
+            await self.send(bytes_data=payload)
+        else:
+            await self.send(text_data=payload)
 
     # --- Group Handlers (Send data back to client) ---
 
     async def chat_message(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'message',
-            'message': event['message'],
-            'sender_id': event['sender_id']
-        }))
+        self.observe_delivery(event)
+        # Already sent as part of the reconnect replay
+        message_id = event.get('message_id')
+        if message_id is not None and message_id <= self.resynced_through:
+            return
+        await self.send_frame(event['frame'])
 
     async def user_typing(self, event):
-        # Send typing status to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'typing',
-            'user_id': event['user_id']
-        }))
+        self.observe_delivery(event)
+        await self.send_frame(event['frame'])
+
+    async def read_receipt(self, event):
+        self.observe_delivery(event)
+        await self.send_frame(event['frame'])
+
+    async def presence_changed(self, event):
+        # Coalesce changes for BATCH_INTERVAL so a busy contact list costs one frame
+        state = event['state']
+        self.presence_buffer[state['user_id']] = state
+        if self.presence_flush is None:
+            self.presence_flush = asyncio.ensure_future(self.flush_presence())
+
+    async def flush_presence(self):
+        await asyncio.sleep(settings.PRESENCE['BATCH_INTERVAL'])
+        changes = list(self.presence_buffer.values())
+        self.presence_buffer.clear()
+        self.presence_flush = None
+        if changes:
+            await self.send_payload({'type': 'presence', 'changes': changes})
 
     # --- Database Helpers ---
 
     @database_sync_to_async
     def get_user(self, user_id):
-        try:
-            return User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            return None
+        return user_cache.get(user_id)
 
     @database_sync_to_async
     def save_message(self, message):
         try:
-            other_user = User.objects.get(id=self.other_user_id)
-            Message.objects.create(
+            other_user = user_cache.get(self.other_user_id)
+            if other_user is None:
+                raise User.DoesNotExist(f"User {self.other_user_id} not found")
+            saved = Message.objects.create(
                 sender=self.scope["user"],
                 receiver=other_user,
                 content=message
             )
+            # Read-your-writes: the sender's next history fetch goes to the primary
+            pin_to_primary(self.my_id)
+            return saved
         except Exception as e:
-            print(f"Database Save Error: {e}")
\ No newline at end of file
+            logger.exception("Database save error: %s", e)
+
+    @database_sync_to_async
+    def mark_read(self, message_id):
+        """Flag the other person's messages up to message_id as read; True if anything changed."""
+        return self.conversation().filter(
+            sender_id=self.other_user_id, id__lte=message_id, is_read=False,
+        ).update(is_read=True) > 0
+
+    @database_sync_to_async
+    def missed_messages(self, after_id, cursor, limit):
+        """
+        One page of messages newer than `after_id` in (timestamp, id) order, the
+        pair index order. `cursor` is the (timestamp, id) key of the previous
+        page's last row; returns (rows, more, next cursor).
+        """
+        # Always the primary: a lagging replica would reopen the gap
+        rows = self.conversation().filter(id__gt=after_id)
+        if cursor is not None:
+            timestamp, last_id = cursor
+            rows = rows.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=last_id))
+        rows = list(rows.order_by('timestamp', 'id').values(*MESSAGE_VALUES)[:limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            cursor = (rows[-1]['timestamp'], rows[-1]['id'])
+        return serialize_messages(rows), more, cursor
+
+
+
+class RoomConsumer(ChatConsumer):
+    """
+    Group room at ws/rooms/<room_id>/. Each message is stored once (room set,
+    no receiver) and reaches every member's sockets through one group_send.
+    Membership comes from the cache in chat/rooms.py, never a per-send query.
+    """
+    metrics_label = 'room'
+
+    async def resolve_group(self):
+        self.room_id = int(self.scope["url_route"]["kwargs"]["room_id"])
+        if not await database_sync_to_async(rooms.is_member)(self.room_id, self.my_id):
+            return None
+        return rooms.group_name(self.room_id)
+
+    def conversation(self):
+        return Message.objects.in_room(self.room_id)
+
+    def message_frame(self, message_id, content):
+        return {**super().message_frame(message_id, content), 'room_id': self.room_id}
+
+    async def leave_room(self):
+        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        self.room_group_name = None
+        await self.close(code=4403)
+
+    async def member_removed(self, event):
+        rooms.forget_local(self.room_id)  # the signal only cleared the remover's process
+        if self.my_id in event['user_ids']:
+            await self.leave_room()
+
+    async def chat_message(self, event):
+        # In case member_removed never arrived: deliver to current members only
+        members = rooms.cached_members(self.room_id)
+        if members is None:
+            members = await database_sync_to_async(rooms.members)(self.room_id)
+        if self.my_id not in members:
+            await self.leave_room()
+            return
+        await super().chat_message(event)
+
+    @database_sync_to_async
+    def save_message(self, message):
+        # Members removed while connected can't keep posting
+        if not rooms.is_member(self.room_id, self.my_id):
+            logger.info("User %s is no longer a member of room %s", self.my_id, self.room_id)
+            return None
+        saved = Message.objects.create(sender_id=self.my_id, room_id=self.room_id, content=message)
+        pin_to_primary(self.my_id)
+        return saved
+
+    @database_sync_to_async
+    def mark_read(self, message_id):
+        """Advance this member's read cursor; True if it moved forward."""
+        return RoomMembership.objects.filter(
+            room_id=self.room_id, user_id=self.my_id, last_read_message_id__lt=message_id,
+        ).update(last_read_message_id=message_id) > 0
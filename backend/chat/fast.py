@@ -0,0 +1,20 @@
+"""Fast read path for chat history; output matches MessageSerializer."""
+from core.fastpath import drf_datetime
+
+MESSAGE_VALUES = ('id', 'sender_id', 'sender__email', 'receiver_id', 'room_id', 'content', 'timestamp')
+
+
+def message_dict(row):
+    return {
+        'id': row['id'],
+        'sender': row['sender_id'],
+        'sender_email': row['sender__email'],
+        'receiver': row['receiver_id'],
+        'room': row['room_id'],
+        'content': row['content'],
+        'timestamp': drf_datetime(row['timestamp']),
+    }
+
+
+def serialize_messages(rows):
+    return [message_dict(row) for row in rows]
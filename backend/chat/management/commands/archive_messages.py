@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.archive import archive_before
+
+
+class Command(BaseCommand):
+    help = "Move chat messages older than --days into the archive table, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHAT_ARCHIVE_AFTER_DAYS,
+                            help="Archive messages older than this many days.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows moved per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows would move.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        moved = archive_before(cutoff, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                               log=self.stdout.write)
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} messages older than {cutoff:%Y-%m-%d %H:%M}."))
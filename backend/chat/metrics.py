@@ -0,0 +1,34 @@
+from core.metrics import COUNT_BUCKETS, registry
+
+# Frame types we label individually; anything else is counted as "other"
+# so clients can't blow up label cardinality.
+KNOWN_FRAME_TYPES = {'message', 'typing', 'read', 'heartbeat', 'presence', 'presence_subscribe'}
+
+ACTIVE_CONNECTIONS = registry.gauge(
+    'ws_active_connections', 'Open WebSocket connections in this process.', ['consumer'])
+CONNECTS = registry.counter(
+    'ws_connects_total', 'WebSocket handshakes by outcome.', ['consumer', 'outcome'])
+FRAMES_RECEIVED = registry.counter(
+    'ws_frames_received_total', 'Inbound WebSocket frames by type.', ['consumer', 'type'])
+GROUP_SEND_LATENCY = registry.histogram(
+    'channel_layer_group_send_seconds', 'Time spent in channel_layer.group_send.', ['event'])
+DELIVERY_LATENCY = registry.histogram(
+    'chat_delivery_seconds', 'Time from receive() to the group handler on a recipient connection.', ['event'])
+DB_SAVE_LATENCY = registry.histogram(
+    'chat_db_save_seconds', 'Time to persist a chat message, including the thread hop.')
+SEND_QUEUE_DEPTH = registry.histogram(
+    'ws_send_queue_depth', 'Messages still waiting on the consumer channel when a handler runs.',
+    ['consumer'], buckets=COUNT_BUCKETS)
+
+
+def frame_type_label(msg_type):
+    return msg_type if msg_type in KNOWN_FRAME_TYPES else 'other'
+
+
+def channel_backlog(layer, channel_name):
+    """Pending messages for a channel, for layers that expose their queues."""
+    for attr in ('channels', 'receive_buffer'):  # InMemoryChannelLayer / RedisChannelLayer
+        queues = getattr(layer, attr, None)
+        if isinstance(queues, dict) and channel_name in queues:
+            return queues[channel_name].qsize()
+    return None
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# Full-text indexes for chat search (chat/search.py). PostgreSQL gets GIN
+# expression indexes; SQLite gets external-content FTS5 tables kept in sync
+# by triggers. Other backends are left without an index. Non-atomic so the
+# PostgreSQL indexes can be built CONCURRENTLY without blocking writes.
+TABLES = ('chat_message', 'chat_archivedmessage')
+
+POSTGRES = {
+    'forward': [
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_content_fts ON {table} "
+        f"USING GIN (to_tsvector('simple', content))"
+        for table in TABLES
+    ],
+    'reverse': [f"DROP INDEX CONCURRENTLY IF EXISTS {table}_content_fts" for table in TABLES],
+}
+
+
+def _sqlite_forward(table):
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(content, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF content ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content); "
+        f"INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content); END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _sqlite_reverse(table):
+    fts = f"{table}_fts"
+    return [f"DROP TRIGGER IF EXISTS {fts}_{suffix}" for suffix in ('ai', 'ad', 'au')] + [f"DROP TABLE IF EXISTS {fts}"]
+
+
+SQLITE = {
+    'forward': [sql for table in TABLES for sql in _sqlite_forward(table)],
+    'reverse': [sql for table in TABLES for sql in _sqlite_reverse(table)],
+}
+
+
+def _run(direction):
+    def run(apps, schema_editor):
+        statements = {'postgresql': POSTGRES, 'sqlite': SQLITE}.get(schema_editor.connection.vendor)
+        for sql in (statements or {}).get(direction, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('chat', '0002_archivedmessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run('forward'), _run('reverse')),
+    ]
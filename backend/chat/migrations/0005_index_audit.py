@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Greatest, Least
+
+from core.migration_operations import AddIndexOnline, ReplaceIndexOnline
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY on PostgreSQL can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('chat', '0004_rooms'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Built under a temporary name and swapped in, so history reads keep an index throughout
+        ReplaceIndexOnline(
+            model_name='archivedmessage',
+            index=models.Index(Least('sender', 'receiver'), Greatest('sender', 'receiver'), models.F('timestamp'), models.F('id'), name='archived_msg_pair_ts_idx'),
+        ),
+        ReplaceIndexOnline(
+            model_name='archivedmessage',
+            index=models.Index(fields=['room', 'timestamp', 'id'], name='archived_msg_room_ts_idx'),
+        ),
+        AddIndexOnline(
+            model_name='message',
+            index=models.Index(Least('sender', 'receiver'), Greatest('sender', 'receiver'), models.F('timestamp'), models.F('id'), name='message_pair_ts_idx'),
+        ),
+        ReplaceIndexOnline(
+            model_name='message',
+            index=models.Index(fields=['room', 'timestamp', 'id'], name='message_room_ts_idx'),
+        ),
+    ]
@@ -1,17 +1,90 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+class MessageQuerySet(models.QuerySet):
+    def between(self, user_id, other_id):
+        """Both directions of the conversation between two users, as one range of the pair index."""
+        low, high = sorted((int(user_id), int(other_id)))
+        return self.filter(receiver__isnull=False).alias(
+            pair_low=Least('sender_id', 'receiver_id'),
+            pair_high=Greatest('sender_id', 'receiver_id'),
+        ).filter(pair_low=low, pair_high=high)
+
+    def in_room(self, room_id):
+        return self.filter(room_id=room_id)
+
+class Room(models.Model):
+    """A group conversation. Members and their read cursors live in RoomMembership."""
+    name = models.CharField(max_length=100)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    members = models.ManyToManyField(User, through='RoomMembership', related_name='chat_rooms')
+
+    def __str__(self):
+        return self.name
+
+
+class RoomMembership(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='room_memberships')
+    joined_at = models.DateTimeField(auto_now_add=True)
+    # Read cursor: everything up to this message id has been seen
+    last_read_message_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'user'], name='unique_room_member'),
+        ]
+
+
 class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
-    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
+    # One-to-one messages have a receiver; group messages have a room instead
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='received_messages')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, null=True, blank=True, related_name='messages')
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    objects = MessageQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['timestamp'] # Oldest messages first (like WhatsApp)
+        indexes = [
+            # between(): one index range per conversation, already in history order
+            models.Index(Least('sender', 'receiver'), Greatest('sender', 'receiver'), F('timestamp'), F('id'),
+                         name='message_pair_ts_idx'),
+            models.Index(fields=['room', 'timestamp', 'id'], name='message_room_ts_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.sender} -> {self.receiver}: {self.content[:20]}"
-    
+        return f"{self.sender} -> {self.room or self.receiver}: {self.content[:20]}"
+
+
+class ArchivedMessage(models.Model):
+    """
+    Cold storage for old Message rows, filled by `manage.py archive_messages`.
+    Rows keep their original ids, so id order stays global across both tables.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='+')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, null=True, related_name='+')
+    content = models.TextField()
+    timestamp = models.DateTimeField()
+    is_read = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = MessageQuerySet.as_manager()
+
     class Meta:
-        ordering = ['timestamp'] # Oldest messages first (like WhatsApp)
\ No newline at end of file
+        ordering = ['timestamp']
+        indexes = [
+            models.Index(Least('sender', 'receiver'), Greatest('sender', 'receiver'), F('timestamp'), F('id'),
+                         name='archived_msg_pair_ts_idx'),
+            models.Index(fields=['room', 'timestamp', 'id'], name='archived_msg_room_ts_idx'),
+        ]
@@ -0,0 +1,118 @@
+"""
+Online presence, kept in the shared cache so every worker sees the same state.
+
+`presence:online:<id>` holds the user's current session token and
+`presence:sockets:<id>:<session>` counts the sockets that joined it. Both
+expire after PRESENCE['TTL'] unless a heartbeat refreshes them, so a
+crashed worker can't leave anyone online forever. Each socket remembers
+the session it was counted in: if that session has expired, its next
+heartbeat joins (or starts) the current one rather than resetting the
+count, so the user stays online until their last live socket closes.
+`presence:seen:<id>` remembers when that happened.
+
+Transitions are published to the `presence_<id>` group. Consumers that
+subscribed to a user batch these into one frame per BATCH_INTERVAL.
+"""
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.fastpath import drf_datetime
+
+
+def _config():
+    return settings.PRESENCE
+
+
+def _cache():
+    return caches['default']
+
+
+def online_key(user_id):
+    return f"presence:online:{user_id}"
+
+
+def sockets_key(user_id, session):
+    return f"presence:sockets:{user_id}:{session}"
+
+
+def seen_key(user_id):
+    return f"presence:seen:{user_id}"
+
+
+def group_name(user_id):
+    return f"presence_{user_id}"
+
+
+def connected(user_id):
+    """
+    Count a new socket for the user in their current session.
+
+    Returns (session, came_online); the socket passes `session` back to
+    heartbeat() and disconnected().
+    """
+    cache, ttl = _cache(), _config()['TTL']
+    key = online_key(user_id)
+    cache.add(key, uuid.uuid4().hex, ttl)
+    session = cache.get(key)
+    if session is None:  # expired between add() and get()
+        session = uuid.uuid4().hex
+        cache.set(key, session, ttl)
+    counter = sockets_key(user_id, session)
+    cache.add(counter, 0, ttl)
+    try:
+        count = cache.incr(counter)
+    except ValueError:
+        cache.set(counter, 1, ttl)
+        count = 1
+    cache.touch(key, ttl)
+    cache.touch(counter, ttl)
+    return session, count == 1
+
+
+def heartbeat(user_id, session):
+    """Keep the user online; returns (session, came_online) like connected()."""
+    cache, ttl = _cache(), _config()['TTL']
+    if cache.get(online_key(user_id)) == session:
+        cache.touch(online_key(user_id), ttl)
+        cache.touch(sockets_key(user_id, session), ttl)
+        return session, False
+    # Our session expired: count this socket again instead of overwriting the
+    # count other sockets may already have rebuilt
+    return connected(user_id)
+
+
+def disconnected(user_id, session):
+    """Drop one socket for the user; True if that was their last one."""
+    cache = _cache()
+    key = online_key(user_id)
+    current = cache.get(key)
+    if current is not None and current != session:
+        return False  # this socket was never counted in the live session
+    if current is not None:
+        try:
+            count = cache.decr(sockets_key(user_id, session))
+        except ValueError:
+            count = 0
+        if count > 0:
+            return False
+        cache.delete_many([key, sockets_key(user_id, session)])
+    cache.set(seen_key(user_id), time.time(), _config()['LAST_SEEN_TTL'])
+    return True
+
+
+def state(user_id, online, last_seen=None):
+    """Wire format shared by the REST lookup and the WebSocket frames."""
+    if last_seen is not None:
+        last_seen = drf_datetime(datetime.fromtimestamp(last_seen, timezone.utc))
+    return {'user_id': user_id, 'online': online, 'last_seen': None if online else last_seen}
+
+
+def lookup(user_ids):
+    """State for every id, in the given order, with one cache round trip."""
+    keys = {user_id: (online_key(user_id), seen_key(user_id)) for user_id in user_ids}
+    found = _cache().get_many([key for pair in keys.values() for key in pair])
+    return [state(user_id, bool(found.get(online)), found.get(seen)) for user_id, (online, seen) in keys.items()]
@@ -0,0 +1,56 @@
+"""
+Wire format for chat WebSockets.
+
+JSON text frames are the default. Clients that offer the MSGPACK_SUBPROTOCOL
+during the handshake get MessagePack binary frames both ways instead.
+Outbound frames are encoded once by the sender (`encode`), carried through
+group_send as ready-made payloads, and written as-is by every recipient.
+"""
+import json
+import re
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - ships with channels-redis
+    msgpack = None
+
+MSGPACK_SUBPROTOCOL = 'connectly.msgpack.v1'
+
+# Matches frames whose first key is "type", e.g. {"type": "typing", ...}
+_LEADING_TYPE = re.compile(r'\s*\{\s*"type"\s*:\s*"([A-Za-z_]{1,32})"\s*[,}]')
+
+
+def negotiate(offered):
+    """Pick our subprotocol from the client's offer, or None for plain JSON."""
+    if msgpack is not None and MSGPACK_SUBPROTOCOL in (offered or ()):
+        return MSGPACK_SUBPROTOCOL
+    return None
+
+
+def peek_type(text):
+    """Frame type without parsing the whole frame; None if it isn't the first key."""
+    match = _LEADING_TYPE.match(text)
+    return match.group(1) if match else None
+
+
+def decode(text_data=None, bytes_data=None):
+    if bytes_data is not None:
+        if msgpack is None:
+            raise ValueError("Binary frame received but msgpack is not installed")
+        return msgpack.unpackb(bytes_data, raw=False)
+    return json.loads(text_data)
+
+
+def dumps(frame, subprotocol=None):
+    """Encode a frame for one connection: bytes for msgpack, str for JSON."""
+    if subprotocol == MSGPACK_SUBPROTOCOL:
+        return msgpack.packb(frame, use_bin_type=True)
+    return json.dumps(frame)
+
+
+def encode(frame):
+    """Return the frame in every supported wire format: {'json': str, 'msgpack': bytes}."""
+    payloads = {'json': dumps(frame)}
+    if msgpack is not None:
+        payloads['msgpack'] = dumps(frame, MSGPACK_SUBPROTOCOL)
+    return payloads
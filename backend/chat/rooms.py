@@ -0,0 +1,64 @@
+"""
+Cached room membership, so sending to a room never queries its members.
+
+Lookups go through a short-lived per-process LRU, then the shared cache,
+then one query. Membership changes invalidate both tiers (chat/signals.py).
+A removal is also broadcast to the room, so the departed member's sockets
+leave it and every worker holding a socket there drops its local copy.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache import LocalLRU
+from .models import RoomMembership
+
+_config = getattr(settings, 'OBJECT_CACHE', {})
+_local = LocalLRU(maxsize=_config.get('LOCAL_MAXSIZE', 2048), ttl=_config.get('LOCAL_TTL', 30))
+
+
+def group_name(room_id):
+    return f"room_{room_id}"
+
+
+def _key(room_id):
+    return f"room:members:{room_id}"
+
+
+def members(room_id):
+    """frozenset of member user ids."""
+    key = _key(room_id)
+    found = _local.get(key)
+    if found is None:
+        shared = caches['default']
+        found = shared.get(key)
+        if found is None:
+            found = frozenset(RoomMembership.objects.filter(room_id=room_id).values_list('user_id', flat=True))
+            shared.set(key, found, _config.get('TTL', 300))
+        _local.set(key, found)
+    return found
+
+
+def cached_members(room_id):
+    """members() from this process's tier only, or None; safe to call on the event loop."""
+    return _local.get(_key(room_id))
+
+
+def is_member(room_id, user_id):
+    return user_id in members(room_id)
+
+
+def invalidate(room_id):
+    _local.delete(_key(room_id))
+    caches['default'].delete(_key(room_id))
+
+
+def forget_local(room_id):
+    _local.delete(_key(room_id))
+
+
+def announce_removed(room_id, user_ids):
+    """Tell every socket in the room (handled by RoomConsumer.member_removed)."""
+    async_to_sync(get_channel_layer().group_send)(
+        group_name(room_id), {'type': 'member_removed', 'user_ids': list(user_ids)})
@@ -5,4 +5,5 @@ from . import consumers
 websocket_urlpatterns = [
     # Note: re_path uses Regex. (?P<id>\w+) captures the ID.
     re_path(r'ws/chat/(?P<id>\w+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/rooms/(?P<room_id>\d+)/$', consumers.RoomConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Full-text search over one user's chat messages (direct and group rooms),
+hot and archived.
+
+Matching and ranking run in the database against the indexes created in
+migration 0003: tsvector/GIN on PostgreSQL, FTS5 on SQLite. Results are
+ordered by (rank desc, id desc) and paged with an opaque keyset cursor.
+"""
+import base64
+import re
+
+from django.db import connections, router
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import ArchivedMessage, Message, RoomMembership
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchUnavailable(APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = "Message search is not available on this database."
+
+
+def encode_cursor(rank, message_id):
+    return base64.urlsafe_b64encode(f"{rank!r}:{message_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (rank, id); raises ValueError for anything we didn't issue."""
+    rank, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+    return float(rank), int(message_id)
+
+
+def _visible_to(alias=''):
+    # Sent, received, or posted in a room the user belongs to; params: user_id x3
+    prefix = f"{alias}." if alias else ''
+    return (
+        f"({prefix}sender_id = %s OR {prefix}receiver_id = %s OR {prefix}room_id IN "
+        f"(SELECT room_id FROM {RoomMembership._meta.db_table} WHERE user_id = %s))"
+    )
+
+
+def _sqlite_branch(table):
+    fts = f"{table}_fts"
+    return (
+        f"SELECT m.id AS id, -bm25({fts}) AS rank FROM {fts} JOIN {table} m ON m.id = {fts}.rowid "
+        f"WHERE {fts} MATCH %s AND {_visible_to('m')}"
+    )
+
+
+def _postgres_branch(table):
+    return (
+        f"SELECT id, ts_rank(to_tsvector('simple', content), plainto_tsquery('simple', %s)) AS rank "
+        f"FROM {table} WHERE {_visible_to()} "
+        f"AND to_tsvector('simple', content) @@ plainto_tsquery('simple', %s)"
+    )
+
+
+def search_ids(user_id, query, limit, after=None):
+    """[(id, rank)] of the best matches for `query`, after the (rank, id) keyset."""
+    tokens = TOKEN.findall(query)
+    if not tokens:
+        return []
+    tables = [Message._meta.db_table, ArchivedMessage._meta.db_table]
+    connection = connections[router.db_for_read(Message) or 'default']
+
+    if connection.vendor == 'postgresql':
+        text = ' '.join(tokens)
+        branches = [_postgres_branch(table) for table in tables]
+        params = [text, user_id, user_id, user_id, text] * len(tables)
+    elif connection.vendor == 'sqlite':
+        # Quote every token so user input can't use FTS5 query syntax
+        match = ' '.join(f'"{token}"' for token in tokens)
+        branches = [_sqlite_branch(table) for table in tables]
+        params = [match, user_id, user_id, user_id] * len(tables)
+    else:
+        raise SearchUnavailable()
+
+    sql = f"SELECT id, rank FROM ({' UNION ALL '.join(branches)}) hits"
+    if after is not None:
+        sql += " WHERE rank < %s OR (rank = %s AND id < %s)"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY rank DESC, id DESC LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
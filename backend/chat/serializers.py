@@ -1,9 +1,64 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
-from .models import Message
+from . import rooms
+from .models import Message, Room, RoomMembership
+
+User = get_user_model()
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_email = serializers.EmailField(source='sender.email', read_only=True)
     
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'sender_email', 'receiver', 'content', 'timestamp']
\ No newline at end of file
+        fields = ['id', 'sender', 'sender_email', 'receiver', 'room', 'content', 'timestamp']
+
+
+def validate_new_members(user_ids, current=0):
+    """Set of existing user ids, keeping the room within ROOM_MAX_MEMBERS."""
+    if not isinstance(user_ids, (list, set)) or not all(isinstance(i, int) for i in user_ids):
+        raise serializers.ValidationError("Expected a list of user ids.")
+    ids = set(user_ids)
+    if current + len(ids) > settings.ROOM_MAX_MEMBERS:
+        raise serializers.ValidationError(f"A room can have at most {settings.ROOM_MAX_MEMBERS} members.")
+    missing = ids - set(User.objects.filter(id__in=ids).values_list('id', flat=True))
+    if missing:
+        raise serializers.ValidationError(f"Unknown users: {sorted(missing)}")
+    return ids
+
+
+class RoomMembersSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), default=list)
+
+
+class RoomReadSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField()
+
+
+class RoomSerializer(serializers.ModelSerializer):
+    member_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
+    # Annotated by RoomListCreateView for the requesting member
+    member_count = serializers.IntegerField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    last_read_message_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Room
+        fields = ['id', 'name', 'created_by', 'created_at', 'member_ids',
+                  'member_count', 'unread_count', 'last_read_message_id']
+        read_only_fields = ['created_by', 'created_at']
+
+    def validate_member_ids(self, value):
+        # The creator is added on top of these
+        return validate_new_members(value, current=1)
+
+    def create(self, validated_data):
+        member_ids = validated_data.pop('member_ids', set()) | {validated_data['created_by'].id}
+        with transaction.atomic():
+            room = Room.objects.create(**validated_data)
+            RoomMembership.objects.bulk_create(
+                [RoomMembership(room=room, user_id=user_id) for user_id in member_ids])
+        rooms.invalidate(room.id)  # bulk_create skips the post_save signal
+        room.member_count, room.unread_count, room.last_read_message_id = len(member_ids), 0, 0
+        return room
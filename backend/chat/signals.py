@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from . import rooms
+from .models import RoomMembership
+
+# Same pattern as users/signals.py: clear now, and again once the write is visible.
+@receiver([post_save, post_delete], sender=RoomMembership)
+def invalidate_room_members(sender, instance, **kwargs):
+    rooms.invalidate(instance.room_id)
+    transaction.on_commit(lambda: rooms.invalidate(instance.room_id))
+
+
+# Leaving, removal or account purge: disconnect their open room sockets
+@receiver(post_delete, sender=RoomMembership)
+def announce_member_removed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: rooms.announce_removed(instance.room_id, [instance.user_id]))
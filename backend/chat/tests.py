@@ -1,3 +1,523 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+from . import metrics, presence, protocol, rooms
+from .models import ArchivedMessage, Message, RoomMembership
+from .routing import websocket_urlpatterns
+
+application = URLRouter(websocket_urlpatterns)
+
+
+def connect(user, other_id, token=None, subprotocols=None):
+    token = token if token is not None else AccessToken.for_user(user)
+    return WebsocketCommunicator(application, f"/ws/chat/{other_id}/?token={token}", subprotocols=subprotocols)
+
+
+class ChatConsumerMetricsTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+
+    def test_connection_lifecycle_is_counted(self):
+        accepted = metrics.CONNECTS.value(consumer='chat', outcome='accepted')
+        rejected = metrics.CONNECTS.value(consumer='chat', outcome='rejected')
+        active = metrics.ACTIVE_CONNECTIONS.value(consumer='chat')
+
+        async def scenario():
+            ok = connect(self.alice, self.bob.id)
+            self.assertTrue((await ok.connect())[0])
+            self.assertEqual(metrics.ACTIVE_CONNECTIONS.value(consumer='chat'), active + 1)
+            await ok.disconnect()
+
+            bad = connect(self.alice, self.bob.id, token='not-a-token')
+            self.assertFalse((await bad.connect())[0])
+
+        async_to_sync(scenario)()
+        self.assertEqual(metrics.CONNECTS.value(consumer='chat', outcome='accepted'), accepted + 1)
+        self.assertEqual(metrics.CONNECTS.value(consumer='chat', outcome='rejected'), rejected + 1)
+        self.assertEqual(metrics.ACTIVE_CONNECTIONS.value(consumer='chat'), active)
+
+    def test_message_path_is_instrumented(self):
+        frames = metrics.FRAMES_RECEIVED.value(consumer='chat', type='message')
+        saves = metrics.DB_SAVE_LATENCY.snapshot()['count']
+        sends = metrics.GROUP_SEND_LATENCY.snapshot(event='chat_message')['count']
+        deliveries = metrics.DELIVERY_LATENCY.snapshot(event='chat_message')['count']
+
+        async def scenario():
+            sender = connect(self.alice, self.bob.id)
+            receiver = connect(self.bob, self.alice.id)
+            await sender.connect()
+            await receiver.connect()
+            await sender.send_json_to({'type': 'message', 'message': 'hi'})
+            self.assertEqual((await receiver.receive_json_from())['message'], 'hi')
+            await sender.receive_json_from()
+            await sender.disconnect()
+            await receiver.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertEqual(metrics.FRAMES_RECEIVED.value(consumer='chat', type='message'), frames + 1)
+        self.assertEqual(metrics.DB_SAVE_LATENCY.snapshot()['count'], saves + 1)
+        self.assertEqual(metrics.GROUP_SEND_LATENCY.snapshot(event='chat_message')['count'], sends + 1)
+        # One delivery per connection in the room
+        self.assertEqual(metrics.DELIVERY_LATENCY.snapshot(event='chat_message')['count'], deliveries + 2)
+
+    def test_unknown_frame_types_share_one_label(self):
+        before = metrics.FRAMES_RECEIVED.value(consumer='chat', type='other')
+
+        async def scenario():
+            client = connect(self.alice, self.bob.id)
+            await client.connect()
+            await client.send_json_to({'type': 'something-new'})
+            await client.send_json_to({'type': 'another-thing'})
+            self.assertTrue(await client.receive_nothing())
+            await client.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertEqual(metrics.FRAMES_RECEIVED.value(consumer='chat', type='other'), before + 2)
+
+
+class ChatProtocolTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+
+    def test_peek_type_only_trusts_a_leading_type_key(self):
+        self.assertEqual(protocol.peek_type('{"type": "typing", "user_id": 3}'), 'typing')
+        self.assertEqual(protocol.peek_type('{"type":"message"}'), 'message')
+        self.assertIsNone(protocol.peek_type('{"message": "{\\"type\\": \\"typing\\"}", "type": "message"}'))
+        self.assertIsNone(protocol.peek_type('not json'))
+
+    def test_json_and_msgpack_clients_share_a_room(self):
+        if protocol.msgpack is None:
+            self.skipTest("msgpack is not installed")
+
+        async def scenario():
+            sender = connect(self.alice, self.bob.id)
+            receiver = connect(self.bob, self.alice.id, subprotocols=[protocol.MSGPACK_SUBPROTOCOL])
+            self.assertEqual(await sender.connect(), (True, None))
+            self.assertEqual(await receiver.connect(), (True, protocol.MSGPACK_SUBPROTOCOL))
+
+            await sender.send_json_to({'type': 'message', 'message': 'hi'})
+            frame = await receiver.receive_from()
+            self.assertIsInstance(frame, bytes)
+            message_id = await Message.objects.values_list('id', flat=True).aget()
+            expected = {'type': 'message', 'id': message_id, 'message': 'hi', 'sender_id': self.alice.id}
+            self.assertEqual(protocol.decode(bytes_data=frame), expected)
+            self.assertEqual(await sender.receive_json_from(), expected)
+
+            # Binary frames are accepted from msgpack clients
+            await receiver.send_to(bytes_data=protocol.msgpack.packb({'type': 'typing'}))
+            self.assertEqual(await sender.receive_json_from(), {'type': 'typing', 'user_id': self.bob.id})
+            await sender.disconnect()
+            await receiver.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertEqual(Message.objects.count(), 1)
+
+
+class ChatResyncTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.carol = User.objects.create_user(email='carol@example.com', password='pw', full_name='Carol')
+        self.seen = Message.objects.create(sender=self.alice, receiver=self.bob, content='seen')
+        self.missed = [
+            Message.objects.create(sender=self.alice, receiver=self.bob, content=f'missed {i}') for i in range(5)
+        ]
+        Message.objects.create(sender=self.alice, receiver=self.carol, content='other room')
+
+    def replay(self, last_message_id):
+        async def scenario():
+            client = WebsocketCommunicator(
+                application, f"/ws/chat/{self.alice.id}/?token={AccessToken.for_user(self.bob)}"
+                             f"&last_message_id={last_message_id}")
+            await client.connect()
+            frames = [await client.receive_json_from()]
+            while not frames[-1]['final']:
+                frames.append(await client.receive_json_from())
+            await client.disconnect()
+            return frames
+
+        return async_to_sync(scenario)()
+
+    @override_settings(CHAT_RESYNC={'BATCH_SIZE': 2, 'MAX_MESSAGES': 100})
+    def test_missed_messages_are_replayed_in_batches(self):
+        frames = self.replay(self.seen.id)
+        self.assertEqual([len(f['messages']) for f in frames], [2, 2, 1])
+        ids = [m['id'] for f in frames for m in f['messages']]
+        self.assertEqual(ids, [m.id for m in self.missed])
+        self.assertFalse(frames[-1]['truncated'])
+
+    @override_settings(CHAT_RESYNC={'BATCH_SIZE': 2, 'MAX_MESSAGES': 100})
+    def test_batches_follow_timestamp_order_without_skipping(self):
+        # Clock skew between workers: later ids with earlier timestamps
+        start = self.seen.timestamp
+        for i, message in enumerate(reversed(self.missed)):
+            Message.objects.filter(id=message.id).update(timestamp=start + timedelta(seconds=i + 1))
+        frames = self.replay(self.seen.id)
+        ids = [m['id'] for f in frames for m in f['messages']]
+        self.assertEqual(ids, [m.id for m in reversed(self.missed)])
+
+    @override_settings(CHAT_RESYNC={'BATCH_SIZE': 2, 'MAX_MESSAGES': 3})
+    def test_large_gaps_are_truncated(self):
+        frames = self.replay(self.seen.id)
+        self.assertEqual(sum(len(f['messages']) for f in frames), 3)
+        self.assertTrue(frames[-1]['truncated'])
+
+    def test_up_to_date_client_gets_an_empty_final_batch(self):
+        self.assertEqual(self.replay(self.missed[-1].id),
+                         [{'type': 'history', 'messages': [], 'final': True, 'truncated': False}])
+
+    def test_live_messages_after_replay_are_not_duplicated(self):
+        async def scenario():
+            client = WebsocketCommunicator(
+                application, f"/ws/chat/{self.alice.id}/?token={AccessToken.for_user(self.bob)}"
+                             f"&last_message_id={self.missed[-2].id}")
+            await client.connect()
+            replay = await client.receive_json_from()
+            # A replayed message must not be delivered again if its broadcast arrives late
+            ids = sorted([self.alice.id, self.bob.id])
+            late = self.missed[-1].id
+            await get_channel_layer().group_send(f"chat_{ids[0]}_{ids[1]}", {
+                'type': 'chat_message',
+                'message_id': late,
+                'frame': protocol.encode({'type': 'message', 'id': late}),
+            })
+            self.assertTrue(await client.receive_nothing())
+            await client.disconnect()
+            return replay
+
+        replay = async_to_sync(scenario)()
+        self.assertEqual([m['id'] for m in replay['messages']], [self.missed[-1].id])
+
+
+class MessageArchiveTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        now = timezone.now()
+        self.messages = []
+        for i in range(6):
+            message = Message.objects.create(sender=self.alice, receiver=self.bob, content=f'm{i}')
+            # m0..m3 are a year old, m4..m5 are recent
+            age = timedelta(days=365 - i) if i < 4 else timedelta(minutes=6 - i)
+            Message.objects.filter(id=message.id).update(timestamp=now - age)
+            self.messages.append(message)
+
+    def test_command_moves_old_messages_in_chunks(self):
+        call_command('archive_messages', days=30, batch_size=3, stdout=StringIO())
+        self.assertEqual(sorted(ArchivedMessage.objects.values_list('content', flat=True)), ['m0', 'm1', 'm2', 'm3'])
+        self.assertEqual(list(Message.objects.values_list('content', flat=True)), ['m4', 'm5'])
+        self.assertEqual(ArchivedMessage.objects.get(content='m0').id, self.messages[0].id)
+
+    def test_history_pages_across_the_archive_boundary(self):
+        call_command('archive_messages', days=30, stdout=StringIO())
+        client = APIClient()
+        client.force_authenticate(self.bob)
+
+        page = client.get(f'/api/chat/{self.alice.id}/?limit=3&offset=2').json()
+        self.assertEqual(page['count'], 6)
+        self.assertEqual([m['content'] for m in page['results']], ['m2', 'm3', 'm4'])
+        self.assertEqual(page['results'][0]['sender_email'], 'alice@example.com')
+
+
+class MessageSearchTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.carol = User.objects.create_user(email='carol@example.com', password='pw', full_name='Carol')
+        for i in range(4):
+            Message.objects.create(sender=self.alice, receiver=self.bob, content=f'filler {i}')
+        self.lunch = [
+            Message.objects.create(sender=self.alice, receiver=self.bob, content='lunch tomorrow?'),
+            Message.objects.create(sender=self.bob, receiver=self.alice, content='lunch lunch lunch, yes'),
+            Message.objects.create(sender=self.carol, receiver=self.alice, content='Lunch was great'),
+        ]
+        # Not Alice's conversation
+        Message.objects.create(sender=self.bob, receiver=self.carol, content='lunch with alice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_only_my_messages_match_and_pages_do_not_overlap(self):
+        first = self.client.get('/api/chat/search/?q=lunch&limit=2').json()
+        second = self.client.get(first['next']).json()
+        ids = [m['id'] for m in first['results'] + second['results']]
+        self.assertEqual(sorted(ids), sorted(m.id for m in self.lunch))
+        self.assertIsNone(second['next'])
+        ranks = [m['rank'] for m in first['results'] + second['results']]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_archived_messages_are_searchable(self):
+        ArchivedMessage.objects.create(id=10_000, sender=self.alice, receiver=self.bob,
+                                       content='old lunch plans', timestamp=timezone.now() - timedelta(days=400))
+        results = self.client.get('/api/chat/search/?q=plans').json()['results']
+        self.assertEqual([m['id'] for m in results], [10_000])
+
+    def test_query_syntax_is_treated_as_words(self):
+        response = self.client.get('/api/chat/search/', {'q': 'lunch" OR NEAR(*'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/chat/search/?q=').status_code, 400)
+
+    def test_result_links_open_history_around_the_message(self):
+        hit = self.client.get('/api/chat/search/?q=tomorrow').json()['results'][0]
+        self.assertEqual(hit['other_user_id'], self.bob.id)
+        page = self.client.get(hit['history_url'] + '&limit=2').json()
+        # lunch[0] is the 5th message of the conversation (offset 4), centred in a page of 2
+        self.assertEqual([m['content'] for m in page['results']], ['filler 3', 'lunch tomorrow?'])
+        self.assertNotIn('around', page['next'])
+
+
+@override_settings(PRESENCE={'TTL': 60, 'HEARTBEAT': 25, 'LAST_SEEN_TTL': 3600,
+                             'BATCH_INTERVAL': 0.05, 'MAX_SUBSCRIPTIONS': 10})
+class PresenceTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+
+    def test_online_until_the_last_socket_closes(self):
+        first, came_online = presence.connected(self.alice.id)
+        self.assertTrue(came_online)
+        second, came_online = presence.connected(self.alice.id)
+        self.assertFalse(came_online)
+        self.assertFalse(presence.disconnected(self.alice.id, first))
+        self.assertTrue(presence.lookup([self.alice.id])[0]['online'])
+        self.assertTrue(presence.disconnected(self.alice.id, second))
+
+        state, = presence.lookup([self.alice.id])
+        self.assertFalse(state['online'])
+        self.assertIsNotNone(state['last_seen'])
+
+    def test_heartbeats_after_expiry_recount_every_open_socket(self):
+        session, _ = presence.connected(self.alice.id)
+        sockets = [session, presence.connected(self.alice.id)[0], presence.connected(self.alice.id)[0]]
+        self.assertEqual(presence.heartbeat(self.alice.id, session), (session, False))
+        cache.delete_many([presence.online_key(self.alice.id), presence.sockets_key(self.alice.id, session)])
+
+        renewed = [presence.heartbeat(self.alice.id, old) for old in sockets]
+        self.assertEqual([came_online for _, came_online in renewed], [True, False, False])
+        sockets = [new for new, _ in renewed]
+        self.assertEqual(len(set(sockets)), 1)
+        self.assertNotEqual(sockets[0], session)
+
+        # Closing sockets one by one keeps the user online until the last one
+        self.assertEqual([presence.disconnected(self.alice.id, s) for s in sockets], [False, False, True])
+        self.assertFalse(presence.lookup([self.alice.id])[0]['online'])
+
+    def test_socket_from_an_expired_session_does_not_end_the_new_one(self):
+        stale, _ = presence.connected(self.alice.id)
+        cache.delete(presence.online_key(self.alice.id))
+        fresh, came_online = presence.connected(self.alice.id)
+        self.assertTrue(came_online)
+
+        self.assertFalse(presence.disconnected(self.alice.id, stale))
+        self.assertTrue(presence.lookup([self.alice.id])[0]['online'])
+        self.assertTrue(presence.disconnected(self.alice.id, fresh))
+
+    def test_bulk_endpoint_keeps_request_order(self):
+        presence.connected(self.bob.id)
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        results = client.get(f'/api/chat/presence/?ids={self.bob.id},{self.alice.id}').json()['results']
+        self.assertEqual([(r['user_id'], r['online']) for r in results], [(self.bob.id, True), (self.alice.id, False)])
+
+    def test_subscribers_get_batched_changes(self):
+        async def scenario():
+            watcher = connect(self.bob, self.alice.id)
+            await watcher.connect()
+            await watcher.send_json_to({'type': 'presence_subscribe', 'ids': [self.alice.id]})
+            snapshot = await watcher.receive_json_from()
+            self.assertEqual(snapshot['changes'][0]['online'], False)
+
+            # Online then offline inside one batch window collapses to the last state
+            alice = connect(self.alice, self.bob.id)
+            await alice.connect()
+            await alice.disconnect()
+            batch = await watcher.receive_json_from()
+            await watcher.disconnect()
+            return batch
+
+        batch = async_to_sync(scenario)()
+        self.assertEqual(batch['type'], 'presence')
+        self.assertEqual([(c['user_id'], c['online']) for c in batch['changes']], [(self.alice.id, False)])
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, CHAT_FRAME_DROP_LIMIT=3,
+                   RATE_LIMITS={'chat_frames': {'user': (0.001, 2)}})
+class ChatRateLimitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+
+    def test_over_limit_frames_are_dropped_then_the_socket_closes(self):
+        async def scenario():
+            client = connect(self.alice, self.bob.id)
+            await client.connect()
+            for i in range(3):
+                await client.send_json_to({'type': 'message', 'message': f'm{i}'})
+            self.assertEqual((await client.receive_json_from())['message'], 'm0')
+            self.assertEqual((await client.receive_json_from())['message'], 'm1')
+            notice = await client.receive_json_from()
+            self.assertEqual(notice['type'], 'rate_limited')
+
+            await client.send_json_to({'type': 'typing'})
+            await client.send_json_to({'type': 'typing'})
+            self.assertEqual(await client.receive_output(), {'type': 'websocket.close', 'code': 4429})
+
+        async_to_sync(scenario)()
+        self.assertEqual(Message.objects.count(), 2)
+
+
+class RoomTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.carol = User.objects.create_user(email='carol@example.com', password='pw', full_name='Carol')
+        self.mallory = User.objects.create_user(email='mallory@example.com', password='pw', full_name='Mallory')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        response = self.client.post('/api/chat/rooms/', {'name': 'Trip', 'member_ids': [self.bob.id, self.carol.id]},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.room_id = response.json()['id']
+
+    def room_socket(self, user):
+        return WebsocketCommunicator(application, f"/ws/rooms/{self.room_id}/?token={AccessToken.for_user(user)}")
+
+    def test_one_stored_message_one_group_send_every_member_delivered(self):
+        sends = metrics.GROUP_SEND_LATENCY.snapshot(event='chat_message')['count']
+
+        async def scenario():
+            sockets = [self.room_socket(user) for user in (self.alice, self.bob, self.carol)]
+            for socket in sockets:
+                self.assertTrue((await socket.connect())[0])
+            await sockets[0].send_json_to({'type': 'message', 'message': 'hello all'})
+            frames = [await socket.receive_json_from() for socket in sockets]
+            for socket in sockets:
+                await socket.disconnect()
+            return frames
+
+        frames = async_to_sync(scenario)()
+        self.assertEqual({f['message'] for f in frames}, {'hello all'})
+        self.assertEqual({f['room_id'] for f in frames}, {self.room_id})
+        self.assertEqual(Message.objects.filter(room_id=self.room_id).count(), 1)
+        self.assertEqual(metrics.GROUP_SEND_LATENCY.snapshot(event='chat_message')['count'], sends + 1)
+
+    def test_non_members_cannot_connect_or_read(self):
+        async def scenario():
+            return await self.room_socket(self.mallory).connect()
+
+        self.assertFalse(async_to_sync(scenario)()[0])
+        self.client.force_authenticate(self.mallory)
+        self.assertEqual(self.client.get(f'/api/chat/rooms/{self.room_id}/messages/').status_code, 404)
+
+    def test_read_cursor_drives_unread_counts(self):
+        messages = [Message.objects.create(sender=self.alice, room_id=self.room_id, content=f'm{i}') for i in range(3)]
+        self.client.force_authenticate(self.bob)
+        self.assertEqual(self.client.get('/api/chat/rooms/').json()[0]['unread_count'], 3)
+
+        async def scenario():
+            socket = self.room_socket(self.bob)
+            await socket.connect()
+            await socket.send_json_to({'type': 'read', 'message_id': messages[1].id})
+            receipt = await socket.receive_json_from()
+            await socket.disconnect()
+            return receipt
+
+        self.assertEqual(async_to_sync(scenario)(), {'type': 'read', 'user_id': self.bob.id, 'message_id': messages[1].id})
+        room, = self.client.get('/api/chat/rooms/').json()
+        self.assertEqual((room['unread_count'], room['member_count']), (1, 3))
+
+    def test_membership_changes_reach_the_cache(self):
+        self.assertFalse(rooms.is_member(self.room_id, self.mallory.id))
+        self.client.post(f'/api/chat/rooms/{self.room_id}/members/', {'user_ids': [self.mallory.id]}, format='json')
+        self.assertTrue(rooms.is_member(self.room_id, self.mallory.id))
+        self.client.force_authenticate(self.mallory)
+        self.client.delete(f'/api/chat/rooms/{self.room_id}/members/')
+        self.assertFalse(rooms.is_member(self.room_id, self.mallory.id))
+
+    def test_leaving_disconnects_the_members_sockets(self):
+        async def scenario():
+            alice, bob = self.room_socket(self.alice), self.room_socket(self.bob)
+            for socket in (alice, bob):
+                self.assertTrue((await socket.connect())[0])
+            bob_client = APIClient()
+            bob_client.force_authenticate(self.bob)
+            response = await sync_to_async(bob_client.delete)(f'/api/chat/rooms/{self.room_id}/members/')
+            self.assertEqual(response.status_code, 204)
+            self.assertEqual(await bob.receive_output(), {'type': 'websocket.close', 'code': 4403})
+
+            await alice.send_json_to({'type': 'message', 'message': 'bob is gone'})
+            self.assertEqual((await alice.receive_json_from())['message'], 'bob is gone')
+            self.assertTrue(await bob.receive_nothing())
+            await alice.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_messages_skip_sockets_of_removed_members(self):
+        async def scenario():
+            alice, carol = self.room_socket(self.alice), self.room_socket(self.carol)
+            for socket in (alice, carol):
+                self.assertTrue((await socket.connect())[0])
+            # Removed, but the member_removed broadcast never reaches carol's socket
+            with mock.patch.object(rooms, 'announce_removed'):
+                await RoomMembership.objects.filter(room_id=self.room_id, user=self.carol).adelete()
+            await alice.send_json_to({'type': 'message', 'message': 'members only'})
+            self.assertEqual((await alice.receive_json_from())['message'], 'members only')
+            self.assertEqual(await carol.receive_output(), {'type': 'websocket.close', 'code': 4403})
+            await alice.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_malformed_bodies_are_rejected(self):
+        for path, body in (('members/', [1]), ('members/', {'user_ids': 'x'}), ('read/', [1]), ('read/', {})):
+            with self.subTest(path=path, body=body):
+                response = self.client.post(f'/api/chat/rooms/{self.room_id}/{path}', body, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_room_messages_are_searchable_by_members(self):
+        Message.objects.create(sender=self.bob, room_id=self.room_id, content='train tickets booked')
+        hit, = self.client.get('/api/chat/search/?q=tickets').json()['results']
+        self.assertIn(f'/api/chat/rooms/{self.room_id}/messages/?around=', hit['history_url'])
+        self.client.force_authenticate(self.mallory)
+        self.assertEqual(self.client.get('/api/chat/search/?q=tickets').json()['results'], [])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'core.channel_layers.LocalFirstChannelLayer'}})
+class LocalFirstLayerChatTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+
+    def test_conversation_on_one_worker_stays_off_the_broker(self):
+        async def scenario():
+            alice, bob = connect(self.alice, self.bob.id), connect(self.bob, self.alice.id)
+            await alice.connect()
+            await bob.connect()
+            publishes = get_channel_layer().broker.ops['publish']
+            await alice.send_json_to({'type': 'message', 'message': 'same worker'})
+            received = await bob.receive_json_from()
+            await alice.receive_json_from()
+            ops = get_channel_layer().broker.ops['publish'] - publishes
+            await alice.disconnect()
+            await bob.disconnect()
+            return received, ops
+
+        received, publishes = async_to_sync(scenario)()
+        self.assertEqual((received['message'], publishes), ('same worker', 0))
@@ -1,7 +1,20 @@
 from django.urls import path
-from .views import ChatHistoryView
+from core.asyncapi import async_reads
+from .views import (
+    ChatHistoryView, MessageSearchView, PresenceView,
+    RoomListCreateView, RoomMembersView, RoomMessagesView, RoomReadView, chat_history_async,
+)
 
 urlpatterns = [
     # API to get history: /api/chat/5/
-    path('<int:id>/', ChatHistoryView.as_view(), name='chat-history'),
+    path('<int:id>/', async_reads(chat_history_async, ChatHistoryView.as_view()), name='chat-history'),
+    # Full-text search over my messages: /api/chat/search/?q=lunch
+    path('search/', MessageSearchView.as_view(), name='chat-search'),
+    # Online status for many users at once: /api/chat/presence/?ids=1,2,3
+    path('presence/', PresenceView.as_view(), name='chat-presence'),
+    # Group rooms (WebSocket: ws/rooms/<room_id>/)
+    path('rooms/', RoomListCreateView.as_view(), name='room-list'),
+    path('rooms/<int:room_id>/messages/', RoomMessagesView.as_view(), name='room-messages'),
+    path('rooms/<int:room_id>/members/', RoomMembersView.as_view(), name='room-members'),
+    path('rooms/<int:room_id>/read/', RoomReadView.as_view(), name='room-read'),
 ]
\ No newline at end of file
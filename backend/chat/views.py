@@ -1,15 +1,76 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.urls import reverse
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import LimitOffsetPagination
-from django.db.models import Q
-from .models import Message
-from .serializers import MessageSerializer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+from core.asyncapi import async_api_view
+from core.db_routers import ReplicaReadMixin
+from core.params import parse_id_list
+from . import presence, rooms
+from .archive import ConversationHistory
+from .fast import MESSAGE_VALUES, message_dict, serialize_messages
+from .models import ArchivedMessage, Message, Room, RoomMembership
+from .search import decode_cursor, encode_cursor, search_ids
+from .serializers import (MessageSerializer, RoomMembersSerializer, RoomReadSerializer, RoomSerializer,
+                          validate_new_members)
 
 # 1. Custom Pagination Class (Loads 50 messages at a time)
 class ChatPagination(LimitOffsetPagination):
     default_limit = 50
     max_limit = 100
 
-class ChatHistoryView(generics.ListAPIView):
+    def paginate_queryset(self, queryset, request, view=None):
+        self.history = queryset
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_offset(self, request):
+        # ?around=<message id> opens the page centred on that message (search results link here)
+        around = request.query_params.get('around', '')
+        if around.isdigit() and isinstance(self.history, ConversationHistory):
+            position = self.history.position(int(around))
+            if position is not None:
+                return max(0, position - self.limit // 2)
+        return super().get_offset(request)
+
+    def get_next_link(self):
+        link = super().get_next_link()
+        return link and remove_query_param(link, 'around')
+
+    def get_previous_link(self):
+        # The base class drops `offset` for the first page, which would let `around` win again
+        if self.offset <= 0:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'around')
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, max(0, self.offset - self.limit))
+
+    async def apaginate_queryset(self, history, request):
+        """paginate_queryset() for the async history view: same limit/offset/around rules."""
+        self.request = request
+        self.history = history
+        self.limit = self.get_limit(request)
+        self.count = await history.acount()
+        self.offset = None
+        around = request.query_params.get('around', '')
+        if around.isdigit():
+            position = await history.aposition(int(around))
+            if position is not None:
+                self.offset = max(0, position - self.limit // 2)
+        if self.offset is None:
+            self.offset = super().get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return await history.aslice(self.offset, self.offset + self.limit)
+
+class ChatHistoryView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = ChatPagination 
@@ -18,8 +79,174 @@ class ChatHistoryView(generics.ListAPIView):
         my_id = self.request.user.id
         other_user_id = self.kwargs['id']
         
-        # 2. Optimized Query: Get conversation between User A and User B
-        return Message.objects.filter(
-            Q(sender_id=my_id, receiver_id=other_user_id) | 
-            Q(sender_id=other_user_id, receiver_id=my_id)
-        ).order_by('timestamp') # Oldest first (Standard for chat apps)
\ No newline at end of file
+        # 2. Conversation between User A and User B, oldest first (Standard for chat apps).
+        # Offsets run through the archive table first, then the hot Message table.
+        return ConversationHistory.between(my_id, other_user_id, MESSAGE_VALUES)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(serialize_messages(page))
+
+
+@async_api_view([permissions.IsAuthenticated], replica=True)
+async def chat_history_async(request, id):
+    # Async GET for ChatHistoryView
+    paginator = ChatPagination()
+    history = ConversationHistory.between(request.user.id, id, MESSAGE_VALUES)
+    page = await paginator.apaginate_queryset(history, Request(request))
+    return paginator.get_paginated_response(serialize_messages(page)).data
+
+
+class MessageSearchView(ReplicaReadMixin, APIView):
+    """
+    GET ?q=words[&cursor=...][&limit=N] -> the requesting user's messages (sent,
+    received or in their rooms; hot or archived) matching every word, best match first.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 20
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': "Provide something to search for."})
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+            after = decode_cursor(request.query_params['cursor']) if 'cursor' in request.query_params else None
+        except ValueError:
+            raise ValidationError({'cursor': "Invalid cursor or limit."})
+        limit = max(limit, 1)
+
+        hits = search_ids(request.user.id, query, limit + 1, after)
+        has_more = len(hits) > limit
+        hits = hits[:limit]
+
+        ids = [message_id for message_id, _ in hits]
+        rows = {row['id']: row for row in Message.objects.filter(id__in=ids).values(*MESSAGE_VALUES)}
+        missing = set(ids) - rows.keys()
+        if missing:
+            rows.update({row['id']: row for row in ArchivedMessage.objects.filter(id__in=missing).values(*MESSAGE_VALUES)})
+
+        results = []
+        for message_id, rank in hits:
+            row = rows.get(message_id)
+            if row is None:  # deleted between the two queries
+                continue
+            item = message_dict(row)
+            item['rank'] = rank
+            if row['room_id']:
+                item['other_user_id'] = None
+                history = reverse('room-messages', kwargs={'room_id': row['room_id']})
+            else:
+                item['other_user_id'] = row['receiver_id'] if row['sender_id'] == request.user.id else row['sender_id']
+                history = reverse('chat-history', kwargs={'id': item['other_user_id']})
+            item['history_url'] = request.build_absolute_uri(f"{history}?around={message_id}")
+            results.append(item)
+
+        next_link = None
+        if has_more:
+            last_id, last_rank = hits[-1]
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(last_rank, last_id))
+        return Response({'next': next_link, 'results': results})
+
+
+class PresenceView(APIView):
+    """GET ?ids=3,1,2 -> online status and last-seen time for each user, from the shared cache."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        ids = parse_id_list(request, limit=settings.BATCH_MAX_IDS)
+        return Response({'results': presence.lookup(ids)})
+
+
+# --- GROUP ROOMS ---
+
+def _count(queryset):
+    # Correlated COUNT(*) usable inside annotate()
+    return Coalesce(Subquery(
+        queryset.order_by().values('room_id').annotate(n=Count('*')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+class RoomListCreateView(generics.ListCreateAPIView):
+    """My rooms with member and unread counts; POST {name, member_ids} creates one."""
+    serializer_class = RoomSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        me = self.request.user
+        cursor = RoomMembership.objects.filter(room=OuterRef('pk'), user=me).values('last_read_message_id')[:1]
+        return (
+            Room.objects.filter(memberships__user=me)
+            .annotate(
+                last_read_message_id=Subquery(cursor),
+                member_count=_count(RoomMembership.objects.filter(room=OuterRef('pk'))),
+                unread_count=_count(Message.objects.filter(room=OuterRef('pk'), id__gt=OuterRef('last_read_message_id'))),
+            )
+            .order_by('-created_at')
+        )
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+
+class RoomMemberMixin:
+    def check_membership(self):
+        # Cached lookup; non-members get a 404 rather than learning the room exists
+        room_id = self.kwargs['room_id']
+        if not rooms.is_member(room_id, self.request.user.id):
+            raise Http404
+        return room_id
+
+
+class RoomMessagesView(RoomMemberMixin, ReplicaReadMixin, generics.ListAPIView):
+    """Room history, oldest first, across archived and live messages (same paging as ChatHistoryView)."""
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ChatPagination
+
+    def get_queryset(self):
+        return ConversationHistory.in_room(self.check_membership(), MESSAGE_VALUES)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(serialize_messages(page))
+
+
+class RoomMembersView(RoomMemberMixin, APIView):
+    """POST {user_ids} adds people to the room; DELETE leaves it."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, room_id):
+        self.check_membership()
+        serializer = RoomMembersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        current = rooms.members(room_id)
+        try:
+            new_ids = validate_new_members(serializer.validated_data['user_ids'], current=len(current)) - current
+        except ValidationError as exc:
+            raise ValidationError({'user_ids': exc.detail})
+        RoomMembership.objects.bulk_create(
+            [RoomMembership(room_id=room_id, user_id=user_id) for user_id in new_ids], ignore_conflicts=True)
+        rooms.invalidate(room_id)  # bulk_create skips the post_save signal
+        transaction.on_commit(lambda: rooms.invalidate(room_id))
+        return Response({'added': sorted(new_ids)})
+
+    def delete(self, request, room_id):
+        self.check_membership()
+        RoomMembership.objects.filter(room_id=room_id, user=request.user).delete()
+        return Response(status=204)
+
+
+class RoomReadView(RoomMemberMixin, APIView):
+    """POST {message_id} moves my read cursor forward (never back)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, room_id):
+        self.check_membership()
+        serializer = RoomReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message_id = serializer.validated_data['message_id']
+        membership = RoomMembership.objects.filter(room_id=room_id, user=request.user)
+        membership.filter(last_read_message_id__lt=message_id).update(last_read_message_id=message_id)
+        return Response({'last_read_message_id': membership.values_list('last_read_message_id', flat=True).first()})
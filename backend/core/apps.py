@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from .collectors import db_pool_metrics, object_cache_metrics
+        from .metrics import registry
+
+        registry.add_collector(object_cache_metrics)
+        registry.add_collector(db_pool_metrics)
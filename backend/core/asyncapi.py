@@ -0,0 +1,148 @@
+"""
+Async read paths for the hottest GET endpoints.
+
+A DRF view is sync code: under daphne each request holds a worker thread
+for its whole run, serialization included, and competes with the
+`database_sync_to_async` calls ChatConsumer makes. Views built with
+`async_api_view` run on the event loop and leave it only for the queries
+themselves (Django's async ORM). They mirror the DRF view they stand in
+for: same JWT authentication, permission classes, throttles, replica
+routing, JSON body and error format. `async_reads` serves one next to the DRF view on
+the same URL; ASYNC_READ_VIEWS=False sends everything back to DRF.
+"""
+from contextlib import ExitStack
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .db_routers import ais_pinned, read_from_replica, replica_aliases
+from .renderers import ORJSONRenderer
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with the user lookup done through the async ORM."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        # Same checks as JWTAuthentication.get_user()
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = await self.user_model._default_manager.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is None:
+            raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+        if jwt_settings.CHECK_REVOKE_TOKEN and (
+                validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)):
+            raise exceptions.AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        return user
+
+
+_authentication = AsyncJWTAuthentication()
+
+
+async def authenticate(request):
+    # APIClient.force_authenticate() marks the request the same way DRF's Request looks for
+    forced = getattr(request, '_force_auth_user', None)
+    if forced is not None:
+        return forced
+    authenticated = await _authentication.aauthenticate(request)
+    return authenticated[0] if authenticated else AnonymousUser()
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(ORJSONRenderer().render(data), status=status, headers=headers,
+                        content_type='application/json')
+
+
+def error_response(exc, request):
+    # Same body and status as DRF's default exception handler
+    if isinstance(exc, Http404):
+        exc = exceptions.NotFound()
+    headers = None
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        headers = {'WWW-Authenticate': _authentication.authenticate_header(request)}
+    if isinstance(exc, exceptions.Throttled) and exc.wait:
+        headers = {'Retry-After': '%d' % exc.wait}
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(data, status=exc.status_code, headers=headers)
+
+
+def _check_permissions(request, permission_classes):
+    for permission in (cls() for cls in permission_classes):
+        if not permission.has_permission(request, None):
+            if not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+
+def _check_throttles(request, view):
+    # APIView.check_throttles(): every throttle is charged, the longest wait is reported
+    durations = []
+    for throttle in (cls() for cls in api_settings.DEFAULT_THROTTLE_CLASSES):
+        if not throttle.allow_request(request, view):
+            durations.append(throttle.wait())
+    if durations:
+        durations = [duration for duration in durations if duration is not None]
+        raise exceptions.Throttled(max(durations, default=None))
+
+
+def async_api_view(permission_classes, replica=False):
+    """
+    Turn `async def view(request, ...) -> data` into an async Django view.
+    `replica=True` gives it ReplicaReadMixin's routing. The DRF throttles see
+    the view function, so a `rate_limit_scope` attribute on it works as on an APIView.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            try:
+                request.user = await authenticate(request)
+                _check_permissions(request, permission_classes)
+                # Throttles may hit the shared cache with a sync client
+                await sync_to_async(_check_throttles)(request, func)
+                with ExitStack() as stack:
+                    if replica and replica_aliases() and not await ais_pinned(request.user.id):
+                        stack.enter_context(read_from_replica())
+                    data = await func(request, *args, **kwargs)
+            except (Http404, exceptions.APIException) as exc:
+                return error_response(exc, request)
+            return json_response(data)
+        return view
+    return decorator
+
+
+def async_reads(async_view, view):
+    """
+    One URL, two implementations: GET/HEAD go to `async_view`, other methods
+    (and everything while ASYNC_READ_VIEWS is off) to the DRF `view` in a thread.
+    """
+    sync_view = sync_to_async(view)
+
+    async def dispatch(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and settings.ASYNC_READ_VIEWS:
+            return await async_view(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    # Like DRF's as_view(): JWT requests carry no CSRF token
+    dispatch.csrf_exempt = True
+    return dispatch
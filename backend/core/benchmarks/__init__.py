@@ -0,0 +1,60 @@
+"""
+Benchmark suites for `manage.py benchmark`.
+
+Each suite is a module exposing `run(options) -> dict`; results are plain
+dicts so runs can be written to JSON and compared with `--compare`.
+"""
+import math
+import statistics
+from importlib import import_module
+
+SUITES = {
+    'rest': 'core.benchmarks.rest',
+    'chat': 'core.benchmarks.chat',
+    'serialization': 'core.benchmarks.serialization',
+    'fanout': 'core.benchmarks.fanout',
+    'logins': 'core.benchmarks.logins',
+    'layers': 'core.benchmarks.layers',
+    'mixed': 'core.benchmarks.mixed',
+}
+
+
+def get_suite(name):
+    return import_module(SUITES[name]).run
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples, **extra):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = [s * 1000 for s in samples]
+    result = {
+        'iterations': len(ms),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'min_ms': round(min(ms), 3),
+        'max_ms': round(max(ms), 3),
+    }
+    result.update(extra)
+    return result
+
+
+def compare(current, baseline):
+    """Yield one line per metric present in both runs, e.g. for p50/p99 regressions."""
+    for suite, cases in current.get('results', {}).items():
+        for case, metrics in cases.items():
+            before = baseline.get('results', {}).get(suite, {}).get(case)
+            if not isinstance(metrics, dict) or not isinstance(before, dict):
+                continue
+            for key, value in metrics.items():
+                old = before.get(key)
+                if key == 'iterations' or not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                    continue
+                change = f"{(value - old) / old * 100:+.1f}%" if old else "n/a"
+                yield f"{suite}.{case}.{key}: {old} -> {value} ({change})"
@@ -0,0 +1,94 @@
+import json
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+
+from chat import protocol
+from chat.models import Message
+from . import summarize
+from .fixtures import pick_actors
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+async def _connect(application, path, subprotocols=None):
+    communicator = WebsocketCommunicator(application, path, subprotocols=subprotocols)
+    start = time.perf_counter()
+    connected, _ = await communicator.connect()
+    if not connected:
+        raise RuntimeError(f"WebSocket connection to {path} was rejected")
+    return communicator, time.perf_counter() - start
+
+
+class _Wire:
+    """Send/receive chat frames over a communicator as JSON text or msgpack bytes."""
+
+    def __init__(self, subprotocol=None):
+        self.subprotocol = subprotocol
+        self.bytes_received = 0
+
+    async def send(self, communicator, frame):
+        if self.subprotocol:
+            await communicator.send_to(bytes_data=protocol.msgpack.packb(frame))
+        else:
+            await communicator.send_to(text_data=json.dumps(frame))
+
+    async def receive(self, communicator):
+        raw = await communicator.receive_from(timeout=10)
+        self.bytes_received += len(raw)
+        return protocol.decode(bytes_data=raw) if self.subprotocol else protocol.decode(text_data=raw)
+
+
+async def _run(application, viewer_id, other_id, tokens, messages, subprotocol=None):
+    wire = _Wire(subprotocol)
+    offered = [subprotocol] if subprotocol else None
+    sender, connect_a = await _connect(application, f"/ws/chat/{other_id}/?token={tokens[0]}", offered)
+    receiver, connect_b = await _connect(application, f"/ws/chat/{viewer_id}/?token={tokens[1]}", offered)
+    try:
+        # 1. Fan-out latency: one message at a time, sender -> other participant
+        latencies = []
+        for i in range(messages):
+            start = time.perf_counter()
+            await wire.send(sender, {'type': 'message', 'message': f"bench latency {i}"})
+            await wire.receive(receiver)
+            latencies.append(time.perf_counter() - start)
+            await wire.receive(sender)  # sender's own echo
+
+        # 2. Throughput: send a burst, wait until all are delivered
+        start = time.perf_counter()
+        for i in range(messages):
+            await wire.send(sender, {'type': 'message', 'message': f"bench burst {i}"})
+        for _ in range(messages):
+            await wire.receive(receiver)
+        elapsed = time.perf_counter() - start
+        for _ in range(messages):
+            await wire.receive(sender)
+    finally:
+        await sender.disconnect()
+        await receiver.disconnect()
+
+    return {
+        'connect': summarize([connect_a, connect_b]),
+        'fanout_latency': summarize(latencies),
+        'throughput': {'messages': messages, 'seconds': round(elapsed, 4),
+                       'messages_per_sec': round(messages / elapsed, 1),
+                       'bytes_per_frame': round(wire.bytes_received / (messages * 4), 1)},
+    }
+
+
+def run(options):
+    from core.asgi import application
+
+    viewer, other, _ = pick_actors()
+    tokens = (str(AccessToken.for_user(viewer)), str(AccessToken.for_user(other)))
+    last_id = Message.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    try:
+        results = async_to_sync(_run)(application, viewer.id, other.id, tokens, options['messages'])
+        if protocol.negotiate([protocol.MSGPACK_SUBPROTOCOL]):
+            binary = async_to_sync(_run)(application, viewer.id, other.id, tokens, options['messages'],
+                                         protocol.MSGPACK_SUBPROTOCOL)
+            results.update({f"msgpack_{name}": value for name, value in binary.items()})
+        return results
+    finally:
+        # Don't leave benchmark traffic behind in the conversation
+        Message.objects.filter(id__gt=last_id, content__startswith='bench ').delete()
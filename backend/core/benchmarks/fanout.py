@@ -0,0 +1,72 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat import rooms
+from chat.models import Room, RoomMembership
+from . import summarize
+
+ROOM_SIZES = (2, 50, 500)
+
+
+def _create_room(size):
+    """A throwaway room with `size` fresh members; returns (room, tokens)."""
+    User = get_user_model()
+    stamp = time.time_ns()
+    User.objects.bulk_create(
+        User(email=f"fanout-{stamp}-{i}@bench.invalid", full_name=f"Fanout {i}", password='!')
+        for i in range(size)
+    )
+    users = list(User.objects.filter(email__startswith=f"fanout-{stamp}-").order_by('id'))
+    room = Room.objects.create(name=f"fanout-{size}", created_by=users[0])
+    RoomMembership.objects.bulk_create(RoomMembership(room=room, user=user) for user in users)
+    rooms.invalidate(room.id)
+    return room, [str(AccessToken.for_user(user)) for user in users]
+
+
+async def _run(application, room_id, tokens, messages):
+    sockets = []
+    try:
+        for token in tokens:
+            socket = WebsocketCommunicator(application, f"/ws/rooms/{room_id}/?token={token}")
+            connected, _ = await socket.connect()
+            if not connected:
+                raise RuntimeError(f"WebSocket connection to room {room_id} was rejected")
+            sockets.append(socket)
+
+        # Time from send until the last member (sender's echo included) has the frame
+        latencies = []
+        for i in range(messages):
+            start = time.perf_counter()
+            await sockets[0].send_json_to({'type': 'message', 'message': f"bench fanout {i}"})
+            for socket in sockets:
+                await socket.receive_json_from(timeout=10)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        for socket in sockets:
+            await socket.disconnect()
+
+    elapsed = sum(latencies)
+    deliveries = messages * len(tokens)
+    return summarize(latencies, members=len(tokens), deliveries=deliveries,
+                     deliveries_per_sec=round(deliveries / elapsed, 1))
+
+
+def run(options):
+    from core.asgi import application
+
+    # Every member socket waits on every message, so keep the default modest
+    messages = max(1, options['messages'] // 10)
+    results = {}
+    for size in ROOM_SIZES:
+        room, tokens = _create_room(size)
+        try:
+            results[f"room_{size}"] = async_to_sync(_run)(application, room.id, tokens, messages)
+        finally:
+            get_user_model().objects.filter(room_memberships__room=room).delete()
+            room.delete()
+            rooms.invalidate(room.id)
+    return results
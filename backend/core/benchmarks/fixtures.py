@@ -0,0 +1,32 @@
+from django.db.models import Count
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import Message
+from posts.models import Post
+from users.models import User
+
+
+def pick_actors():
+    """
+    Choose a busy seeded user, someone they have chatted with, and a post
+    with comments. Raises if the database has not been seeded.
+    """
+    viewer = (
+        User.objects.filter(email__startswith='seed')
+        .annotate(n=Count('following'))
+        .order_by('-n')
+        .first()
+    )
+    if viewer is None:
+        raise RuntimeError("No seeded users found; run `manage.py seed_data` first.")
+
+    other_id = (
+        Message.objects.filter(sender=viewer).values_list('receiver_id', flat=True).first()
+        or User.objects.exclude(id=viewer.id).values_list('id', flat=True).first()
+    )
+    post = Post.objects.annotate(n=Count('comments')).order_by('-n').first()
+    return viewer, User.objects.get(id=other_id), post
+
+
+def bearer(user):
+    return f"Bearer {AccessToken.for_user(user)}"
@@ -0,0 +1,45 @@
+import time
+
+from asgiref.sync import async_to_sync
+
+from core.channel_layers import LocalBroker, LocalFirstChannelLayer
+from . import summarize
+
+# Added to every broker op to stand in for a Redis round trip on the same network
+BROKER_LATENCY = 0.0005
+GROUP = 'chat_bench'
+
+
+async def _run(placement, local_delivery, messages):
+    LocalBroker.reset('bench')
+    config = {'BACKEND': 'core.channel_layers.LocalBroker', 'NAME': 'bench', 'LATENCY': BROKER_LATENCY}
+    sender_layer = LocalFirstChannelLayer(broker=config, local_delivery=local_delivery, capacity=messages + 10)
+    other_layer = (sender_layer if placement == 'same_worker'
+                   else LocalFirstChannelLayer(broker=config, local_delivery=local_delivery, capacity=messages + 10))
+    try:
+        mine, theirs = await sender_layer.new_channel(), await other_layer.new_channel()
+        await sender_layer.group_add(GROUP, mine)
+        await other_layer.group_add(GROUP, theirs)
+        ops = sender_layer.broker.ops
+        ops.clear()
+
+        latencies = []
+        for i in range(messages):
+            start = time.perf_counter()
+            await sender_layer.group_send(GROUP, {'type': 'chat.message', 'message': f"bench {i}"})
+            await other_layer.receive(theirs)
+            latencies.append(time.perf_counter() - start)
+            await sender_layer.receive(mine)  # sender's own echo
+        return summarize(latencies, broker_ops_per_message=round(sum(ops.values()) / messages, 2))
+    finally:
+        await sender_layer.close()
+        await other_layer.close()
+        LocalBroker.reset('bench')
+
+
+def run(options):
+    results = {}
+    for placement in ('same_worker', 'cross_worker'):
+        for mode, local_delivery in (('local_first', True), ('broker_only', False)):
+            results[f"{placement}_{mode}"] = async_to_sync(_run)(placement, local_delivery, options['messages'])
+    return results
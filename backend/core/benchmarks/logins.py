@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from users import passwords
+from users.models import User
+from . import percentile, summarize
+
+CONCURRENCY = (1, 8)
+PASSWORD = 'bench-login-password'
+
+
+class _LoopLag:
+    """Event loop in a thread that keeps sleeping 5ms; lag is how late it wakes up (what chat sockets feel)."""
+
+    def __init__(self):
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._probe()), daemon=True)
+
+    async def _probe(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            self.samples.append(time.perf_counter() - start - 0.005)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _login(email):
+    client = Client(HTTP_HOST='localhost')
+    try:
+        start = time.perf_counter()
+        response = client.post('/api/users/login/', {'email': email, 'password': PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Login failed with {response.status_code}")
+        return time.perf_counter() - start
+    finally:
+        connections.close_all()
+
+
+def _measure(email, logins, concurrency):
+    with _LoopLag() as lag, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        durations = list(pool.map(_login, [email] * logins))
+        elapsed = time.perf_counter() - start
+    return summarize(durations, concurrency=concurrency, logins_per_sec=round(logins / elapsed, 1),
+                     loop_lag_p99_ms=round(percentile(lag.samples, 99) * 1000, 3) if lag.samples else None)
+
+
+def run(options):
+    email = f"logins-{time.time_ns()}@bench.invalid"
+    User.objects.create_user(email=email, password_hash=passwords.make_password(PASSWORD), full_name='Login Bench')
+    logins = options['iterations']
+    results = {}
+    try:
+        modes = {'inline': 0, 'pool': settings.PASSWORD_HASHING['WORKERS'] or 2}
+        for mode, workers in modes.items():
+            with override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING, 'WORKERS': workers}):
+                _login(email)  # warm-up: spawns the pool workers
+                for concurrency in CONCURRENCY:
+                    results[f"{mode}_c{concurrency}"] = _measure(email, logins, concurrency)
+    finally:
+        User.objects.filter(email=email).delete()
+    return results
@@ -0,0 +1,104 @@
+"""
+Chat latency while the same process serves HTTP reads, all through the ASGI app.
+
+One conversation sends messages one at a time while HTTP_CLIENTS loops
+keep requesting the feed, a post, a profile and the chat history. Runs
+with no HTTP load, with those reads on the DRF views
+(ASYNC_READ_VIEWS=False) and on the async views.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.models import Message
+from . import percentile, summarize
+from .fixtures import bearer, pick_actors
+
+HTTP_CLIENTS = 8
+
+
+async def _get(application, path, headers):
+    communicator = HttpCommunicator(application, 'GET', path, headers=headers)
+    response = await communicator.get_response(30)
+    # Let Django's disconnect listener finish instead of leaving the task pending
+    await communicator.send_input({'type': 'http.disconnect'})
+    await communicator.wait(30)
+    if response['status'] != 200:
+        raise RuntimeError(f"GET {path} returned {response['status']}")
+
+
+async def _http_client(application, paths, auth, stop, durations):
+    headers = [(b'host', b'localhost'), (b'authorization', auth.encode())]
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await _get(application, paths[i % len(paths)], headers)
+        durations.append(time.perf_counter() - start)
+        i += 1
+
+
+async def _connect(application, path):
+    communicator = WebsocketCommunicator(application, path)
+    connected, _ = await communicator.connect()
+    if not connected:
+        raise RuntimeError(f"WebSocket connection to {path} was rejected")
+    return communicator
+
+
+async def _run(application, viewer_id, other_id, tokens, paths, auth, messages, clients):
+    sender = await _connect(application, f"/ws/chat/{other_id}/?token={tokens[0]}")
+    receiver = await _connect(application, f"/ws/chat/{viewer_id}/?token={tokens[1]}")
+    stop, http = asyncio.Event(), []
+    load = [asyncio.create_task(_http_client(application, paths, auth, stop, http)) for _ in range(clients)]
+    try:
+        if clients:
+            await asyncio.sleep(0.5)  # let the HTTP load ramp up
+        http.clear()
+        start = time.perf_counter()
+        latencies = []
+        for i in range(messages):
+            sent = time.perf_counter()
+            await sender.send_to(text_data=json.dumps({'type': 'message', 'message': f"bench mixed {i}"}))
+            await receiver.receive_from(timeout=30)
+            latencies.append(time.perf_counter() - sent)
+            await sender.receive_from(timeout=30)  # sender's own echo
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        await asyncio.gather(*load)
+        await sender.disconnect()
+        await receiver.disconnect()
+
+    extra = {'http_clients': clients}
+    if http:
+        extra.update(http_requests_per_sec=round(len(http) / elapsed, 1),
+                     http_p50_ms=round(percentile(http, 50) * 1000, 3),
+                     http_p99_ms=round(percentile(http, 99) * 1000, 3))
+    return summarize(latencies, **extra)
+
+
+def run(options):
+    from core.asgi import application
+
+    viewer, other, post = pick_actors()
+    tokens = (str(AccessToken.for_user(viewer)), str(AccessToken.for_user(other)))
+    paths = ['/api/posts/posts/', f'/api/posts/posts/{post.id}/', f'/api/users/profile/{other.id}/',
+             f'/api/chat/{other.id}/']
+    messages = options['messages']
+    last_id = Message.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    results = {}
+    try:
+        for case, clients, async_reads in (('idle', 0, True), ('drf_reads', HTTP_CLIENTS, False),
+                                           ('async_reads', HTTP_CLIENTS, True)):
+            with override_settings(ASYNC_READ_VIEWS=async_reads):
+                results[case] = async_to_sync(_run)(application, viewer.id, other.id, tokens, paths,
+                                                    bearer(viewer), messages, clients)
+        return results
+    finally:
+        # Don't leave benchmark traffic behind in the conversation
+        Message.objects.filter(id__gt=last_id, content__startswith='bench ').delete()
@@ -0,0 +1,51 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from . import summarize
+from .fixtures import bearer, pick_actors
+
+
+def endpoints(viewer, other, post):
+    # (name, method, path)
+    return [
+        ('feed', 'get', '/api/posts/posts/'),
+        ('feed_following', 'get', '/api/posts/posts/?feed=following'),
+        ('post_detail', 'get', f'/api/posts/posts/{post.id}/'),
+        ('post_comments', 'get', f'/api/posts/posts/{post.id}/comments/'),
+        ('chat_history', 'get', f'/api/chat/{other.id}/'),
+        ('find_people', 'get', '/api/users/find-people/'),
+        ('user_detail', 'get', f'/api/users/profile/{other.id}/'),
+        ('own_profile', 'get', '/api/users/profile/'),
+        ('like_toggle', 'post', f'/api/posts/posts/{post.id}/like/'),
+        ('follow_toggle', 'post', f'/api/posts/users/{other.id}/follow/'),
+    ]
+
+
+def measure(client, method, path, iterations, **extra):
+    """Time `iterations` requests and count queries across every database alias."""
+    durations, query_counts, status = [], [], None
+    for _ in range(iterations):
+        with ExitStack() as stack:
+            captures = [stack.enter_context(CaptureQueriesContext(conn)) for conn in connections.all()]
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **extra)
+            durations.append(time.perf_counter() - start)
+        query_counts.append(sum(len(c.captured_queries) for c in captures))
+        status = response.status_code
+    return summarize(durations, queries=max(query_counts), status=status)
+
+
+def run(options):
+    viewer, other, post = pick_actors()
+    client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=bearer(viewer))
+    iterations = options['iterations']
+
+    results = {}
+    for name, method, path in endpoints(viewer, other, post):
+        getattr(client, method)(path)  # warm-up: object cache, url resolver, lazy imports
+        results[name] = measure(client, method, path, iterations)
+    return results
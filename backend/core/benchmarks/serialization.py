@@ -0,0 +1,70 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from chat.fast import MESSAGE_VALUES, serialize_messages
+from chat.models import Message
+from chat.serializers import MessageSerializer
+from core.renderers import ORJSONRenderer
+from posts.fast import COMMENT_VALUES, serialize_comments, serialize_posts
+from posts.hydration import hydrate_posts
+from posts.models import Comment, Post
+from posts.serializers import CommentSerializer, PostSerializer
+from . import summarize
+from .fixtures import pick_actors
+
+
+def _request(viewer):
+    request = Request(APIRequestFactory().get('/', HTTP_HOST='localhost'))
+    request.user = viewer
+    return request
+
+
+def cases(request, rows):
+    """(name, drf_callable, fast_callable); each returns rendered bytes for `rows` rows."""
+    posts = Post.objects.select_related('image').order_by('-created_at')[:rows]
+    comments = Comment.objects.order_by('-created_at')[:rows]
+    messages = Message.objects.order_by('-timestamp')[:rows]
+    context = {'request': request}
+    drf, fast = JSONRenderer(), ORJSONRenderer()
+    return [
+        ('posts',
+         lambda: drf.render(PostSerializer(hydrate_posts(list(posts), request.user), many=True, context=context).data),
+         lambda: fast.render(serialize_posts(posts, request))),
+        ('comments',
+         lambda: drf.render(CommentSerializer(comments.select_related('author'), many=True, context=context).data),
+         lambda: fast.render(serialize_comments(comments.values(*COMMENT_VALUES)))),
+        ('messages',
+         lambda: drf.render(MessageSerializer(messages.select_related('sender'), many=True, context=context).data),
+         lambda: fast.render(serialize_messages(messages.values(*MESSAGE_VALUES)))),
+    ]
+
+
+def _time(fn, iterations):
+    fn()  # warm-up
+    durations, size = [], 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        size = len(fn())
+        durations.append(time.perf_counter() - start)
+    return durations, size
+
+
+def run(options):
+    """Fetch + serialize + render `--rows` rows: ModelSerializer/JSONRenderer vs the fast path."""
+    viewer, _, _ = pick_actors()
+    rows = options.get('rows') or 1000
+    iterations = max(1, min(options['iterations'], 20))
+
+    results = {}
+    for name, drf, fast in cases(_request(viewer), rows):
+        for variant, fn in (('drf', drf), ('fast', fast)):
+            durations, size = _time(fn, iterations)
+            mean = sum(durations) / len(durations)
+            results[f"{name}_{variant}"] = summarize(durations, rows=rows, bytes=size, rows_per_sec=round(rows / mean))
+        results[f"{name}_speedup"] = {
+            'x': round(results[f"{name}_drf"]['mean_ms'] / results[f"{name}_fast"]['mean_ms'], 2),
+        }
+    return results
@@ -0,0 +1,183 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+
+
+class LocalLRU:
+    """Small thread-safe LRU with a per-entry TTL, private to this process."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ObjectCache:
+    """
+    Read-through cache for model rows keyed by primary key.
+
+    Lookups go local LRU -> shared cache backend (Redis in production,
+    LocMemCache locally) -> database. Save/delete signals only clear the
+    local tier of the process that made the change, so LOCAL_TTL is kept
+    short to bound staleness in the other workers. Fields named in `defer`
+    (secrets such as password hashes) are never loaded, so they never reach
+    the shared cache; reading one on a cached instance queries the row.
+    """
+
+    instances = []
+
+    def __init__(self, model, ttl=None, local_ttl=None, local_maxsize=None, alias='default', defer=()):
+        config = getattr(settings, 'OBJECT_CACHE', {})
+        self.model = model
+        self.defer = tuple(defer)
+        self.ttl = ttl if ttl is not None else config.get('TTL', 300)
+        self.alias = alias
+        self.local = LocalLRU(
+            maxsize=local_maxsize if local_maxsize is not None else config.get('LOCAL_MAXSIZE', 2048),
+            ttl=local_ttl if local_ttl is not None else config.get('LOCAL_TTL', 30),
+        )
+        self.prefix = f"obj:{model._meta.label_lower}"
+        self._counts = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._counts_lock = threading.Lock()
+        ObjectCache.instances.append(self)
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def make_key(self, pk):
+        return f"{self.prefix}:{pk}"
+
+    def _count(self, name, amount=1):
+        if amount:
+            with self._counts_lock:
+                self._counts[name] += amount
+
+    def get(self, pk):
+        return self.get_many([pk]).get(int(pk))
+
+    def get_many(self, pks):
+        """Return {pk: instance} for the given ids; unknown ids are left out."""
+        pks = {int(pk) for pk in pks}
+
+        # 1. Per-process tier
+        found = self._local_hits(pks)
+
+        # 2. Shared tier, one round trip for the whole batch
+        missing = pks - found.keys()
+        if missing:
+            self._shared_hits(found, missing, self.shared.get_many([self.make_key(pk) for pk in missing]))
+
+        # 3. Database, one query for the rest
+        missing = pks - found.keys()
+        if missing:
+            self._count('misses', len(missing))
+            loaded = {obj.pk: obj for obj in self._queryset(missing)}
+            if loaded:
+                self.shared.set_many({self.make_key(pk): obj for pk, obj in loaded.items()}, timeout=self.ttl)
+                self._loaded(found, loaded)
+
+        return found
+
+    async def aget(self, pk):
+        return (await self.aget_many([pk])).get(int(pk))
+
+    async def aget_many(self, pks):
+        """get_many() for async views: the same three tiers through the async cache and ORM APIs."""
+        pks = {int(pk) for pk in pks}
+        found = self._local_hits(pks)
+
+        missing = pks - found.keys()
+        if missing:
+            self._shared_hits(found, missing, await self.shared.aget_many([self.make_key(pk) for pk in missing]))
+
+        missing = pks - found.keys()
+        if missing:
+            self._count('misses', len(missing))
+            loaded = {obj.pk: obj async for obj in self._queryset(missing)}
+            if loaded:
+                await self.shared.aset_many({self.make_key(pk): obj for pk, obj in loaded.items()}, timeout=self.ttl)
+                self._loaded(found, loaded)
+
+        return found
+
+    def _queryset(self, pks):
+        # Fill from the primary even inside replica-routed requests: a lagging
+        # replica's row would otherwise be shared by every reader for the full TTL
+        manager = self.model._default_manager.db_manager(router.db_for_write(self.model))
+        return manager.defer(*self.defer).filter(pk__in=pks)
+
+    def _local_hits(self, pks):
+        found = {}
+        for pk in pks:
+            obj = self.local.get(self.make_key(pk))
+            if obj is not None:
+                found[pk] = copy.copy(obj)
+        self._count('local_hits', len(found))
+        return found
+
+    def _shared_hits(self, found, missing, shared):
+        for pk in missing:
+            obj = shared.get(self.make_key(pk))
+            if obj is not None:
+                self.local.set(self.make_key(pk), obj)
+                found[pk] = copy.copy(obj)
+                self._count('shared_hits')
+
+    def _loaded(self, found, loaded):
+        for pk, obj in loaded.items():
+            self.local.set(self.make_key(pk), obj)
+            found[pk] = copy.copy(obj)
+
+    def invalidate(self, pk):
+        key = self.make_key(pk)
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear_local(self):
+        self.local.clear()
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self._counts)
+        lookups = sum(counts.values())
+        hits = counts['local_hits'] + counts['shared_hits']
+        counts['hit_rate'] = hits / lookups if lookups else 0.0
+        counts['local_size'] = len(self.local)
+        return counts
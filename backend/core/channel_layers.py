@@ -0,0 +1,305 @@
+"""
+Channel layer that delivers in-process first and uses Redis only across workers.
+
+Every worker keeps its own channels and groups in memory
+(InMemoryChannelLayer) and registers in a shared broker, once per group,
+that it has local members. group_send hands the message straight to the
+local members and publishes one copy per *other* registered worker, so a
+conversation whose sockets all sit on one worker never touches Redis
+beyond a single membership read. Channel names embed the owning worker,
+which is how send() to a channel elsewhere finds the right inbox.
+
+Brokers: RedisBroker in production, LocalBroker as an in-process
+stand-in for tests and benchmarks (several layers sharing one LocalBroker
+behave like several workers sharing Redis).
+"""
+import asyncio
+import logging
+import random
+import string
+import time
+import uuid
+from collections import Counter
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.utils.module_loading import import_string
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BROKER_OPS = registry.counter(
+    'channel_layer_broker_ops_total', "Round trips from the channel layer to its broker", ['op'])
+DELIVERIES = registry.counter(
+    'channel_layer_deliveries_total', "group_send deliveries by path: in-process or via the broker", ['path'])
+READER_ERRORS = registry.counter(
+    'channel_layer_reader_errors_total', "Failed inbox reads and deliveries, retried by the reader task", ['stage'])
+
+
+class LocalBroker:
+    """
+    In-process stand-in for RedisBroker. Instances with the same `name`
+    share state, and `latency` (seconds) is added to every op to mimic a
+    network round trip. `ops` counts calls per op, like BROKER_OPS.
+    `group_expiry` and `receive_timeout` behave as in RedisBroker; both are
+    off by default.
+    """
+
+    _shared = {}
+
+    def __init__(self, name='default', latency=0, group_expiry=None, receive_timeout=None):
+        self.latency = latency
+        self.group_expiry = group_expiry
+        self.receive_timeout = receive_timeout
+        self.refresh_interval = group_expiry / 2 if group_expiry else None
+        state = self._shared.setdefault(name, {'groups': {}, 'expires': {}, 'inboxes': {}, 'ops': Counter()})
+        self.groups, self.expires, self.inboxes, self.ops = (
+            state['groups'], state['expires'], state['inboxes'], state['ops'])
+
+    @classmethod
+    def reset(cls, name='default'):
+        cls._shared.pop(name, None)
+
+    async def _op(self, name):
+        self.ops[name] += 1
+        BROKER_OPS.inc(op=name)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _rebind(self, worker, loop):
+        # An inbox lives on its reader's event loop; tests start a new loop per scenario
+        _, queue = self.inboxes.get(worker, (None, None))
+        fresh = asyncio.Queue()
+        while queue is not None and not queue.empty():
+            fresh.put_nowait(queue.get_nowait())
+        self.inboxes[worker] = (loop, fresh)
+        return fresh
+
+    def _register(self, group, worker):
+        self.groups.setdefault(group, set()).add(worker)
+        if self.group_expiry:
+            self.expires[group] = time.monotonic() + self.group_expiry
+
+    async def add(self, group, worker):
+        await self._op('add')
+        self._register(group, worker)
+
+    async def refresh(self, groups, worker):
+        await self._op('refresh')
+        for group in groups:
+            self._register(group, worker)
+
+    async def discard(self, group, worker):
+        await self._op('discard')
+        self.groups.get(group, set()).discard(worker)
+
+    async def members(self, group):
+        await self._op('members')
+        if self.expires.get(group, float('inf')) < time.monotonic():
+            self.groups.pop(group, None)
+            self.expires.pop(group, None)
+        return set(self.groups.get(group, ()))
+
+    async def publish(self, worker, payload):
+        await self._op('publish')
+        item = msgpack.unpackb(msgpack.packb(payload))  # same round trip as over the wire
+        loop = asyncio.get_running_loop()
+        owner, queue = self.inboxes.get(worker, (None, None))
+        if queue is None or owner.is_closed():
+            owner, queue = loop, self._rebind(worker, loop)
+        if owner is loop:
+            queue.put_nowait(item)
+        else:
+            owner.call_soon_threadsafe(queue.put_nowait, item)
+
+    async def receive(self, worker):
+        loop = asyncio.get_running_loop()
+        owner, queue = self.inboxes.get(worker, (None, None))
+        if owner is not loop:
+            queue = self._rebind(worker, loop)
+        try:
+            return await asyncio.wait_for(queue.get(), self.receive_timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RedisBroker:
+    """
+    Group registry in Redis sets, one list per worker as its inbox (redis-py asyncio client).
+
+    Group sets expire after `group_expiry` so a dead worker's registrations
+    go away; live workers re-register their groups every `refresh_interval`.
+    """
+
+    def __init__(self, url, prefix='layer', group_expiry=86400, inbox_expiry=60, receive_timeout=5):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+        self.group_expiry = group_expiry
+        self.inbox_expiry = inbox_expiry
+        self.receive_timeout = receive_timeout
+        self.refresh_interval = group_expiry / 2
+
+    def _group_key(self, group):
+        return f"{self.prefix}:group:{group}"
+
+    def _inbox_key(self, worker):
+        return f"{self.prefix}:inbox:{worker}"
+
+    async def add(self, group, worker):
+        BROKER_OPS.inc(op='add')
+        async with self.redis.pipeline(transaction=False) as pipe:
+            await pipe.sadd(self._group_key(group), worker).expire(self._group_key(group), self.group_expiry).execute()
+
+    async def refresh(self, groups, worker):
+        BROKER_OPS.inc(op='refresh')
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for group in groups:
+                pipe.sadd(self._group_key(group), worker).expire(self._group_key(group), self.group_expiry)
+            await pipe.execute()
+
+    async def discard(self, group, worker):
+        BROKER_OPS.inc(op='discard')
+        await self.redis.srem(self._group_key(group), worker)
+
+    async def members(self, group):
+        BROKER_OPS.inc(op='members')
+        return {member.decode() for member in await self.redis.smembers(self._group_key(group))}
+
+    async def publish(self, worker, payload):
+        # A dead worker's inbox expires instead of growing forever
+        BROKER_OPS.inc(op='publish')
+        key = self._inbox_key(worker)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            await pipe.rpush(key, msgpack.packb(payload)).expire(key, self.inbox_expiry).execute()
+
+    async def receive(self, worker):
+        """Next inbox payload, or None after `receive_timeout` seconds so the reader can refresh groups."""
+        item = await self.redis.blpop([self._inbox_key(worker)], timeout=self.receive_timeout)
+        return None if item is None else msgpack.unpackb(item[1])
+
+
+class LocalFirstChannelLayer(InMemoryChannelLayer):
+    """
+    CONFIG: {"broker": {"BACKEND": "core.channel_layers.RedisBroker", "URL": ...}}
+    plus the usual InMemoryChannelLayer options. `local_delivery=False`
+    routes every message through the broker (a stock-layer baseline for
+    the `layers` benchmark).
+    """
+
+    # Seconds the inbox reader waits after a broker error, doubling up to the max
+    reader_retry_delay = 0.5
+    reader_max_retry_delay = 10.0
+
+    def __init__(self, broker=None, local_delivery=True, **kwargs):
+        super().__init__(**kwargs)
+        broker = dict(broker or {'BACKEND': 'core.channel_layers.LocalBroker'})
+        backend = import_string(broker.pop('BACKEND'))
+        self.broker = backend(**{key.lower(): value for key, value in broker.items()})
+        self.local_delivery = local_delivery
+        self.worker = f"w{uuid.uuid4().hex[:12]}"
+        self._reader = None
+        self._refreshed_at = time.monotonic()
+
+    def _ensure_reader(self):
+        loop = asyncio.get_running_loop()
+        if self._reader is None or self._reader.done() or self._reader.get_loop() is not loop:
+            self._reader = loop.create_task(self._read_inbox())
+
+    async def _read_inbox(self):
+        # Nothing restarts this task until the next new_channel()/group_add(),
+        # so errors are logged and retried here rather than ending the loop.
+        delay = self.reader_retry_delay
+        while True:
+            try:
+                await self._refresh_groups()
+                payload = await self.broker.receive(self.worker)
+            except Exception:
+                READER_ERRORS.inc(stage='receive')
+                logger.exception("Inbox read for %s failed; retrying in %.1fs", self.worker, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reader_max_retry_delay)
+                continue
+            delay = self.reader_retry_delay
+            if payload is None:
+                continue
+            try:
+                if 'group' in payload:
+                    await self._deliver_to_group(payload['group'], payload['message'])
+                else:
+                    await super().send(payload['channel'], payload['message'])
+            except Exception:
+                READER_ERRORS.inc(stage='deliver')
+                logger.exception("Dropped a message from the inbox of %s", self.worker)
+
+    async def _refresh_groups(self):
+        # Group registrations expire in the broker; renew the ones that still
+        # have local members, or other workers stop publishing to this one
+        interval = self.broker.refresh_interval
+        if not interval or time.monotonic() - self._refreshed_at < interval:
+            return
+        self._clean_expired()
+        if self.groups:
+            await self.broker.refresh(list(self.groups), self.worker)
+        self._refreshed_at = time.monotonic()
+
+    async def _deliver_to_group(self, group, message):
+        # Straight into the local queues; InMemoryChannelLayer.group_send would re-enter send()
+        self._clean_expired()
+        channels = list(self.groups.get(group, ()))
+        DELIVERIES.inc(len(channels), path='local')
+        for channel in channels:
+            try:
+                await super().send(channel, message)
+            except ChannelFull:
+                pass
+
+    @staticmethod
+    def owner(channel):
+        """Worker id embedded in a channel name from new_channel(), or None for plain names."""
+        if '!' not in channel:
+            return None
+        return channel.split('!', 1)[0].rsplit('.', 1)[-1]
+
+    async def new_channel(self, prefix="specific."):
+        self._ensure_reader()
+        suffix = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        return f"{prefix}{self.worker}!{suffix}"
+
+    async def send(self, channel, message):
+        owner = self.owner(channel)
+        if owner is None or (owner == self.worker and self.local_delivery):
+            await super().send(channel, message)
+        else:
+            self.require_valid_channel_name(channel)
+            await self.broker.publish(owner, {'channel': channel, 'message': message})
+
+    async def group_add(self, group, channel):
+        first = group not in self.groups
+        await super().group_add(group, channel)
+        if first:
+            self._ensure_reader()
+            await self.broker.add(group, self.worker)
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        if group not in self.groups:
+            await self.broker.discard(group, self.worker)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        workers = await self.broker.members(group)
+        if self.local_delivery:
+            workers.discard(self.worker)
+            await self._deliver_to_group(group, message)
+        DELIVERIES.inc(len(workers), path='remote')
+        for worker in workers:
+            await self.broker.publish(worker, {'group': group, 'message': message})
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
@@ -0,0 +1,47 @@
+"""Scrape-time collectors that turn existing stats into /metrics lines."""
+from .cache import ObjectCache
+from .db_pool import pool_stats
+
+
+def object_cache_metrics():
+    lines = [
+        "# HELP object_cache_lookups_total Object cache lookups by tier outcome.",
+        "# TYPE object_cache_lookups_total counter",
+    ]
+    for cache in ObjectCache.instances:
+        stats = cache.stats()
+        for outcome in ('local_hits', 'shared_hits', 'misses'):
+            lines.append(f'object_cache_lookups_total{{cache="{cache.prefix}",outcome="{outcome}"}} {stats[outcome]}')
+    lines += [
+        "# HELP object_cache_local_entries Entries held in the per-process tier.",
+        "# TYPE object_cache_local_entries gauge",
+    ]
+    for cache in ObjectCache.instances:
+        lines.append(f'object_cache_local_entries{{cache="{cache.prefix}"}} {len(cache.local)}')
+    return lines
+
+
+# psycopg_pool stat -> (metric name, type)
+POOL_METRICS = {
+    'requests_num': ('db_pool_checkouts_total', 'counter'),
+    'requests_wait_ms': ('db_pool_wait_ms_total', 'counter'),
+    'requests_queued': ('db_pool_queued_checkouts_total', 'counter'),
+    'requests_errors': ('db_pool_checkout_errors_total', 'counter'),
+    'connections_num': ('db_pool_connections_opened_total', 'counter'),
+    'connections_lost': ('db_pool_connections_lost_total', 'counter'),
+    'pool_size': ('db_pool_size', 'gauge'),
+    'pool_available': ('db_pool_available', 'gauge'),
+    'requests_waiting': ('db_pool_waiting', 'gauge'),
+}
+
+
+def db_pool_metrics():
+    stats = pool_stats()
+    if not stats:
+        return []
+    lines = []
+    for key, (name, kind) in POOL_METRICS.items():
+        lines.append(f"# TYPE {name} {kind}")
+        for alias, values in stats.items():
+            lines.append(f'{name}{{alias="{alias}"}} {values.get(key, 0)}')
+    return lines
@@ -0,0 +1,22 @@
+from django.db import connections
+
+
+def pool_stats():
+    """
+    Return {alias: stats} for every database whose psycopg pool has been opened.
+
+    Pools are shared by all threads of the process. `requests_num` counts
+    checkouts and `requests_wait_ms` is the total time callers spent waiting
+    for a free connection (see the psycopg_pool docs for the other keys).
+    """
+    stats = {}
+    for conn in connections.all():
+        if conn.vendor != 'postgresql' or not conn.settings_dict.get('OPTIONS', {}).get('pool'):
+            continue
+        # Read the already-open pool; `conn.pool` would create one as a side effect.
+        # `_connection_pools` is Django-private (5.1+), so tolerate it moving.
+        pools = getattr(conn, '_connection_pools', None)
+        pool = pools.get(conn.alias) if isinstance(pools, dict) else None
+        if pool is not None:
+            stats[conn.alias] = pool.get_stats()
+    return stats
@@ -0,0 +1,95 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# True while the current request/task may read from a replica.
+# asgiref copies context into sync_to_async threads, so this follows the request.
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _pin_key(user_id):
+    return f"db_pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Keep this user's reads on the primary for REPLICA_STICKY_SECONDS (read-your-writes)."""
+    if user_id and replica_aliases():
+        cache.set(_pin_key(user_id), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(user_id) and bool(cache.get(_pin_key(user_id)))
+
+
+async def ais_pinned(user_id):
+    return bool(user_id) and bool(await cache.aget(_pin_key(user_id)))
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_primary():
+    """Step out of replica routing, e.g. to build something that goes into a shared cache."""
+    return read_from_replica(False)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a replica only inside `read_from_replica()` (normally via
+    ReplicaReadMixin). Everything else, including all writes, uses `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        known = {'default', *replica_aliases()}
+        if obj1._state.db in known and obj2._state.db in known:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    For read-mostly DRF views: safe requests read from a replica unless the
+    user wrote recently (see pin_to_primary / PrimaryStickinessMiddleware).
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = None
+        if request.method in SAFE_METHODS and replica_aliases() and not is_pinned(request.user.id):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
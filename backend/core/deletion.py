@@ -0,0 +1,173 @@
+"""
+Soft delete now, purge later.
+
+Deleting a post or an account only stamps `deleted_at` inside the request.
+The rows hanging off it (likes, saves, comments, follows, messages and the
+notifications pointing at it through a generic relation) are removed by a
+background job in bounded batches, one short transaction per batch, so a
+popular post or a busy account never holds long locks. `sweep` finishes
+purges a crashed worker left behind and drops notifications whose target
+no longer exists; it backs `manage.py sweep_orphans`.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from chat.models import ArchivedMessage, Message, RoomMembership
+from notifications.models import Notification
+from posts.cache import post_cache
+from posts.models import AuthorDailyStats, Comment, Follow, Post
+from uploads.models import ImageAsset
+from .workers import thread_pool
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """Delete the rows of `queryset` batch_size at a time; returns rows deleted."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            model._base_manager.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def _in_background(purge, pk):
+    # Only after commit: a rolled-back delete must not purge anything
+    transaction.on_commit(lambda: thread_pool('purge', 1).submit(_run, purge, pk))
+
+
+def _run(purge, pk):
+    try:
+        purge(pk)
+    except Exception:
+        logger.exception("%s(%s) failed; sweep_orphans will retry it", purge.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def soft_delete_post(post):
+    post.deleted_at = timezone.now()
+    post.save(update_fields=['deleted_at'])
+    _in_background(purge_post, post.pk)
+
+
+def soft_delete_user(user):
+    now = timezone.now()
+    with transaction.atomic():
+        user.deleted_at = now
+        user.is_active = False
+        user.save(update_fields=['deleted_at', 'is_active'])
+        # Hide their posts in the same transaction; the purge removes them
+        post_ids = list(Post.objects.filter(author=user).values_list('pk', flat=True))
+        Post.all_objects.filter(pk__in=post_ids).update(deleted_at=now)
+    for pk in post_ids:
+        post_cache.invalidate(pk)
+    _in_background(purge_user, user.pk)
+
+
+def _notifications_about(model, ids):
+    return Notification.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id__in=ids)
+
+
+def purge_post(post_id, batch_size=None):
+    """Remove a soft-deleted post and everything hanging off it; returns rows deleted per kind."""
+    if not Post.all_objects.deleted().filter(pk=post_id).exists():
+        return None
+    comments = Comment.objects.filter(post_id=post_id)
+    counts = {
+        'notifications': (delete_in_batches(_notifications_about(Post, [post_id]), batch_size)
+                          + delete_in_batches(_notifications_about(Comment, comments.values('pk')), batch_size)),
+        'comments': delete_in_batches(comments, batch_size),
+        'likes': delete_in_batches(Post.liked_by.through.objects.filter(post_id=post_id), batch_size),
+        'saves': delete_in_batches(Post.saved_by.through.objects.filter(post_id=post_id), batch_size),
+    }
+    Post.all_objects.filter(pk=post_id).delete()
+    return counts
+
+
+def purge_user(user_id, batch_size=None):
+    """Remove a soft-deleted account, its posts and everything else it owns; returns rows deleted per kind."""
+    if not User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        return None
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+
+    # A post created by a request still in flight during soft_delete_user is live; hide it too
+    live = list(Post.objects.filter(author_id=user_id).values_list('pk', flat=True))
+    Post.all_objects.filter(pk__in=live).update(deleted_at=timezone.now())
+    for pk in live:
+        post_cache.invalidate(pk)
+
+    # Keyset over the ids so the loop always moves on, even past a post purge_post skipped
+    posts, last = 0, 0
+    own_posts = Post.all_objects.deleted().filter(author_id=user_id).order_by('pk').values_list('pk', flat=True)
+    while ids := list(own_posts.filter(pk__gt=last)[:batch_size]):
+        for pk in ids:
+            purge_post(pk, batch_size)
+        posts += len(ids)
+        last = ids[-1]
+
+    counts = {
+        'posts': posts,
+        'notifications': delete_in_batches(
+            Notification.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)), batch_size),
+        'comments': delete_in_batches(Comment.objects.filter(author_id=user_id), batch_size),
+        'likes': delete_in_batches(Post.liked_by.through.objects.filter(user_id=user_id), batch_size),
+        'saves': delete_in_batches(Post.saved_by.through.objects.filter(user_id=user_id), batch_size),
+        'follows': delete_in_batches(
+            Follow.objects.filter(Q(follower_id=user_id) | Q(following_id=user_id)), batch_size),
+        'messages': (
+            delete_in_batches(Message.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)), batch_size)
+            + delete_in_batches(
+                ArchivedMessage.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)), batch_size)),
+        'room_memberships': delete_in_batches(RoomMembership.objects.filter(user_id=user_id), batch_size),
+        'images': delete_in_batches(ImageAsset.objects.filter(owner_id=user_id), batch_size),
+        'daily_stats': delete_in_batches(AuthorDailyStats.objects.filter(author_id=user_id), batch_size),
+    }
+    User.objects.filter(pk=user_id).delete()
+    return counts
+
+
+def orphaned_notifications():
+    """Notifications whose generic target row is gone, one queryset per content type."""
+    for content_type_id in Notification.objects.order_by().values_list('content_type', flat=True).distinct():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        pending = Notification.objects.filter(content_type_id=content_type_id)
+        if model is not None:
+            pending = pending.exclude(object_id__in=model._base_manager.values('pk'))
+        yield pending
+
+
+def sweep(batch_size=None, dry_run=False, log=None):
+    """Finish outstanding purges and delete orphaned notifications; returns counts per kind."""
+    log = log or (lambda msg: None)
+    posts = Post.all_objects.deleted().values_list('pk', flat=True)
+    users = User.objects.filter(deleted_at__isnull=False).values_list('pk', flat=True)
+    if dry_run:
+        return {'posts': posts.count(), 'users': users.count(),
+                'notifications': sum(pending.count() for pending in orphaned_notifications())}
+
+    counts = {'posts': 0, 'users': 0, 'notifications': 0}
+    for pk in list(users):
+        purge_user(pk, batch_size)
+        counts['users'] += 1
+        log(f"purged user {pk}")
+    for pk in list(posts):
+        purge_post(pk, batch_size)
+        counts['posts'] += 1
+        log(f"purged post {pk}")
+    for pending in orphaned_notifications():
+        counts['notifications'] += delete_in_batches(pending, batch_size)
+    return counts
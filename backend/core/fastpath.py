@@ -0,0 +1,15 @@
+"""
+Helpers for the dict-building read paths that bypass ModelSerializer on hot
+endpoints. Values must match what the equivalent DRF fields would output.
+"""
+from django.utils import timezone
+
+
+def drf_datetime(value):
+    # Same output as DRF's DateTimeField with the default ISO-8601 format
+    if not value:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
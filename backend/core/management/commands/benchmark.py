@@ -0,0 +1,69 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.benchmarks import SUITES, compare, get_suite
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Run latency/throughput benchmarks against the configured database "
+        "(seed it first with `seed_data`). Writes JSON so runs can be compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', default=['rest', 'chat'], help=f"One or more of: {', '.join(SUITES)}")
+        parser.add_argument('--iterations', type=int, default=50, help="Requests per REST endpoint.")
+        parser.add_argument('--messages', type=int, default=200, help="Messages per chat scenario.")
+        parser.add_argument('--rows', type=int, default=1000, help="Rows per serialization case.")
+        parser.add_argument('--rate-limits', action='store_true',
+                            help="Keep token-bucket rate limits on (they are disabled by default).")
+        parser.add_argument('--output', help="Write results to this JSON file (default: stdout).")
+        parser.add_argument('--compare', help="Previous results file to diff against.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['suites']) - SUITES.keys()
+        if unknown:
+            raise CommandError(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+
+        report = {
+            'meta': {
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'git_revision': _git_revision(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'options': {k: options[k] for k in ('suites', 'iterations', 'messages', 'rows', 'rate_limits')},
+            },
+            'results': {},
+        }
+        # Benchmarks deliberately exceed per-user write and frame limits
+        with override_settings(RATE_LIMIT_ENABLED=options['rate_limits']):
+            for name in options['suites']:
+                self.stderr.write(f"Running {name} benchmarks...")
+                report['results'][name] = get_suite(name)(options)
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(payload)
+            self.stderr.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            for line in compare(report, baseline):
+                self.stdout.write(line)
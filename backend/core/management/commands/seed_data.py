@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.seed import SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = "Bulk-seed synthetic users, follows, posts, likes, comments, messages and notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--follows-per-user', type=int, default=10)
+        parser.add_argument('--posts-per-user', type=int, default=3)
+        parser.add_argument('--likes-per-post', type=int, default=5)
+        parser.add_argument('--comments-per-post', type=int, default=2)
+        parser.add_argument('--messages', type=int, default=1000)
+        parser.add_argument('--notifications', type=int, default=500)
+        parser.add_argument('--days', type=int, default=30, help="Spread timestamps over this many days.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for reproducible data.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = seed(
+                users=options['users'],
+                follows_per_user=options['follows_per_user'],
+                posts_per_user=options['posts_per_user'],
+                likes_per_post=options['likes_per_post'],
+                comments_per_post=options['comments_per_post'],
+                messages=options['messages'],
+                notifications=options['notifications'],
+                days=options['days'],
+                batch_size=options['batch_size'],
+                rng_seed=options['seed'],
+                log=self.stdout.write,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(created.values())} rows. Seed users log in with password '{SEED_PASSWORD}'."
+        ))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.deletion import sweep
+
+
+class Command(BaseCommand):
+    help = (
+        "Finish purging soft-deleted posts and users, then delete notifications "
+        "whose target no longer exists. Safe to run repeatedly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PURGE_BATCH_SIZE,
+                            help="Rows deleted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be removed.")
+
+    def handle(self, *args, **options):
+        counts = sweep(batch_size=options['batch_size'], dry_run=options['dry_run'], log=self.stdout.write)
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {counts['posts']} posts, {counts['users']} users and "
+            f"{counts['notifications']} orphaned notifications."
+        ))
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+import whitenoise.middleware
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_routers import pin_to_primary
+from .metrics import COUNT_BUCKETS, registry
+
+logger = logging.getLogger('core.metrics')
+
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Request latency by view.', ['view', 'method'])
+REQUEST_COUNT = registry.counter(
+    'http_requests_total', 'Requests by view, method and status.', ['view', 'method', 'status'])
+REQUEST_QUERIES = registry.histogram(
+    'http_request_db_queries', 'SQL queries per request by view.', ['view'], buckets=COUNT_BUCKETS)
+QUERY_DURATION = registry.histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request by view.', ['view'])
+DUPLICATE_QUERIES = registry.counter(
+    'db_duplicate_queries_total', 'Queries repeating an earlier fingerprint within the same request.', ['view'])
+N_PLUS_ONE = registry.counter(
+    'db_n_plus_one_suspected_total', 'Requests where one query fingerprint repeated past the N+1 threshold.',
+    ['view', 'fingerprint'])
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Stable id for a query shape; IN lists of any length collapse together."""
+    normalized = _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql).strip())
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+class QueryRecorder:
+    """DB execute wrapper collecting count, time and fingerprints of every query."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            key, normalized = fingerprint(sql)
+            self.fingerprints[key] += 1
+            self.samples.setdefault(key, normalized)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-view latency and query histograms plus N+1 detection.
+
+    A fingerprint seen at least QUERY_N_PLUS_ONE_THRESHOLD times in one
+    request is flagged and logged with its SQL. Set REQUEST_METRICS_LOG to
+    also emit one JSON log line per request on the `core.metrics` logger.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self._install(stack, recorder)
+            response = self.get_response(request)
+        self._observe(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        # Async views run their queries on the request's sync_to_async thread, whose connections differ from ours
+        recorder = QueryRecorder()
+        stack = ExitStack()
+        await sync_to_async(self._install)(stack, recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._observe(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _install(stack, recorder):
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(recorder))
+
+    def _observe(self, request, response, recorder, elapsed):
+        view = view_label(request)
+        REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        REQUEST_COUNT.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(recorder.count, view=view)
+        QUERY_DURATION.observe(recorder.duration, view=view)
+
+        threshold = settings.QUERY_N_PLUS_ONE_THRESHOLD
+        duplicates = sum(n - 1 for n in recorder.fingerprints.values() if n > 1)
+        if duplicates:
+            DUPLICATE_QUERIES.inc(duplicates, view=view)
+        suspects = {key: n for key, n in recorder.fingerprints.items() if n >= threshold}
+        for key, n in suspects.items():
+            N_PLUS_ONE.inc(view=view, fingerprint=key)
+            logger.warning("Possible N+1 in %s: %d x [%s] %s", view, n, key, recorder.samples[key][:300])
+
+        if settings.REQUEST_METRICS_LOG:
+            logger.info(json.dumps({
+                'event': 'request',
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 3),
+                'queries': recorder.count,
+                'db_ms': round(recorder.duration * 1000, 3),
+                'duplicate_queries': duplicates,
+                'n_plus_one': suspects,
+            }))
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Pins a user to the primary database after a successful write so their
+    next reads don't hit a lagging replica. Runs after DRF has authenticated
+    the request, since DRF copies the JWT user onto the Django request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._is_write(request, response):
+            self._pin(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._is_write(request, response):
+            # request.user may still be the lazy session user, which queries
+            await sync_to_async(self._pin)(request)
+        return response
+
+    @staticmethod
+    def _is_write(request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400
+
+    @staticmethod
+    def _pin(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.id)
+
+
+class WhiteNoiseMiddleware(whitenoise.middleware.WhiteNoiseMiddleware):
+    """WhiteNoise that stays async under ASGI; the stock one is sync-only and would put every request on a thread."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,92 @@
+"""
+Index operations that don't block writes on PostgreSQL.
+
+A plain CREATE/DROP INDEX locks the table against writes for the whole
+build. On PostgreSQL these run CONCURRENTLY instead (the migration must
+set `atomic = False`); other backends get the stock operation.
+ReplaceIndexOnline changes an index's definition without a window in
+which queries run unindexed.
+"""
+from django.db.migrations.operations import AddIndex, RemoveIndex
+from django.db.migrations.operations.base import Operation
+
+
+def _concurrently(schema_editor):
+    return {'concurrently': True} if schema_editor.connection.vendor == 'postgresql' else {}
+
+
+class AddIndexOnline(AddIndex):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **_concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **_concurrently(schema_editor))
+
+
+class RemoveIndexOnline(RemoveIndex):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            schema_editor.remove_index(model, index, **_concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            schema_editor.add_index(model, index, **_concurrently(schema_editor))
+
+
+class ReplaceIndexOnline(Operation):
+    """
+    Redefine the index named `index.name`: build the new definition under a
+    temporary name, drop the old index, then rename the new one into place
+    (ALTER INDEX ... RENAME is instant). The old index serves reads until the
+    new one is ready.
+    """
+    reversible = True
+
+    def __init__(self, model_name, index):
+        self.model_name = model_name
+        self.index = index
+
+    @property
+    def model_name_lower(self):
+        return self.model_name.lower()
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {'model_name': self.model_name, 'index': self.index}
+
+    def state_forwards(self, app_label, state):
+        state.remove_index(app_label, self.model_name_lower, self.index.name)
+        state.add_index(app_label, self.model_name_lower, self.index)
+
+    def _swap(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        old = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.index.name)
+        new = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.index.name)
+        building = new.clone()
+        building.name = f"{new.name}_new"
+        schema_editor.add_index(model, building, **_concurrently(schema_editor))
+        schema_editor.remove_index(model, old, **_concurrently(schema_editor))
+        # Drops and rebuilds on backends that can't rename (SQLite), a plain rename elsewhere
+        schema_editor.rename_index(model, building, new)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._swap(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._swap(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f"Rebuild index {self.index.name} on {self.model_name} online"
+
+    @property
+    def migration_name_fragment(self):
+        return f"replace_{self.model_name_lower}_{self.index.name.lower()}"
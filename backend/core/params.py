@@ -0,0 +1,24 @@
+from rest_framework.exceptions import ValidationError
+
+
+def parse_id_list(request, name='ids', limit=None):
+    """
+    Parse `?ids=3,1,2` into a de-duplicated list of ints, keeping the
+    client's order. Raises a 400 on junk or when more than `limit` ids are sent.
+    """
+    raw = request.query_params.get(name, '')
+    ids = []
+    seen = set()
+    for part in filter(None, (p.strip() for p in raw.split(','))):
+        # isdigit() alone lets through '²' and other digits int() rejects
+        if not (part.isascii() and part.isdigit()):
+            raise ValidationError({name: f"'{part}' is not a valid id."})
+        value = int(part)
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    if not ids:
+        raise ValidationError({name: "Provide a comma-separated list of ids."})
+    if limit is not None and len(ids) > limit:
+        raise ValidationError({name: f"At most {limit} ids per request."})
+    return ids
@@ -0,0 +1,134 @@
+"""
+Token-bucket rate limiting in the shared cache.
+
+Each scope in settings.RATE_LIMITS configures a bucket per user and/or
+per client IP as (tokens per second, burst). On Redis a bucket is
+refilled and charged by a single Lua script, so all workers share one
+exact count. Other cache backends fall back to get/set under a process
+lock, which is exact only within one process (fine for LocMemCache in
+development).
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import registry
+
+DECISIONS = registry.counter(
+    'rate_limit_decisions_total', 'Token-bucket decisions by scope, bucket key type and outcome.',
+    ['scope', 'key', 'decision'])
+
+_LUA = """
+local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+return {allowed, tostring(tokens)}
+"""
+
+_local_lock = threading.Lock()
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    retry_after: float = 0.0
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, alias='default'):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.alias = alias
+        # Idle buckets are full again after this long, so they can expire
+        self.ttl = math.ceil(self.burst / self.rate) + 1
+
+    def take(self, key, cost=1):
+        cache = caches[self.alias]
+        now = time.time()
+        if isinstance(cache, RedisCache):
+            client = cache._cache.get_client(write=True)
+            allowed, tokens = client.eval(_LUA, 1, cache.make_and_validate_key(key),
+                                          self.rate, self.burst, now, cost, self.ttl)
+            allowed, tokens = bool(allowed), float(tokens)
+        else:
+            with _local_lock:
+                tokens, ts = cache.get(key) or (self.burst, now)
+                tokens = min(self.burst, tokens + max(0.0, now - ts) * self.rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                cache.set(key, (tokens, now), self.ttl)
+        return Decision(allowed, 0.0 if allowed else (cost - tokens) / self.rate)
+
+
+def client_ip(forwarded_for, remote_addr):
+    """
+    The client address as seen by the last TRUSTED_PROXY_HOPS proxies: the
+    entry they appended to X-Forwarded-For, never the client-supplied part
+    to its left. With no proxies (or no header) the socket's peer address.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if not hops or not forwarded_for:
+        return remote_addr
+    addrs = [addr.strip() for addr in forwarded_for.split(',')]
+    return addrs[-min(hops, len(addrs))] or remote_addr
+
+
+def check(scope, user_id=None, ip=None, cost=1):
+    """Charge every bucket configured for `scope`; denied if any of them is empty."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return Decision(True)
+    config = settings.RATE_LIMITS[scope]
+    verdict = Decision(True)
+    for key_type, ident in (('user', user_id), ('ip', ip)):
+        if ident is None or key_type not in config:
+            continue
+        rate, burst = config[key_type]
+        decision = TokenBucket(rate, burst).take(f"rl:{scope}:{key_type}:{ident}", cost)
+        DECISIONS.inc(scope=scope, key=key_type, decision='allowed' if decision.allowed else 'limited')
+        if not decision.allowed:
+            verdict = Decision(False, max(verdict.retry_after, decision.retry_after))
+    return verdict
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle for writes: unsafe methods are charged against the view's
+    `rate_limit_scope` (default "writes") per user and per client IP.
+    """
+    default_scope = 'writes'
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        user = getattr(request, 'user', None)
+        decision = check(
+            getattr(view, 'rate_limit_scope', self.default_scope),
+            user_id=user.pk if user is not None and user.is_authenticated else None,
+            ip=self.get_ident(request),
+        )
+        self.retry_after = decision.retry_after
+        return decision.allowed
+
+    def get_ident(self, request):
+        # Same resolution as ChatConsumer, so REST and WebSocket share the per-IP buckets
+        return client_ip(request.META.get('HTTP_X_FORWARDED_FOR'), request.META.get('REMOTE_ADDR'))
+
+    def wait(self):
+        return self.retry_after
@@ -0,0 +1,166 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from chat.models import Message
+from notifications.models import Notification
+from posts.models import Comment, Follow, Post
+from users.models import User
+
+SEED_PASSWORD = 'seed-password'
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    # bulk_create still applies auto_now_add, which would give every seeded
+    # row the same timestamp; switch it off so rows can be spread over time.
+    # The flag lives on the shared model field, so keep this around the
+    # bulk_create call only and never while serving requests.
+    saved = [(field, field.auto_now_add) for field in fields]
+    try:
+        for field, _ in saved:
+            field.auto_now_add = False
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _bulk_create_dated(model, rows, field_name, batch_size):
+    with manual_timestamps(model._meta.get_field(field_name)):
+        return model.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def _spread(count, days):
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+    return sorted(now - timedelta(seconds=random.uniform(0, span)) for _ in range(count))
+
+
+def seed(users=100, follows_per_user=10, posts_per_user=3, likes_per_post=5,
+         comments_per_post=2, messages=1000, notifications=500, days=30,
+         batch_size=1000, rng_seed=None, log=None):
+    """
+    Bulk-insert synthetic data and return {table: rows_created}.
+
+    Follows and likes skip duplicates, so their counts are read back from
+    the database rather than taken from the generated lists.
+
+    Every seeded user shares SEED_PASSWORD, hashed once.
+    """
+    if rng_seed is not None:
+        random.seed(rng_seed)
+    log = log or (lambda msg: None)
+    created = {}
+
+    # 1. Users
+    start = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+    password = make_password(SEED_PASSWORD)
+    new_users = User.objects.bulk_create(
+        [
+            User(email=f"seed{start + i}@example.com", full_name=f"Seed User {start + i}", password=password)
+            for i in range(users)
+        ],
+        batch_size=batch_size,
+    )
+    user_ids = [user.id for user in new_users]
+    created['users'] = len(user_ids)
+    log(f"users: {len(user_ids)}")
+    if len(user_ids) < 2:
+        return created
+
+    # 2. Follows
+    follows = []
+    for follower in user_ids:
+        candidates = random.sample(user_ids, min(follows_per_user + 1, len(user_ids)))
+        for following in [uid for uid in candidates if uid != follower][:follows_per_user]:
+            follows.append(Follow(follower_id=follower, following_id=following))
+    Follow.objects.bulk_create(follows, batch_size=batch_size, ignore_conflicts=True)
+    # The users are new, so every follow row that mentions them was just inserted
+    created['follows'] = Follow.objects.filter(follower_id__in=user_ids).count()
+    log(f"follows: {created['follows']}")
+
+    # 3. Posts
+    post_times = _spread(len(user_ids) * posts_per_user, days)
+    posts = _bulk_create_dated(
+        Post,
+        [
+            Post(
+                author_id=random.choice(user_ids),
+                caption=f"Seed post {i}",
+                media_url=f"https://picsum.photos/seed/{i}/1080/1080",
+                media_type='image',
+                created_at=created_at,
+            )
+            for i, created_at in enumerate(post_times)
+        ],
+        'created_at',
+        batch_size,
+    )
+    post_ids = [post.id for post in posts]
+    created['posts'] = len(post_ids)
+    log(f"posts: {len(post_ids)}")
+
+    # 4. Likes (M2M through rows)
+    Like = Post.liked_by.through
+    likes = [
+        Like(post_id=post_id, user_id=user_id)
+        for post_id in post_ids
+        for user_id in random.sample(user_ids, min(likes_per_post, len(user_ids)))
+    ]
+    Like.objects.bulk_create(likes, batch_size=batch_size, ignore_conflicts=True)
+    created['likes'] = Like.objects.filter(post_id__in=post_ids).count()
+    log(f"likes: {created['likes']}")
+
+    # 5. Comments
+    comment_times = _spread(len(post_ids) * comments_per_post, days)
+    _bulk_create_dated(
+        Comment,
+        [
+            Comment(post_id=random.choice(post_ids), author_id=random.choice(user_ids),
+                    content=f"Seed comment {i}", created_at=created_at)
+            for i, created_at in enumerate(comment_times)
+        ],
+        'created_at',
+        batch_size,
+    )
+    created['comments'] = len(comment_times)
+    log(f"comments: {len(comment_times)}")
+
+    # 6. Messages, mostly between people who follow each other
+    message_rows = []
+    for i, timestamp in enumerate(_spread(messages, days)):
+        pair = random.choice(follows) if follows else None
+        sender, receiver = (pair.follower_id, pair.following_id) if pair else random.sample(user_ids, 2)
+        if random.random() < 0.5:
+            sender, receiver = receiver, sender
+        message_rows.append(Message(sender_id=sender, receiver_id=receiver,
+                                    content=f"Seed message {i}", timestamp=timestamp))
+    _bulk_create_dated(Message, message_rows, 'timestamp', batch_size)
+    created['messages'] = len(message_rows)
+    log(f"messages: {len(message_rows)}")
+
+    # 7. Notifications pointing at seeded posts
+    post_type = ContentType.objects.get_for_model(Post)
+    post_authors = dict(Post.objects.filter(id__in=post_ids).values_list('id', 'author_id'))
+    notification_rows = []
+    for created_at in _spread(notifications, days):
+        post_id = random.choice(post_ids)
+        notification_rows.append(Notification(
+            sender_id=random.choice(user_ids),
+            receiver_id=post_authors[post_id],
+            notification_type=random.choice(['like', 'comment']),
+            content_type=post_type,
+            object_id=post_id,
+            text="Seed notification",
+            created_at=created_at,
+        ))
+    _bulk_create_dated(Notification, notification_rows, 'created_at', batch_size)
+    created['notifications'] = len(notification_rows)
+    log(f"notifications: {len(notification_rows)}")
+
+    return created
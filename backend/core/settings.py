@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 import dj_database_url
 
 
@@ -34,28 +35,34 @@ INSTALLED_APPS = [
     'channels',
     
     # Internal Apps
+    'core',
     'users',
     'posts',
     'chat',
     'notifications',
+    'uploads',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', # Keep this at the top
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.WhiteNoiseMiddleware',  # async-capable: keeps the async views off threads
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.PrimaryStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
 
 # Crucial: Link to our custom user model
 AUTH_USER_MODEL = 'users.User'
+# Same as ModelBackend, with password hashing in a process pool (users/passwords.py)
+AUTHENTICATION_BACKENDS = ['users.backends.PooledPasswordBackend']
 
 TEMPLATES = [
     {
@@ -82,6 +89,48 @@ DATABASES = {
     )
 }
 
+# Read replicas: comma-separated URLs, exposed as replica_1, replica_2, ...
+# Tests mirror them onto the default test database.
+DATABASE_REPLICAS = []
+for index, replica_url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), start=1):
+    alias = f"replica_{index}"
+    DATABASES[alias] = dj_database_url.parse(replica_url.strip())
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(alias)
+
+# `manage.py test` always has a replica_1 alias (a second connection to the
+# default test database) so the replica routing tests run without a replica.
+# It only takes reads when a test puts it in DATABASE_REPLICAS.
+if sys.argv[1:2] == ["test"] and "replica_1" not in DATABASES:
+    DATABASES["replica_1"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+
+# After a write, the user's reads stay on the primary for this many seconds
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
+# Postgres connection pooling (psycopg 3 pool, Django 5.1+).
+# Under daphne every sync view and database_sync_to_async call runs on a
+# worker thread, so size the pool to at least ASGI_THREADS.
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+DB_POOL_ENABLED = ConnectionPool is not None and os.environ.get("DB_POOL", "True") == "True"
+
+for db_config in DATABASES.values():
+    if DB_POOL_ENABLED and db_config.get("ENGINE") == "django.db.backends.postgresql":
+        db_config["CONN_MAX_AGE"] = 0  # pooling and persistent connections are mutually exclusive
+        db_config.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", os.environ.get("ASGI_THREADS", 10))),
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),  # max wait for a free connection
+            "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+            "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 300)),
+            "check": ConnectionPool.check_connection,  # health check on every checkout
+        }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -124,6 +173,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    # Token buckets on every unsafe request (core/ratelimit.py, RATE_LIMITS below)
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.ratelimit.TokenBucketThrottle',
+    ),
+    # orjson when installed, stock JSON otherwise (see core/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 from datetime import timedelta
@@ -151,6 +209,20 @@ if REDIS_URL:
             },
         },
     }
+    # In-process delivery for sockets on the same worker, Redis only across workers (core/channel_layers.py)
+    if os.environ.get("CHANNEL_LAYER_LOCAL_FIRST", "True") == "True":
+        CHANNEL_LAYERS["default"] = {
+            "BACKEND": "core.channel_layers.LocalFirstChannelLayer",
+            "CONFIG": {
+                "broker": {"BACKEND": "core.channel_layers.RedisBroker", "URL": REDIS_URL},
+            },
+        }
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
 else:
     # Development (Localhost) - Use In-Memory (No Redis needed!)
     CHANNEL_LAYERS = {
@@ -158,7 +230,124 @@ else:
             "BACKEND": "channels.layers.InMemoryChannelLayer"
         }
     }
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
+# Two-tier object cache (core/cache.py): per-process LRU in front of CACHES["default"]
+OBJECT_CACHE = {
+    "TTL": int(os.environ.get("OBJECT_CACHE_TTL", 300)),
+    "LOCAL_TTL": int(os.environ.get("OBJECT_CACHE_LOCAL_TTL", 30)),
+    "LOCAL_MAXSIZE": int(os.environ.get("OBJECT_CACHE_LOCAL_MAXSIZE", 2048)),
+}
+
+# Registration/login password hashing (users/passwords.py). WORKERS=0 hashes inline.
+PASSWORD_HASHING = {
+    "WORKERS": int(os.environ.get("PASSWORD_WORKERS", 2)),
+    "TIMEOUT": 10,
+}
+
+# GET /api/users/<id>/profile-page/ (users/profile_page.py)
+PROFILE_PAGE_POSTS = 12
+PROFILE_PAGE_CACHE_TTL = int(os.environ.get("PROFILE_PAGE_CACHE_TTL", 300))
+
+# Post impressions (posts/impressions.py): buffered per process, flushed in batches.
+# FLUSH_INTERVAL=0 disables the background flusher.
+IMPRESSIONS = {
+    "FLUSH_INTERVAL": float(os.environ.get("IMPRESSIONS_FLUSH_INTERVAL", 10)),
+    "MAX_PENDING": 5000,  # distinct (day, post) counters before an early flush
+    "BATCH_SIZE": 500,  # posts or authors per UPDATE
+}
+
+# Serve GETs on the feed, post detail, user detail and chat history from the
+# async views (core/asyncapi.py); False sends them to the DRF views again
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS", "True") == "True"
+
+# ==============================================================================
+# OBSERVABILITY
+# ==============================================================================
+# /metrics requires "Authorization: Bearer <METRICS_TOKEN>"; with no token it 404s unless DEBUG
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+# Flag a request as N+1 when one query shape runs at least this many times
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get("QUERY_N_PLUS_ONE_THRESHOLD", 10))
+# One JSON line per request on the core.metrics logger
+REQUEST_METRICS_LOG = os.environ.get("REQUEST_METRICS_LOG", "False") == "True"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "core.metrics": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
 
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# Max ids per /posts/batch/ and /users/batch/ request
+BATCH_MAX_IDS = 300
+
+# Upper bound for ?comments=N on the post feed
+FEED_EMBEDDED_COMMENTS_MAX = 10
+
+# Missed-message replay when a chat socket reconnects with ?last_message_id=
+CHAT_RESYNC = {
+    "BATCH_SIZE": 100,
+    "MAX_MESSAGES": 1000,  # beyond this the client falls back to ChatHistoryView
+}
+
+# Online status (chat/presence.py). Sockets refresh their key at least every
+# HEARTBEAT seconds; a key that misses TTL seconds of heartbeats reads as offline.
+PRESENCE = {
+    "TTL": 60,
+    "HEARTBEAT": 25,
+    "LAST_SEEN_TTL": 30 * 24 * 3600,
+    "BATCH_INTERVAL": 1.0,  # presence-change frames are coalesced per socket
+    "MAX_SUBSCRIPTIONS": 200,
+}
+
+# Proxies in front of daphne (Railway/Render: one). Per-IP limits use the
+# X-Forwarded-For entry the nearest of these appended; 0 ignores the header.
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", "1"))
+
+# Token-bucket limits per scope: {key type: (tokens per second, burst)}.
+# "writes" covers every unsafe REST request unless a view sets rate_limit_scope.
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "True") == "True"
+RATE_LIMITS = {
+    "writes": {"user": (2, 30), "ip": (10, 100)},
+    "register": {"ip": (0.05, 5)},  # sign-up and OTP checks: 3/min after a burst of 5
+    "chat_frames": {"user": (5, 40), "ip": (25, 200)},
+    "impressions": {"user": (1, 20), "ip": (5, 100)},  # clients batch ids, see PostImpressionsView
+}
+
+# Group chat rooms (chat.Room)
+ROOM_MAX_MEMBERS = 500
+
+# Close the socket (code 4429) after this many dropped frames in a row
+CHAT_FRAME_DROP_LIMIT = 20
+
+# Messages older than this move to chat_archivedmessage (manage.py archive_messages)
+CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get("CHAT_ARCHIVE_AFTER_DAYS", 180))
+
+# Rows deleted per transaction when purging soft-deleted posts and users (core.deletion)
+PURGE_BATCH_SIZE = 500
+
+MEDIA_URL = "/media/"
+MEDIA_ROOT = Path(os.environ.get("MEDIA_ROOT", BASE_DIR / "media"))
+# Uploaded originals and their variants are served from MEDIA_ROOT by Django
+# itself (also when DEBUG is off). Set SERVE_MEDIA=False once a proxy, CDN or
+# bucket answers MEDIA_URL instead; MEDIA_ROOT must then be synced to it.
+SERVE_MEDIA = os.environ.get("SERVE_MEDIA", "True") == "True"
+
+# Background image variants (uploads app). WORKERS=0 processes inline.
+IMAGE_PIPELINE = {
+    "WORKERS": int(os.environ.get("IMAGE_WORKERS", 2)),
+    "WIDTHS": [320, 640, 1080],
+    "FORMATS": ["webp", "jpeg"],
+    "QUALITY": 80,
+    "MAX_UPLOAD_BYTES": 10 * 1024 * 1024,
+}
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
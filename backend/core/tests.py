@@ -0,0 +1,683 @@
+import asyncio
+import json
+import re
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.fast import MESSAGE_VALUES
+from chat.models import ArchivedMessage, Message, Room
+from notifications.models import Notification
+from posts.fast import COMMENT_VALUES, POST_VALUES
+from posts.models import Comment, Follow, Post
+from users.models import User
+from users.cache import user_cache
+from . import db_pool, deletion, metrics, ratelimit, seed
+from .cache import ObjectCache
+from .middleware import N_PLUS_ONE, REQUEST_COUNT, RequestMetricsMiddleware, fingerprint
+from .channel_layers import LocalBroker, LocalFirstChannelLayer
+from .db_routers import ReplicaRouter, is_pinned, pin_to_primary, read_from_replica
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={
+    'writes': {'user': (1, 3), 'ip': (100, 100)},
+    'register': {'ip': (1, 2)},
+})
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_refill(self):
+        bucket = ratelimit.TokenBucket(rate=2, burst=3)
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            self.assertEqual([bucket.take('k').allowed for _ in range(4)], [True, True, True, False])
+            self.assertAlmostEqual(bucket.take('k').retry_after, 0.5)
+        with mock.patch('core.ratelimit.time.time', return_value=1001.0):
+            self.assertEqual([bucket.take('k').allowed for _ in range(3)], [True, True, False])
+
+    def test_writes_are_limited_per_user_and_reads_are_not(self):
+        user = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        post = Post.objects.create(author=user, caption='hi', media_url='https://example.com/a.jpg')
+        client = APIClient()
+        client.force_authenticate(user)
+        limited = ratelimit.DECISIONS.value(scope='writes', key='user', decision='limited')
+
+        codes = [client.post(f'/api/posts/posts/{post.id}/like/').status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+        self.assertEqual(client.get('/api/posts/posts/').status_code, 200)
+        self.assertEqual(ratelimit.DECISIONS.value(scope='writes', key='user', decision='limited'), limited + 1)
+
+    def test_registration_uses_its_own_ip_scope(self):
+        client = APIClient()
+        codes = [client.post('/api/users/register/', {}, format='json').status_code for _ in range(3)]
+        self.assertEqual(codes[-1], 429)
+        self.assertNotIn(429, codes[:2])
+
+    @override_settings(TRUSTED_PROXY_HOPS=1)
+    def test_client_ip_comes_from_the_trusted_proxy_hop(self):
+        self.assertEqual(ratelimit.client_ip('6.6.6.6, 1.2.3.4', '10.0.0.1'), '1.2.3.4')
+        self.assertEqual(ratelimit.client_ip(None, '10.0.0.1'), '10.0.0.1')
+        with override_settings(TRUSTED_PROXY_HOPS=0):
+            self.assertEqual(ratelimit.client_ip('1.2.3.4', '10.0.0.1'), '10.0.0.1')
+
+        # Rotating the client-supplied part of the header does not open a new bucket
+        client = APIClient()
+        codes = [client.post('/api/users/register/', {}, format='json',
+                             HTTP_X_FORWARDED_FOR=f'6.6.6.{i}, 1.2.3.4').status_code for i in range(3)]
+        self.assertEqual(codes[-1], 429)
+
+
+class MetricsTests(TestCase):
+    def test_registry_renders_prometheus_text(self):
+        registry = metrics.Registry()
+        hits = registry.counter('hits_total', 'Hits.', ['path'])
+        hits.inc(path='/a"b')
+        hits.inc(2, path='/a"b')
+        latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+        text = registry.render()
+        self.assertIn('hits_total{path="/a\\"b"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count 3', text)
+        with self.assertRaises(ValueError):
+            registry.histogram('hits_total', 'Clash.')
+        with self.assertRaises(ValueError):
+            hits.inc(view='x')
+
+    @override_settings(QUERY_N_PLUS_ONE_THRESHOLD=3)
+    def test_middleware_records_queries_and_flags_n_plus_one(self):
+        def view(request):
+            for pk in range(3):
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(view)
+        requests = REQUEST_COUNT.value(view='unmatched', method='GET', status=200)
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            middleware(RequestFactory().get('/anything'))
+        self.assertEqual(REQUEST_COUNT.value(view='unmatched', method='GET', status=200), requests + 1)
+        self.assertIn('Possible N+1 in unmatched: 3 x', logs.output[0])
+        key = re.search(r'\[(\w+)\]', logs.output[0]).group(1)
+        self.assertEqual(N_PLUS_ONE.value(view='unmatched', fingerprint=key), 1)
+        # IN lists of any length share one fingerprint
+        self.assertEqual(fingerprint('SELECT 1 WHERE id IN (%s)'), fingerprint('SELECT 1 WHERE id IN (%s, %s)'))
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_endpoint_is_closed_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_endpoint_requires_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer nope').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE http_requests_total counter', response.content)
+
+
+class DbPoolTests(TestCase):
+    def _fake_connection(self, pooled=True, pools=None):
+        conn = mock.Mock(vendor='postgresql', alias='default', spec=['vendor', 'alias', 'settings_dict', '_connection_pools'])
+        conn.settings_dict = {'OPTIONS': {'pool': {'min_size': 1}} if pooled else {}}
+        if pools is None:
+            del conn._connection_pools
+        else:
+            conn._connection_pools = pools
+        return conn
+
+    def test_endpoint_is_empty_without_pooling(self):
+        admin = User.objects.create_user(email='admin@example.com', password='pw', full_name='Admin', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/internal/db-pool/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {})
+
+    def test_endpoint_is_admin_only(self):
+        user = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get('/api/internal/db-pool/').status_code, 403)
+
+    def test_reads_only_open_pools_and_tolerates_missing_internals(self):
+        pool = mock.Mock()
+        pool.get_stats.return_value = {'pool_size': 2, 'requests_num': 5}
+        cases = [
+            (self._fake_connection(pools={'default': pool}), {'default': {'pool_size': 2, 'requests_num': 5}}),
+            (self._fake_connection(pools={}), {}),
+            (self._fake_connection(pooled=False, pools={'default': pool}), {}),
+            (self._fake_connection(pools=None), {}),
+        ]
+        for conn, expected in cases:
+            with self.subTest(expected=expected), mock.patch.object(db_pool.connections, 'all', return_value=[conn]):
+                self.assertEqual(db_pool.pool_stats(), expected)
+
+
+class BatchEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.posts = [Post.objects.create(author=self.bob, caption=f'p{i}') for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_posts_come_back_in_request_order_with_missing_ids(self):
+        first, second, third = (post.id for post in self.posts)
+        self.client.get(f'/api/posts/posts/batch/?ids={second}')  # cached before the delete
+        deletion.soft_delete_post(self.posts[1])
+        response = self.client.get(f'/api/posts/posts/batch/?ids={third},999999,{first},{second},{third}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['id'] for post in response.json()['results']], [third, first])
+        self.assertEqual(response.json()['missing'], [999999, second])
+
+    def test_users_come_back_in_request_order_with_missing_ids(self):
+        response = self.client.get(f'/api/users/batch/?ids={self.bob.id},999999,{self.alice.id}')
+        self.assertEqual([user['id'] for user in response.json()['results']], [self.bob.id, self.alice.id])
+        self.assertEqual(response.json()['missing'], [999999])
+
+    @override_settings(BATCH_MAX_IDS=2)
+    def test_junk_and_oversized_lists_are_rejected(self):
+        for query in ('', 'ids=', 'ids=1,x', 'ids=1,%C2%B2', 'ids=-1', 'ids=1,2,3'):
+            with self.subTest(query=query):
+                for path in ('/api/posts/posts/batch/', '/api/users/batch/'):
+                    self.assertEqual(self.client.get(f'{path}?{query}').status_code, 400)
+
+
+class ObjectCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear_local()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.users = ObjectCache(User, defer=('password',))
+        self.addCleanup(ObjectCache.instances.remove, self.users)
+
+    def test_lookups_go_local_then_shared_then_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.users.get(self.alice.id).full_name, 'Alice')
+        with self.assertNumQueries(0):
+            self.users.get(self.alice.id)  # local tier
+            self.users.clear_local()
+            self.users.get(self.alice.id)  # shared tier
+        with self.assertNumQueries(1):  # unknown ids are not cached
+            self.assertEqual(self.users.get_many([self.alice.id, 999999]).keys(), {self.alice.id})
+        stats = self.users.stats()
+        self.assertEqual((stats['misses'], stats['local_hits'], stats['shared_hits']), (2, 2, 1))
+        self.assertEqual(stats['local_size'], 1)
+
+    def test_deferred_secrets_never_reach_the_shared_cache(self):
+        user_cache.get(self.alice.id)
+        cached = cache.get(user_cache.make_key(self.alice.id))
+        self.assertNotIn('password', cached.__dict__)
+        self.assertNotIn('password', user_cache.get(self.alice.id).__dict__)
+
+    def test_saves_invalidate_both_tiers(self):
+        user_cache.get(self.alice.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.full_name = 'Alice B'
+            self.alice.save()
+        self.assertIsNone(cache.get(user_cache.make_key(self.alice.id)))
+        self.assertEqual(user_cache.get(self.alice.id).full_name, 'Alice B')
+
+
+class DeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.post = Post.objects.create(author=self.bob, caption='hello')
+        self.post.liked_by.add(self.alice)  # signal creates a 'like' notification
+        for i in range(3):
+            Comment.objects.create(post=self.post, author=self.alice, content=f'c{i}')
+        self.client = APIClient()
+
+    def test_post_delete_hides_now_and_purges_in_batches(self):
+        self.client.force_authenticate(self.bob)
+        with mock.patch.object(deletion, 'thread_pool') as pool, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/posts/posts/{self.post.id}/').status_code, 204)
+        pool.return_value.submit.assert_called_once_with(deletion._run, deletion.purge_post, self.post.id)
+        self.assertEqual(self.client.get(f'/api/posts/posts/{self.post.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/posts/posts/').json(), [])
+        self.assertEqual(Comment.objects.count(), 3)
+
+        counts = deletion.purge_post(self.post.id, batch_size=2)
+        self.assertEqual(counts, {'notifications': 4, 'comments': 3, 'likes': 1, 'saves': 0})
+        self.assertFalse(Post.all_objects.filter(id=self.post.id).exists())
+        self.assertFalse(Notification.objects.exists())
+
+    def test_live_posts_are_never_purged(self):
+        self.assertIsNone(deletion.purge_post(self.post.id))
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_account_delete_deactivates_then_purges_everything_it_owns(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='hi')
+        other = Post.objects.create(author=self.alice, caption='mine')
+        Comment.objects.create(post=other, author=self.bob, content='nice')
+        self.client.force_authenticate(self.bob)
+        with mock.patch.object(deletion, 'thread_pool') as pool, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete('/api/users/profile/').status_code, 204)
+        pool.return_value.submit.assert_called_once_with(deletion._run, deletion.purge_user, self.bob.id)
+        self.bob.refresh_from_db()
+        self.assertFalse(self.bob.is_active)
+        self.assertFalse(Post.objects.filter(author=self.bob).exists())
+
+        counts = deletion.purge_user(self.bob.id, batch_size=2)
+        self.assertEqual((counts['posts'], counts['follows'], counts['messages'], counts['comments']), (1, 1, 1, 1))
+        self.assertFalse(User.objects.filter(id=self.bob.id).exists())
+        self.assertEqual(list(Post.all_objects.all()), [other])
+        self.assertFalse(Notification.objects.exists())
+
+    def test_purge_user_also_removes_posts_created_after_soft_delete(self):
+        User.objects.filter(id=self.bob.id).update(deleted_at='2024-01-01T00:00:00Z', is_active=False)
+        Post.objects.create(author=self.bob, caption='in flight')  # still live
+        counts = deletion.purge_user(self.bob.id, batch_size=1)
+        self.assertEqual(counts['posts'], 2)
+        self.assertFalse(Post.all_objects.filter(author_id=self.bob.id).exists())
+        self.assertFalse(User.objects.filter(id=self.bob.id).exists())
+
+    def test_sweep_finishes_pending_purges_and_drops_orphans(self):
+        Post.all_objects.filter(id=self.post.id).update(deleted_at='2024-01-01T00:00:00Z')
+        Notification.objects.create(sender=self.alice, receiver=self.bob, notification_type='like',
+                                    content_type=ContentType.objects.get_for_model(Post), object_id=999999)
+        self.assertEqual(deletion.sweep(dry_run=True), {'posts': 1, 'users': 0, 'notifications': 1})
+
+        call_command('sweep_orphans', '--batch-size', '2', stdout=StringIO())
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Notification.objects.exists())
+
+
+class LocalFirstChannelLayerTests(TestCase):
+    def setUp(self):
+        LocalBroker.reset('test')
+        self.addCleanup(LocalBroker.reset, 'test')
+        config = {'BACKEND': 'core.channel_layers.LocalBroker', 'NAME': 'test'}
+        # Two layers on one stand-in broker behave like two workers sharing Redis
+        self.a = LocalFirstChannelLayer(broker=config)
+        self.b = LocalFirstChannelLayer(broker=config)
+        self.ops = self.a.broker.ops
+
+    def test_group_send_publishes_once_per_remote_worker(self):
+        async def scenario():
+            a1, a2, b1 = await self.a.new_channel(), await self.a.new_channel(), await self.b.new_channel()
+            for layer, channel in ((self.a, a1), (self.a, a2), (self.b, b1)):
+                await layer.group_add('chat_1_2', channel)
+            self.ops.clear()
+            await self.a.group_send('chat_1_2', {'type': 'chat.message', 'n': 1})
+            return [await self.a.receive(a1), await self.a.receive(a2), await self.b.receive(b1)]
+
+        self.assertEqual(async_to_sync(scenario)(), [{'type': 'chat.message', 'n': 1}] * 3)
+        self.assertEqual(self.ops, {'members': 1, 'publish': 1})
+
+    def test_local_only_group_never_publishes(self):
+        async def scenario():
+            a1, a2 = await self.a.new_channel(), await self.a.new_channel()
+            await self.a.group_add('chat_1_2', a1)
+            await self.a.group_add('chat_1_2', a2)
+            self.ops.clear()
+            await self.a.group_send('chat_1_2', {'type': 'chat.message'})
+            await self.a.receive(a2)
+            await self.a.group_discard('chat_1_2', a1)
+            await self.a.group_discard('chat_1_2', a2)
+
+        async_to_sync(scenario)()
+        self.assertEqual(self.ops, {'members': 1, 'discard': 1})
+
+    def test_send_to_a_channel_on_another_worker(self):
+        async def scenario():
+            b1 = await self.b.new_channel()
+            await self.a.send(b1, {'type': 'presence.changed'})
+            return await self.b.receive(b1)
+
+        self.assertEqual(async_to_sync(scenario)(), {'type': 'presence.changed'})
+        self.assertEqual(self.ops['publish'], 1)
+
+    def test_live_groups_are_re_registered_before_they_expire(self):
+        config = {'BACKEND': 'core.channel_layers.LocalBroker', 'NAME': 'test',
+                  'GROUP_EXPIRY': 0.2, 'RECEIVE_TIMEOUT': 0.02}
+        a, b = LocalFirstChannelLayer(broker=config), LocalFirstChannelLayer(broker=config)
+
+        async def scenario():
+            b1 = await b.new_channel()
+            await b.group_add('presence_1', b1)
+            await asyncio.sleep(0.5)  # more than twice the expiry, with no new joins
+            await a.group_send('presence_1', {'type': 'presence.changed'})
+            message = await asyncio.wait_for(b.receive(b1), timeout=1)
+            await b.close()
+            return message
+
+        self.assertEqual(async_to_sync(scenario)(), {'type': 'presence.changed'})
+        self.assertGreaterEqual(self.ops['refresh'], 2)
+
+    def test_groups_without_a_live_worker_expire(self):
+        broker = LocalBroker('test', group_expiry=0.05)
+
+        async def scenario():
+            await broker.add('presence_1', 'w-gone')
+            await asyncio.sleep(0.1)
+            return await broker.members('presence_1')
+
+        self.assertEqual(async_to_sync(scenario)(), set())
+
+    def test_reader_survives_broker_errors(self):
+        receive = self.b.broker.receive
+        failures = [ConnectionError('connection reset'), ConnectionError('connection reset')]
+
+        async def flaky_receive(worker):
+            if failures:
+                raise failures.pop(0)
+            return await receive(worker)
+
+        async def scenario():
+            b1 = await self.b.new_channel()
+            await self.a.send(b1, {'type': 'presence.changed'})
+            message = await asyncio.wait_for(self.b.receive(b1), timeout=5)
+            await self.b.close()
+            return message
+
+        with mock.patch.object(self.b.broker, 'receive', flaky_receive), \
+                mock.patch.object(self.b, 'reader_retry_delay', 0.01), \
+                self.assertLogs('core.channel_layers', 'ERROR') as logs:
+            self.assertEqual(async_to_sync(scenario)(), {'type': 'presence.changed'})
+        self.assertEqual(failures, [])
+        self.assertEqual(len(logs.records), 2)
+
+
+class SeedTests(TestCase):
+    def test_counts_match_the_rows_inserted(self):
+        created_fields = [Post._meta.get_field('created_at'), Message._meta.get_field('timestamp')]
+        # Ask for more follows and likes than 4 users allow; the report must match the tables
+        created = seed.seed(users=4, follows_per_user=10, posts_per_user=2, likes_per_post=10,
+                            comments_per_post=2, messages=20, notifications=10, rng_seed=3)
+
+        Like = Post.liked_by.through
+        self.assertEqual(created, {
+            'users': User.objects.count(),
+            'follows': Follow.objects.count(),
+            'posts': Post.objects.count(),
+            'likes': Like.objects.count(),
+            'comments': Comment.objects.count(),
+            'messages': Message.objects.count(),
+            'notifications': Notification.objects.count(),
+        })
+        self.assertEqual(created['follows'], 4 * 3)
+        self.assertEqual(created['likes'], 8 * 4)
+        self.assertGreater(Post.objects.values('created_at').distinct().count(), 1)
+        self.assertTrue(all(field.auto_now_add for field in created_fields))
+
+    def test_auto_now_add_is_restored_when_the_insert_fails(self):
+        field = Post._meta.get_field('created_at')
+        with mock.patch.object(Post.objects, 'bulk_create', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            seed.seed(users=2, rng_seed=1)
+        self.assertTrue(field.auto_now_add)
+
+    def test_benchmark_harness_runs_and_compares(self):
+        seed.seed(users=6, follows_per_user=3, posts_per_user=2, messages=30, notifications=10, rng_seed=5)
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command('benchmark', 'rest', 'serialization', iterations=2, rows=10,
+                         output=output.name, stderr=StringIO())
+            report = json.load(output)
+            out = StringIO()
+            call_command('benchmark', 'serialization', iterations=1, rows=10, compare=output.name,
+                         stdout=out, stderr=StringIO())
+
+        self.assertEqual(set(report['results']), {'rest', 'serialization'})
+        self.assertEqual({case['status'] for case in report['results']['rest'].values()} - {201}, {200})
+        self.assertIn('posts_fast', report['results']['serialization'])
+        self.assertIn('serialization.posts_fast.p50_ms:', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('benchmark', 'nope')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+
+    def test_reads_stay_on_primary_by_default(self):
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_reads_use_replica_inside_replica_context(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Post), 'replica_1')
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_writes_always_use_primary(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+    def test_pin_is_per_user(self):
+        pin_to_primary(1)
+        self.assertTrue(is_pinned(1))
+        self.assertFalse(is_pinned(2))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingViewTests(TransactionTestCase):
+    # replica_1 mirrors the default test database (see DATABASES in settings), so
+    # this runs on SQLite too. TransactionTestCase so rows are committed and
+    # visible through the replica's own connection.
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='reader@example.com', password='pw', full_name='Reader')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_read_only_view_reads_from_replica(self):
+        with CaptureQueriesContext(connections['replica_1']) as replica_queries:
+            response = self.client.get('/api/users/find-people/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_queries.captured_queries)
+
+    def test_async_read_view_reads_from_replica(self):
+        Post.objects.create(author=self.user, caption='replicated')
+        with CaptureQueriesContext(connections['replica_1']) as replica_queries:
+            response = self.client.get('/api/posts/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['caption'] for post in response.json()], ['replicated'])
+        self.assertTrue(replica_queries.captured_queries)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        response = self.client.post('/api/posts/posts/', {'caption': 'hello'})
+        self.assertEqual(response.status_code, 201)
+
+        with CaptureQueriesContext(connections['replica_1']) as replica_queries:
+            response = self.client.get('/api/posts/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica_queries.captured_queries, [])
+        self.assertEqual(len(response.json()), 1)
+
+    def replica_reads_of(self, table, queries):
+        return [query['sql'] for query in queries if f'FROM "{table}"' in query['sql']]
+
+    def test_object_cache_fills_from_the_primary(self):
+        author = User.objects.create_user(email='author@example.com', password='pw', full_name='Before')
+        # Written on the primary; the invalidation mirrors what post_save/on_commit does
+        User.objects.filter(id=author.id).update(full_name='After')
+        user_cache.invalidate(author.id)
+        user_cache.clear_local()
+
+        for async_reads in (True, False):
+            with self.subTest(async_reads=async_reads), override_settings(ASYNC_READ_VIEWS=async_reads), \
+                    CaptureQueriesContext(connections['replica_1']) as replica_queries:
+                cache.clear()
+                user_cache.clear_local()
+                detail = self.client.get(f'/api/users/profile/{author.id}/')
+            self.assertEqual(detail.json()['full_name'], 'After')
+            self.assertEqual(user_cache.get(author.id).full_name, 'After')
+            self.assertEqual(self.replica_reads_of('users_user', replica_queries.captured_queries), [])
+
+
+    def test_profile_page_is_built_from_the_primary(self):
+        author = User.objects.create_user(email='author@example.com', password='pw', full_name='Author')
+        Post.objects.create(author=author, caption='first')
+
+        with CaptureQueriesContext(connections['replica_1']) as replica_queries:
+            page = self.client.get(f'/api/users/{author.id}/profile-page/').json()
+        self.assertEqual((page['posts_count'], page['posts'][0]['caption']), (1, 'first'))
+        # Likes and the viewer's follow state may come from the replica; the cached part may not
+        for table in ('users_user', 'posts_post'):
+            self.assertEqual(self.replica_reads_of(table, replica_queries.captured_queries), [])
+        follows = self.replica_reads_of('posts_follow', replica_queries.captured_queries)
+        self.assertEqual([sql for sql in follows if 'COUNT' in sql], [])
+        self.assertTrue(replica_queries.captured_queries)
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN every hot query against a seeded database and fail on full
+    table scans or sorts, so a dropped index or a reworded query shows up
+    here instead of in production latency.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed.seed(users=20, follows_per_user=5, posts_per_user=3, messages=200, notifications=100, rng_seed=7)
+        message = Message.objects.order_by('id').first()
+        cls.user_id, cls.other_id = message.sender_id, message.receiver_id
+        cls.post_id = Comment.objects.values_list('post_id', flat=True).first()
+        cls.room_id = Room.objects.create(name='plan').id
+        cls.cursor_ts = message.timestamp
+
+    def plan_problems(self, queryset):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Tiny test tables make a seq scan cheapest; ask whether an index path exists at all
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            bad = re.compile(r'Seq Scan|\bSort\b')
+        else:
+            bad = re.compile(r'\bSCAN \S+$|TEMP B-TREE')
+        return [line.strip() for line in plan.splitlines() if bad.search(line.strip())]
+
+    def hot_queries(self):
+        between = Message.objects.between(self.user_id, self.other_id).order_by('timestamp', 'id')
+        return {
+            'feed': Post.objects.order_by('-created_at').values(*POST_VALUES)[:20],
+            'profile_posts': Post.objects.filter(author_id=self.user_id).order_by('-created_at', '-id')
+                .values(*POST_VALUES)[:12],
+            'comment_page': Comment.objects.filter(post_id=self.post_id).order_by('-created_at', '-id')
+                .values(*COMMENT_VALUES)[:20],
+            'comment_page_next': Comment.objects.filter(post_id=self.post_id).filter(
+                Q(created_at__lt=self.cursor_ts) | Q(created_at=self.cursor_ts, id__lt=10**9),
+            ).order_by('-created_at', '-id').values(*COMMENT_VALUES)[:21],
+            'conversation_page': between.values(*MESSAGE_VALUES)[:50],
+            'conversation_resync': between.filter(id__gt=1).values(*MESSAGE_VALUES)[:100],
+            'conversation_resync_next': between.filter(
+                Q(timestamp__gt=self.cursor_ts) | Q(timestamp=self.cursor_ts, id__gt=1), id__gt=1,
+            ).values(*MESSAGE_VALUES)[:100],
+            'archived_conversation': ArchivedMessage.objects.between(self.user_id, self.other_id)
+                .order_by('timestamp', 'id')[:50],
+            'room_page': Message.objects.in_room(self.room_id).order_by('timestamp', 'id').values(*MESSAGE_VALUES)[:50],
+            'notifications': Notification.objects.filter(receiver_id=self.user_id)[:20],
+            'followers_page': Follow.objects.filter(following_id=self.user_id).order_by('-id')[:20],
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(query=name):
+                self.assertEqual(self.plan_problems(queryset), [])
+
+
+class IndexMigrationTests(TransactionTestCase):
+    def test_replaced_indexes_are_built_before_the_old_ones_drop(self):
+        out = StringIO()
+        call_command('sqlmigrate', 'posts', '0007', stdout=out)
+        sql = out.getvalue()
+        self.assertLess(sql.index('CREATE INDEX "comment_post_created_idx_new"'),
+                        sql.index('DROP INDEX "comment_post_created_idx"'))
+
+
+class AsyncReadViewTests(TestCase):
+    """The async GET views must answer exactly like the DRF views they replace."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.post = Post.objects.create(author=self.bob, caption='hi', media_url='https://example.com/a.jpg')
+        Post.objects.create(author=self.alice, caption='mine', media_url='https://example.com/b.jpg')
+        self.post.liked_by.add(self.alice)
+        Comment.objects.create(post=self.post, author=self.alice, content='nice')
+        self.messages = [Message.objects.create(sender=self.alice, receiver=self.bob, content=f'm{i}') for i in range(5)]
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.alice)}')
+
+    def both(self, path, client=None):
+        client = client or self.client
+        with override_settings(ASYNC_READ_VIEWS=False):
+            drf = client.get(path)
+        response = client.get(path)
+        self.assertEqual((response.status_code, response.json()), (drf.status_code, drf.json()))
+        self.assertEqual(response.get('WWW-Authenticate'), drf.get('WWW-Authenticate'))
+        return response
+
+    def test_responses_match_the_drf_views(self):
+        for path in ('/api/posts/posts/?comments=2', '/api/posts/posts/?feed=following',
+                     f'/api/posts/posts/?author={self.bob.id}', f'/api/posts/posts/{self.post.id}/',
+                     f'/api/users/profile/{self.bob.id}/', f'/api/chat/{self.bob.id}/?limit=2&offset=1',
+                     f'/api/chat/{self.bob.id}/?limit=2&around={self.messages[3].id}'):
+            with self.subTest(path=path):
+                self.assertEqual(self.both(path).status_code, 200)
+
+    def test_errors_match_the_drf_views(self):
+        anonymous = APIClient()
+        self.assertEqual(self.both(f'/api/chat/{self.bob.id}/', anonymous).status_code, 401)
+        self.assertEqual(self.both('/api/posts/posts/', anonymous).status_code, 200)
+        self.assertEqual(self.both('/api/posts/posts/', APIClient(HTTP_AUTHORIZATION='Bearer nope')).status_code, 401)
+        self.assertEqual(self.both('/api/posts/posts/999999/').status_code, 404)
+        self.bob.deleted_at = self.post.created_at
+        self.bob.save()
+        self.assertEqual(self.both(f'/api/users/profile/{self.bob.id}/').status_code, 404)
+
+    @mock.patch.object(ratelimit.TokenBucketThrottle, 'wait', return_value=7)
+    @mock.patch.object(ratelimit.TokenBucketThrottle, 'allow_request', return_value=False)
+    def test_throttled_responses_match_the_drf_views(self, allow_request, wait):
+        for path in ('/api/posts/posts/', f'/api/posts/posts/{self.post.id}/', f'/api/users/profile/{self.bob.id}/',
+                     f'/api/chat/{self.bob.id}/'):
+            with self.subTest(path=path):
+                with override_settings(ASYNC_READ_VIEWS=False):
+                    drf = self.client.get(path)
+                response = self.both(path)
+                self.assertEqual(response.status_code, 429)
+                self.assertEqual(response['Retry-After'], drf['Retry-After'])
+
+    def test_writes_still_go_to_drf(self):
+        response = self.client.post('/api/posts/posts/', {'caption': 'new', 'media_url': 'https://example.com/c.jpg'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.delete(f'/api/posts/posts/{self.post.id}/').status_code, 403)
+
+    def test_middleware_keeps_async_views_off_threads(self):
+        # One sync-only middleware makes Django run the whole view chain in a thread again
+        for path in settings.MIDDLEWARE:
+            with self.subTest(middleware=path):
+                self.assertTrue(getattr(import_string(path), 'async_capable', False))
@@ -1,9 +1,20 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+from . import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/posts/', include('posts.urls')),
     path('api/chat/', include('chat.urls')),
-]
\ No newline at end of file
+    path('api/uploads/', include('uploads.urls')),
+    path('api/internal/db-pool/', views.db_pool_stats, name='db-pool-stats'),
+    path('metrics', views.metrics, name='metrics'),
+]
+
+if settings.SERVE_MEDIA:
+    # static() only mounts under DEBUG; image variant and LQIP URLs must resolve in production too
+    urlpatterns += [
+        re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", views.media, name='media'),
+    ]
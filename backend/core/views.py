@@ -0,0 +1,37 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.static import serve
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .db_pool import pool_stats
+from .metrics import registry
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request):
+    return Response(pool_stats())
+
+
+def metrics(request):
+    # Prometheus text exposition for this worker process. Without a token it is
+    # only served in DEBUG: the output names views, query shapes and internals.
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def media(request, path):
+    # Uploaded originals and image variants (SERVE_MEDIA); MEDIA_ROOT is read per request
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    # Stored names are never rewritten in place, so clients may keep them for a day
+    response['Cache-Control'] = 'public, max-age=86400'
+    return response
@@ -0,0 +1,43 @@
+"""
+Named, bounded worker pools shared by the whole process.
+
+Process pools use the "spawn" start method: daphne runs an event loop and
+a thread pool, and forking a multi-threaded process is unsafe.
+"""
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _get_or_create(name, factory):
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = factory()
+        return pool
+
+
+def process_pool(name, max_workers, initializer=None, initargs=()):
+    return _get_or_create(name, lambda: ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=initializer,
+        initargs=initargs,
+    ))
+
+
+def thread_pool(name, max_workers):
+    return _get_or_create(name, lambda: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name))
+
+
+@atexit.register
+def shutdown_pools():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY on PostgreSQL can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='notification',
+            index=models.Index(fields=['receiver', '-created_at'], name='notif_receiver_created_idx'),
+        ),
+    ]
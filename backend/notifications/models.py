@@ -27,6 +27,10 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's notifications, newest first
+            models.Index(fields=['receiver', '-created_at'], name='notif_receiver_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sender} {self.notification_type} -> {self.receiver}"
\ No newline at end of file
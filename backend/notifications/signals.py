@@ -17,7 +17,7 @@ def notify_on_like(sender, instance, action, pk_set, **kwargs):
                     receiver=instance.author,
                     notification_type='like',
                     content_object=instance,
-                    text=f"{liker.username} liked your post."
+                    text=f"{liker.full_name} liked your post."
                 )
 
 # 2. Notify on Comment
@@ -29,7 +29,7 @@ def notify_on_comment(sender, instance, created, **kwargs):
             receiver=instance.post.author,
             notification_type='comment',
             content_object=instance.post,
-            text=f"{instance.author.username} commented: {instance.content[:30]}..."
+            text=f"{instance.author.full_name} commented: {instance.content[:30]}..."
         )
 
 # 3. Notify on Follow
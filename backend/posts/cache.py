@@ -0,0 +1,4 @@
+from core.cache import ObjectCache
+from .models import Post
+
+post_cache = ObjectCache(Post)
@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+
+def _ranked(post_ids, limit):
+    # One ROW_NUMBER() window query for the whole page, newest first per post
+    return (
+        Comment.objects.filter(post_id__in=post_ids)
+        .annotate(rank=Window(
+            RowNumber(),
+            partition_by=[F('post_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ))
+        .filter(rank__lte=limit)
+        .order_by('post_id', 'rank')
+    )
+
+
+def attach_recent_comments(posts, limit):
+    """Set `recent_comments` (newest first, at most `limit`) on every post."""
+    if not posts:
+        return posts
+    by_post = defaultdict(list)
+    for comment in _ranked([post.id for post in posts], limit).select_related('author'):
+        by_post[comment.post_id].append(comment)
+    for post in posts:
+        post.recent_comments = by_post.get(post.id, [])
+    return posts
+
+
+def recent_comment_rows(post_ids, limit, fields):
+    """Like attach_recent_comments, but returns {post_id: [values() rows]}."""
+    by_post = defaultdict(list)
+    if post_ids:
+        for row in _ranked(post_ids, limit).values(*fields):
+            by_post[row['post_id']].append(row)
+    return by_post
+
+
+async def arecent_comment_rows(post_ids, limit, fields):
+    """recent_comment_rows() for async views."""
+    by_post = defaultdict(list)
+    if post_ids:
+        async for row in _ranked(post_ids, limit).values(*fields).aiterator():
+            by_post[row['post_id']].append(row)
+    return by_post
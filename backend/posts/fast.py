@@ -0,0 +1,89 @@
+"""
+Fast read path for the feed and comment lists: plain dicts built from
+values() rows instead of ModelSerializer instances. The output must stay
+identical to PostSerializer / CommentSerializer.
+"""
+from core.fastpath import drf_datetime
+from uploads.models import ImageAsset
+from uploads.serializers import ImageAssetSerializer
+from .comments import arecent_comment_rows, recent_comment_rows
+from .hydration import apost_stats, post_stats
+
+POST_VALUES = ('id', 'author_id', 'author__full_name', 'caption', 'media_url', 'media_type', 'created_at', 'image_id',
+               'view_count')
+COMMENT_VALUES = ('id', 'post_id', 'author_id', 'author__full_name', 'author__profile_pic', 'content', 'created_at')
+
+
+def comment_dict(row):
+    return {
+        'id': row['id'],
+        'post': row['post_id'],
+        'author': row['author_id'],
+        'author_name': row['author__full_name'],
+        'author_pic': row['author__profile_pic'],
+        'content': row['content'],
+        'created_at': drf_datetime(row['created_at']),
+    }
+
+
+def serialize_comments(rows):
+    return [comment_dict(row) for row in rows]
+
+
+def _media(assets, request):
+    return {pk: ImageAssetSerializer(asset, context={'request': request}).data for pk, asset in assets.items()}
+
+
+def _post_dict(row, media):
+    return {
+        'id': row['id'],
+        'author': row['author_id'],
+        'author_name': row['author__full_name'],
+        'caption': row['caption'],
+        'media_url': row['media_url'],
+        'media_type': row['media_type'],
+        'created_at': drf_datetime(row['created_at']),
+        'media': media.get(row['image_id']),
+        'view_count': row['view_count'],
+    }
+
+
+def post_dicts(rows, request):
+    """Viewer-independent part of each post; add_post_stats() fills in the rest."""
+    image_ids = {row['image_id'] for row in rows if row['image_id']}
+    media = _media(ImageAsset.objects.in_bulk(image_ids), request) if image_ids else {}
+    return [_post_dict(row, media) for row in rows]
+
+
+def add_post_stats(items, viewer):
+    """New dicts with likes/comment counts and the viewer's is_liked/is_saved merged in."""
+    stats = post_stats([item['id'] for item in items], viewer)
+    return [{**item, **stats[item['id']]} for item in items]
+
+
+def serialize_posts(queryset, request, embed_comments=0):
+    return serialize_post_rows(list(queryset.values(*POST_VALUES)), request, embed_comments)
+
+
+def serialize_post_rows(rows, request, embed_comments=0):
+    """serialize_posts() for rows already fetched with values(*POST_VALUES), e.g. a paginated page."""
+    results = add_post_stats(post_dicts(rows, request), request.user)
+    if embed_comments:
+        comments = recent_comment_rows([row['id'] for row in rows], embed_comments, COMMENT_VALUES)
+        for item in results:
+            item['recent_comments'] = serialize_comments(comments.get(item['id'], []))
+    return results
+
+
+async def aserialize_posts(queryset, request, embed_comments=0):
+    """serialize_posts() for async views: same output and queries, through the async ORM."""
+    rows = [row async for row in queryset.values(*POST_VALUES).aiterator()]
+    image_ids = {row['image_id'] for row in rows if row['image_id']}
+    media = _media(await ImageAsset.objects.ain_bulk(image_ids), request) if image_ids else {}
+    stats = await apost_stats([row['id'] for row in rows], request.user)
+    results = [{**_post_dict(row, media), **stats[row['id']]} for row in rows]
+    if embed_comments:
+        comments = await arecent_comment_rows([row['id'] for row in rows], embed_comments, COMMENT_VALUES)
+        for item in results:
+            item['recent_comments'] = serialize_comments(comments.get(item['id'], []))
+    return results
@@ -0,0 +1,70 @@
+from django.db.models import Count, prefetch_related_objects
+
+from .models import Comment, Post
+
+
+def _counts(queryset, key):
+    return dict(queryset.values(key).annotate(n=Count('id')).values_list(key, 'n'))
+
+
+async def _acounts(queryset, key):
+    # Plain async for: aiterator() runs a values_list() with annotations eagerly on the loop
+    return {pk: n async for pk, n in queryset.values(key).annotate(n=Count('id')).values_list(key, 'n')}
+
+
+def _stats(ids, likes, comments, liked, saved):
+    return {
+        pk: {
+            'likes_count': likes.get(pk, 0),
+            'comment_count': comments.get(pk, 0),
+            'is_liked': pk in liked,
+            'is_saved': pk in saved,
+        }
+        for pk in ids
+    }
+
+
+def post_stats(ids, viewer=None):
+    """{post_id: {likes_count, comment_count, is_liked, is_saved}} in at most four queries."""
+    Like = Post.liked_by.through
+    Save = Post.saved_by.through
+
+    likes = _counts(Like.objects.filter(post_id__in=ids), 'post_id')
+    comments = _counts(Comment.objects.filter(post_id__in=ids), 'post_id')
+    liked = saved = set()
+    if viewer is not None and viewer.is_authenticated:
+        liked = set(Like.objects.filter(post_id__in=ids, user_id=viewer.id).values_list('post_id', flat=True))
+        saved = set(Save.objects.filter(post_id__in=ids, user_id=viewer.id).values_list('post_id', flat=True))
+
+    return _stats(ids, likes, comments, liked, saved)
+
+
+async def apost_stats(ids, viewer=None):
+    """post_stats() for async views, same four queries."""
+    Like = Post.liked_by.through
+    Save = Post.saved_by.through
+
+    likes = await _acounts(Like.objects.filter(post_id__in=ids), 'post_id')
+    comments = await _acounts(Comment.objects.filter(post_id__in=ids), 'post_id')
+    liked = saved = set()
+    if viewer is not None and viewer.is_authenticated:
+        liked = {pk async for pk in Like.objects.filter(post_id__in=ids, user_id=viewer.id)
+                 .values_list('post_id', flat=True).aiterator()}
+        saved = {pk async for pk in Save.objects.filter(post_id__in=ids, user_id=viewer.id)
+                 .values_list('post_id', flat=True).aiterator()}
+    return _stats(ids, likes, comments, liked, saved)
+
+
+def hydrate_posts(posts, viewer=None):
+    """
+    Precompute the per-row fields PostSerializer would otherwise query one
+    post at a time (likes/comment counts, is_liked/is_saved, image), using a
+    fixed number of queries for the whole list.
+    """
+    if not posts:
+        return posts
+    stats = post_stats([post.id for post in posts], viewer)
+    for post in posts:
+        post._stats = stats[post.id]
+    prefetch_related_objects(posts, 'image')
+    return posts
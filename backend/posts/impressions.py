@@ -0,0 +1,166 @@
+"""
+Buffered post impressions.
+
+An UPDATE per view would turn every popular post row into a write hotspot.
+`unseen()` drops posts the viewer already saw today and `record()` only
+bumps a per-process counter. `flush()` applies the whole buffer in one
+transaction: one UPDATE ... CASE per batch of posts for
+Post.view_count, and the same increments summed per author and day into
+AuthorDailyStats. Nothing is ever recounted from events. A background
+thread flushes every IMPRESSIONS['FLUSH_INTERVAL'] seconds (0 disables it;
+tests flush by hand), and sooner once MAX_PENDING posts are waiting, so a
+crashed worker loses at most one interval of counts.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from core.metrics import registry
+from core.workers import thread_pool
+from .models import AuthorDailyStats, Post
+
+logger = logging.getLogger(__name__)
+
+RECORDED = registry.counter('post_impressions_recorded_total', "Impressions buffered by this process")
+FLUSHED = registry.counter('post_impressions_flushed_total', "Buffered impressions written to the database")
+FLUSH_DURATION = registry.histogram('post_impressions_flush_seconds', "Time to apply one impression buffer")
+
+_pending = Counter()  # (day, post_id) -> impressions
+_lock = threading.Lock()
+_flusher = None
+_stop = threading.Event()
+
+
+def unseen(user_id, post_ids):
+    """
+    The ids `user_id` has not viewed yet today, marking them viewed. One
+    shared-cache round trip each way, so repeated reports from one viewer
+    can't inflate a post's count.
+    """
+    day = timezone.localdate().isoformat()
+    keys = {f"impression:{day}:{user_id}:{pk}": pk for pk in post_ids}
+    seen = cache.get_many(keys)
+    fresh = {key: 1 for key in keys if key not in seen}
+    if fresh:
+        cache.set_many(fresh, timeout=24 * 3600)
+    return [keys[key] for key in fresh]
+
+
+def record(post_ids):
+    """Count one impression for each post id (unknown ids are dropped at flush time)."""
+    day = timezone.localdate()
+    with _lock:
+        for pk in post_ids:
+            _pending[(day, pk)] += 1
+        size = len(_pending)
+    RECORDED.inc(len(post_ids))
+    _ensure_flusher()
+    if size >= settings.IMPRESSIONS['MAX_PENDING']:
+        thread_pool('impressions', 1).submit(_flush_in_background)
+
+
+def pending():
+    with _lock:
+        return sum(_pending.values())
+
+
+def flush(batch_size=None):
+    """Write everything buffered so far; returns the number of impressions applied."""
+    global _pending
+    with _lock:
+        buffered, _pending = _pending, Counter()
+    if not buffered:
+        return 0
+    start = time.perf_counter()
+    try:
+        _apply(buffered, batch_size or settings.IMPRESSIONS['BATCH_SIZE'])
+    except Exception:
+        # Put the counts back for the next attempt
+        with _lock:
+            _pending.update(buffered)
+        raise
+    FLUSH_DURATION.observe(time.perf_counter() - start)
+    total = sum(buffered.values())
+    FLUSHED.inc(total)
+    return total
+
+
+def _increment(queryset, field, key, counts):
+    # One UPDATE for the batch: field = field + CASE key WHEN ... END
+    queryset.filter(**{f"{key}__in": counts}).update(**{field: F(field) + Case(
+        *(When(**{key: pk}, then=Value(n)) for pk, n in counts.items()),
+        default=Value(0), output_field=models.PositiveBigIntegerField(),
+    )})
+
+
+def _batches(items, size):
+    items = sorted(items)  # same lock order in every worker
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _apply(buffered, batch_size):
+    per_post = Counter()
+    for (_, pk), n in buffered.items():
+        per_post[pk] += n
+
+    with transaction.atomic():
+        authors = {}
+        for ids in _batches(per_post, batch_size):
+            found = dict(Post.objects.filter(pk__in=ids).values_list('pk', 'author_id'))
+            if found:
+                _increment(Post.objects, 'view_count', 'pk', {pk: per_post[pk] for pk in found})
+            authors.update(found)
+
+        per_author = Counter()
+        for (day, pk), n in buffered.items():
+            if pk in authors:
+                per_author[(day, authors[pk])] += n
+        for day in {day for day, _ in per_author}:
+            counts = {author: n for (d, author), n in per_author.items() if d == day}
+            for author_ids in _batches(counts, batch_size):
+                AuthorDailyStats.objects.bulk_create(
+                    [AuthorDailyStats(author_id=author_id, day=day) for author_id in author_ids],
+                    ignore_conflicts=True)
+                _increment(AuthorDailyStats.objects.filter(day=day), 'impressions', 'author_id',
+                           {author_id: counts[author_id] for author_id in author_ids})
+
+
+def _flush_in_background():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Impression flush failed; the counts stay buffered")
+    finally:
+        close_old_connections()
+
+
+def _run_flusher(interval):
+    while not _stop.wait(interval):
+        _flush_in_background()
+
+
+def _ensure_flusher():
+    global _flusher
+    interval = settings.IMPRESSIONS['FLUSH_INTERVAL']
+    if not interval or (_flusher is not None and _flusher.is_alive()):
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run_flusher, args=(interval,), name='impressions', daemon=True)
+            _flusher.start()
+
+
+@atexit.register
+def _flush_at_exit():
+    _stop.set()
+    if pending():
+        _flush_in_background()
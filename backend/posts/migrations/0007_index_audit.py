@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexOnline, ReplaceIndexOnline
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY on PostgreSQL can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('posts', '0006_follow_follow_following_id_idx_and_more'),
+        ('uploads', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Built under a temporary name and swapped in, so comment pages keep an index throughout
+        ReplaceIndexOnline(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created_at', '-id'], name='comment_post_created_idx'),
+        ),
+        AddIndexOnline(
+            model_name='post',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['-created_at', '-id'], name='post_created_idx'),
+        ),
+        AddIndexOnline(
+            model_name='post',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+        ),
+    ]
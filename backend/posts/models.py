@@ -3,6 +3,18 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+class PostQuerySet(models.QuerySet):
+    def live(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def deleted(self):
+        return self.filter(deleted_at__isnull=False)
+
+class LivePostManager(models.Manager.from_queryset(PostQuerySet)):
+    # Soft-deleted posts vanish from every read as soon as they are marked
+    def get_queryset(self):
+        return super().get_queryset().live()
+
 class Post(models.Model):
     # Consolidated choices
     MEDIA_CHOICES = (
@@ -16,13 +28,34 @@ class Post(models.Model):
     media_url = models.URLField(max_length=500, default="")
     media_type = models.CharField(max_length=10, choices=MEDIA_CHOICES, default="image")
     
+    # Optional uploaded image with generated variants (see uploads app)
+    image = models.ForeignKey("uploads.ImageAsset", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
     caption = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set on delete; the row and its dependents are purged later (core.deletion)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    # Impressions, applied in batches by posts.impressions.flush()
+    view_count = models.PositiveBigIntegerField(default=0)
 
     # Relationships
     liked_by = models.ManyToManyField(User, related_name="liked_posts", blank=True)
     saved_by = models.ManyToManyField(User, related_name="saved_posts", blank=True)
 
+    objects = LivePostManager()
+    all_objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Only pending purges are indexed, so live rows cost nothing
+            models.Index(fields=["deleted_at"], name="post_deleted_idx", condition=models.Q(deleted_at__isnull=False)),
+            # Feed and profile pages; partial so soft-deleted rows drop out of both
+            models.Index(fields=["-created_at", "-id"], name="post_created_idx",
+                         condition=models.Q(deleted_at__isnull=True)),
+            models.Index(fields=["author", "-created_at", "-id"], name="post_author_created_idx",
+                         condition=models.Q(deleted_at__isnull=True)),
+        ]
+
     def __str__(self):
         return f"{self.author.full_name} - {self.media_type}"
 
@@ -32,6 +65,12 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Comment list keyset pagination and per-post "latest N" lookups
+            models.Index(fields=["post", "-created_at", "-id"], name="comment_post_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.author.full_name} - {self.content[:20]}"
 
@@ -41,4 +80,24 @@ class Follow(models.Model):
 
     # Ensure a user can't follow the same person twice
     class Meta:
-        unique_together = ('follower', 'following')
\ No newline at end of file
+        unique_together = ('follower', 'following')
+        indexes = [
+            # Keyset pages of followers/following, newest first (users.views.FollowListView)
+            models.Index(fields=['following', '-id'], name='follow_following_id_idx'),
+            models.Index(fields=['follower', '-id'], name='follow_follower_id_idx'),
+        ]
+
+class AuthorDailyStats(models.Model):
+    """Impressions on one author's posts for one day; only ever incremented (posts.impressions)."""
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    impressions = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index for an author's date range
+            models.UniqueConstraint(fields=["author", "day"], name="author_daily_stats_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.author_id} {self.day}: {self.impressions}"
@@ -0,0 +1,64 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class CommentCursorPagination(CursorPagination):
+    """
+    Keyset pagination: cost stays flat no matter how deep the client scrolls.
+    DRF keys its cursor on the first ordering field plus an offset, which
+    repeats or skips comments sharing a created_at; this cursor carries the
+    whole (created_at, id) key and pages strictly past it.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return json.dumps(values)
+
+    def decode_cursor(self, request):
+        # DRF sees no position; paginate_queryset applies it as a keyset instead
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            self.key = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(self.key, list) or len(self.key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=None)
+
+    def _beyond(self, reverse):
+        # Rows strictly past the key in paging order: (a < x) OR (a = x AND b < y) ...
+        condition, equal = Q(), {}
+        for field, value in zip(self.ordering, self.key):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.key = None
+        cursor = self.decode_cursor(request)
+        if self.key is not None:
+            queryset = queryset.filter(self._beyond(cursor.reverse))
+        page = super().paginate_queryset(queryset, request, view)
+        if self.key is not None:
+            # What DRF does for a cursor with a position
+            position = json.dumps(self.key)
+            if cursor.reverse:
+                self.has_next, self.next_position = True, position
+            else:
+                self.has_previous, self.previous_position = True, position
+        return page
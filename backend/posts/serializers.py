@@ -1,12 +1,24 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Post, Comment
 from django.contrib.auth import get_user_model
+from django.db import models
+from users.cache import attach_cached_users
+from uploads.models import ImageAsset
+from uploads.serializers import ImageAssetSerializer
 
 User = get_user_model()
 
+class CachedAuthorListSerializer(serializers.ListSerializer):
+    # Resolves `author` for the whole page through the user cache,
+    # so author_name/author_pic don't trigger one query per row.
+    def to_representation(self, data):
+        items = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return super().to_representation(attach_cached_users(items))
+
 class CommentSerializer(serializers.ModelSerializer):
     author_name = serializers.ReadOnlyField(source='author.full_name')
-    author_pic = serializers.ReadOnlyField(source='author.profile_pic.url') # Useful for frontend
+    author_pic = serializers.ReadOnlyField(source='author.profile_pic') # Useful for frontend
 
     # FIX: Set read_only=True so validation doesn't fail
     post = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -15,6 +27,7 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ['id', 'post', 'author', 'author_name', 'author_pic', 'content', 'created_at']
+        list_serializer_class = CachedAuthorListSerializer
 
 class PostSerializer(serializers.ModelSerializer):
     author_name = serializers.ReadOnlyField(source='author.full_name')
@@ -24,30 +37,74 @@ class PostSerializer(serializers.ModelSerializer):
     # Add boolean checks for current user
     is_liked = serializers.SerializerMethodField()
     is_saved = serializers.SerializerMethodField()
+    # Uploaded image: write its id, read back src/srcset/placeholder
+    image_id = serializers.PrimaryKeyRelatedField(
+        source='image', queryset=ImageAsset.objects.all(), write_only=True, required=False, allow_null=True
+    )
+    media = ImageAssetSerializer(source='image', read_only=True)
 
     class Meta:
         model = Post
         fields = [
             'id', 'author', 'author_name', 'caption', 
             'media_url', 'media_type', 'created_at', 
-            'likes_count', 'comment_count', 'is_liked', 'is_saved'
+            'likes_count', 'comment_count', 'is_liked', 'is_saved',
+            'image_id', 'media', 'view_count'
         ]
-        read_only_fields = ['author', 'likes_count', 'comment_count', 'is_liked', 'is_saved']
+        read_only_fields = ['author', 'likes_count', 'comment_count', 'is_liked', 'is_saved', 'view_count']
+        list_serializer_class = CachedAuthorListSerializer
+
+    def validate_image_id(self, image):
+        request = self.context.get('request')
+        if image is not None and request and image.owner_id != request.user.id:
+            raise serializers.ValidationError("You can only attach your own uploads.")
+        return image
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Only present when the feed was asked to embed comments (?comments=N)
+        if hasattr(instance, 'recent_comments'):
+            data['recent_comments'] = CommentSerializer(instance.recent_comments, many=True, context=self.context).data
+        return data
 
+    def create(self, validated_data):
+        image = validated_data.get('image')
+        if image is not None and not validated_data.get('media_url'):
+            validated_data['media_url'] = ImageAssetSerializer(image, context=self.context).data['src']
+        return super().create(validated_data)
+
+    # Values precomputed by posts.hydration.hydrate_posts win over per-row queries
     def get_likes_count(self, obj):
-        return obj.liked_by.count()
+        stats = getattr(obj, '_stats', None)
+        return stats['likes_count'] if stats else obj.liked_by.count()
 
     def get_comment_count(self, obj):
-        return obj.comments.count()
+        stats = getattr(obj, '_stats', None)
+        return stats['comment_count'] if stats else obj.comments.count()
 
     def get_is_liked(self, obj):
+        stats = getattr(obj, '_stats', None)
+        if stats:
+            return stats['is_liked']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.liked_by.filter(id=request.user.id).exists()
         return False
 
     def get_is_saved(self, obj):
+        stats = getattr(obj, '_stats', None)
+        if stats:
+            return stats['is_saved']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.saved_by.filter(id=request.user.id).exists()
-        return False
\ No newline at end of file
+        return False
+
+class ImpressionsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+    def validate_ids(self, value):
+        ids = list(dict.fromkeys(value))
+        if len(ids) > settings.BATCH_MAX_IDS:
+            raise serializers.ValidationError(f"At most {settings.BATCH_MAX_IDS} ids per request.")
+        return ids
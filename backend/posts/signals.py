@@ -0,0 +1,11 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import post_cache
+from .models import Post
+
+# Same pattern as users.signals: invalidate now and again after commit.
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_cache(sender, instance, **kwargs):
+    post_cache.invalidate(instance.pk)
+    transaction.on_commit(lambda: post_cache.invalidate(instance.pk))
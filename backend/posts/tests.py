@@ -1,3 +1,172 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+
+from users.models import User
+from . import impressions
+from .comments import attach_recent_comments
+from .hydration import hydrate_posts
+from .models import AuthorDailyStats, Comment, Post
+from .serializers import CommentSerializer, PostSerializer
+from .views import PostListCreateView
+
+
+class FastPathParityTests(TestCase):
+    """The values()-based list endpoints must match the ModelSerializer output."""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.post = Post.objects.create(author=self.bob, caption='hello', media_url='https://example.com/a.jpg')
+        self.post.liked_by.add(self.alice)
+        Comment.objects.create(post=self.post, author=self.alice, content='first')
+        Comment.objects.create(post=self.post, author=self.bob, content='second')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_feed_matches_post_serializer(self):
+        response = self.client.get('/api/posts/posts/?comments=5')
+        request = response.wsgi_request
+        request.user = self.alice
+        posts = attach_recent_comments(hydrate_posts(list(Post.objects.order_by('-created_at')), self.alice), 5)
+        expected = PostSerializer(posts, many=True, context={'request': request}).data
+        self.assertEqual(response.json(), [dict(item) for item in expected])
+
+    def test_feed_still_serializes_when_paginated(self):
+        Post.objects.create(author=self.alice, caption='newer')
+        unpaginated = self.client.get('/api/posts/posts/?comments=5').json()
+
+        class OnePerPage(PageNumberPagination):
+            page_size = 1
+
+        # The DRF view serves GETs only while ASYNC_READ_VIEWS is off
+        with override_settings(ASYNC_READ_VIEWS=False), \
+                mock.patch.object(PostListCreateView, 'pagination_class', OnePerPage):
+            pages = [self.client.get(f'/api/posts/posts/?comments=5&page={n}').json() for n in (1, 2)]
+        self.assertEqual(pages[0]['count'], 2)
+        self.assertEqual(pages[0]['results'] + pages[1]['results'], unpaginated)
+
+    def test_comment_page_matches_comment_serializer(self):
+        response = self.client.get(f'/api/posts/posts/{self.post.id}/comments/')
+        comments = Comment.objects.filter(post=self.post).order_by('-created_at', '-id')
+        self.assertEqual(response.json()['results'], CommentSerializer(comments, many=True).data)
+
+
+class CommentPagingTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.post = Post.objects.create(author=self.alice, caption='hello')
+        self.comments = [Comment.objects.create(post=self.post, author=self.alice, content=f'c{i}') for i in range(5)]
+        # Same timestamp for all: the id breaks the tie
+        Comment.objects.update(created_at=self.comments[0].created_at)
+        self.client = APIClient()
+
+    def ids(self, response):
+        return [comment['id'] for comment in response.json()['results']]
+
+    def test_cursor_pages_are_stable_under_new_comments(self):
+        url = f'/api/posts/posts/{self.post.id}/comments/?page_size=2'
+        first = self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.alice, content='newer')
+        seen = self.ids(first)
+        next_url = first.json()['next']
+        while next_url:
+            page = self.client.get(next_url)
+            seen += self.ids(page)
+            next_url = page.json()['next']
+        self.assertEqual(seen, [comment.id for comment in reversed(self.comments)])
+
+        second = self.client.get(first.json()['next'])
+        self.assertEqual(self.ids(self.client.get(second.json()['previous'])), self.ids(first))
+
+    def test_feed_embeds_the_newest_comments_per_post(self):
+        quiet = Post.objects.create(author=self.alice, caption='no comments')
+        feed = {post['id']: post for post in self.client.get('/api/posts/posts/?comments=2').json()}
+        self.assertEqual([c['id'] for c in feed[self.post.id]['recent_comments']],
+                         [self.comments[4].id, self.comments[3].id])
+        self.assertEqual(feed[quiet.id]['recent_comments'], [])
+        self.assertEqual(feed[self.post.id]['comment_count'], 5)
+        self.assertNotIn('recent_comments', self.client.get('/api/posts/posts/').json()[0])
+
+
+@override_settings(IMPRESSIONS={'FLUSH_INTERVAL': 0, 'MAX_PENDING': 5000, 'BATCH_SIZE': 2})
+class ImpressionTests(TestCase):
+    """Impressions are buffered per process and applied to posts and the daily rollup by flush()."""
+
+    def setUp(self):
+        cache.clear()
+        impressions._pending.clear()
+        self.alice = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.bob = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.posts = [Post.objects.create(author=self.bob, caption=f'post {i}') for i in range(3)]
+        self.alice_post = Post.objects.create(author=self.alice, caption='mine')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def tearDown(self):
+        impressions._pending.clear()
+
+    def test_flush_applies_buffered_counts(self):
+        ids = [post.id for post in self.posts]
+        impressions.record(ids)
+        impressions.record(ids[:1] + [self.alice_post.id])
+        self.assertEqual(Post.objects.get(pk=ids[0]).view_count, 0)  # nothing written yet
+        self.assertEqual(impressions.pending(), 5)
+
+        self.assertEqual(impressions.flush(), 5)
+        self.assertEqual(impressions.pending(), 0)
+        counts = dict(Post.objects.values_list('pk', 'view_count'))
+        self.assertEqual([counts[pk] for pk in ids], [2, 1, 1])
+        self.assertEqual(counts[self.alice_post.id], 1)
+        today = timezone.localdate()
+        self.assertEqual(AuthorDailyStats.objects.get(author=self.bob, day=today).impressions, 4)
+        self.assertEqual(AuthorDailyStats.objects.get(author=self.alice, day=today).impressions, 1)
+
+        # A later flush adds to the existing rollup row instead of recounting
+        impressions.record(ids)
+        impressions.flush()
+        self.assertEqual(AuthorDailyStats.objects.get(author=self.bob, day=today).impressions, 7)
+        self.assertEqual(AuthorDailyStats.objects.count(), 2)
+
+    def test_unknown_posts_are_dropped(self):
+        impressions.record([self.posts[0].id, 999999])
+        impressions.flush()
+        self.assertEqual(Post.objects.get(pk=self.posts[0].id).view_count, 1)
+        self.assertEqual(AuthorDailyStats.objects.get(author=self.bob).impressions, 1)
+
+    def test_endpoint_buffers_deduplicated_ids(self):
+        post_id = self.posts[0].id
+        response = self.client.post('/api/posts/posts/impressions/', {'ids': [post_id, post_id]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'recorded': 1})
+        self.assertEqual(impressions.pending(), 1)
+
+        # One impression per viewer, post and day
+        response = self.client.post('/api/posts/posts/impressions/', {'ids': [post_id]}, format='json')
+        self.assertEqual(response.json(), {'recorded': 0})
+        self.client.force_authenticate(self.bob)
+        response = self.client.post('/api/posts/posts/impressions/', {'ids': [post_id]}, format='json')
+        self.assertEqual(response.json(), {'recorded': 1})
+        self.assertEqual(impressions.pending(), 2)
+
+        for body in ({'ids': ['x']}, {'ids': []}, [post_id], {}):
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post('/api/posts/posts/impressions/', body,
+                                                  format='json').status_code, 400)
+        self.assertEqual(APIClient().post('/api/posts/posts/impressions/', {'ids': [post_id]},
+                                          format='json').status_code, 401)
+
+    def test_author_stats(self):
+        impressions.record([post.id for post in self.posts])
+        impressions.flush()
+        self.client.force_authenticate(self.bob)
+        response = self.client.get('/api/posts/stats/?days=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'views': 3,
+            'days': [{'day': timezone.localdate().isoformat(), 'impressions': 3}],
+        })
@@ -1,10 +1,14 @@
 from django.urls import path
+from core.asyncapi import async_reads
 from . import views
 
 urlpatterns = [
     # Post URLs
-    path('posts/', views.PostListCreateView.as_view(), name='post-list'),
-    path('posts/<int:pk>/', views.PostDetailView.as_view(), name='post-detail'),
+    path('posts/', async_reads(views.post_list_async, views.PostListCreateView.as_view()), name='post-list'),
+    path('posts/batch/', views.PostBatchView.as_view(), name='post-batch'),
+    path('posts/impressions/', views.PostImpressionsView.as_view(), name='post-impressions'),
+    path('stats/', views.AuthorStatsView.as_view(), name='author-stats'),
+    path('posts/<int:pk>/', async_reads(views.post_detail_async, views.PostDetailView.as_view()), name='post-detail'),
 
     # Comment URLs
     path('posts/<int:post_id>/comments/', views.CommentListCreateView.as_view(), name='post-comments'),
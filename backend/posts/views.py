@@ -2,30 +2,76 @@ from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.views import APIView
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.shortcuts import get_object_or_404
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Sum, aprefetch_related_objects
+from django.http import Http404
+from django.utils import timezone
+from datetime import timedelta
 
-from .models import Post, Comment, Follow
-from .serializers import PostSerializer, CommentSerializer
+from . import impressions
+from .models import AuthorDailyStats, Post, Comment, Follow
+from .serializers import CommentSerializer, ImpressionsSerializer, PostSerializer
+from .cache import post_cache
+from .fast import COMMENT_VALUES, POST_VALUES, aserialize_posts, serialize_comments, serialize_post_rows
+from .hydration import apost_stats, hydrate_posts
+from core.params import parse_id_list
+from .pagination import CommentCursorPagination
+from core.asyncapi import async_api_view
+from core.db_routers import ReplicaReadMixin
+from core.deletion import soft_delete_post
+from users.cache import user_cache
 
 User = get_user_model()
 
 # --- POSTS ---
 
-class PostListCreateView(generics.ListCreateAPIView):
+def feed_queryset(user, params):
+    queryset = Post.objects.select_related('image').order_by('-created_at')
+    feed_type = params.get('feed')
+
+    if feed_type == 'following' and user.is_authenticated:
+        following_users = user.following.values_list('following', flat=True)
+        queryset = queryset.filter(author__id__in=following_users)
+
+    # ?author=<id>: one user's posts, e.g. the rest of a profile page
+    author = params.get('author')
+    if author and author.isdigit():
+        queryset = queryset.filter(author_id=author)
+
+    return queryset
+
+
+def embedded_comment_count(params):
+    # ?comments=N embeds the N newest comments on each post (capped)
+    try:
+        count = int(params.get('comments', 0))
+    except ValueError:
+        return 0
+    return max(0, min(count, settings.FEED_EMBEDDED_COMMENTS_MAX))
+
+
+class PostListCreateView(ReplicaReadMixin, generics.ListCreateAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        queryset = Post.objects.all().order_by('-created_at')
-        feed_type = self.request.query_params.get('feed')
+        return feed_queryset(self.request.user, self.request.query_params)
 
-        if feed_type == 'following' and self.request.user.is_authenticated:
-            following_users = self.request.user.following.values_list('following', flat=True)
-            queryset = queryset.filter(author__id__in=following_users)
+    def embedded_comment_count(self):
+        return embedded_comment_count(self.request.query_params)
 
-        return queryset
+    def list(self, request, *args, **kwargs):
+        # Hot read: plain dicts from values() instead of PostSerializer
+        rows = self.filter_queryset(self.get_queryset()).values(*POST_VALUES)
+        page = self.paginate_queryset(rows)
+        data = serialize_post_rows(list(rows) if page is None else page, request, self.embedded_comment_count())
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -35,20 +81,74 @@ class PostDetailView(generics.RetrieveDestroyAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_object(self):
+        # Reads come from the object cache; deletes always load the live row
+        if self.request.method not in permissions.SAFE_METHODS:
+            return super().get_object()
+        post = post_cache.get(self.kwargs['pk'])
+        if post is None:
+            raise Http404
+        self.check_object_permissions(self.request, post)
+        return post
+
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
             raise PermissionDenied("You can't delete someone else's post!")
-        instance.delete()
+        # Hidden now; likes, comments and notifications are purged in the background
+        soft_delete_post(instance)
+
+
+# Async GET handlers for the two hottest reads (see core/asyncapi.py)
+
+@async_api_view([permissions.IsAuthenticatedOrReadOnly], replica=True)
+async def post_list_async(request):
+    queryset = feed_queryset(request.user, request.GET)
+    return await aserialize_posts(queryset, request, embedded_comment_count(request.GET))
+
+
+@async_api_view([permissions.IsAuthenticatedOrReadOnly])
+async def post_detail_async(request, pk):
+    post = await post_cache.aget(pk)
+    author = await user_cache.aget(post.author_id) if post is not None else None
+    if author is None:
+        raise Http404
+    post.author = author
+    post._stats = (await apost_stats([post.id], request.user))[post.id]
+    await aprefetch_related_objects([post], 'image')
+    return PostSerializer(post, context={'request': request}).data
+
+class PostBatchView(APIView):
+    """
+    GET ?ids=3,1,2 -> up to BATCH_MAX_IDS posts in the requested order, via the
+    object cache and a fixed number of queries. Unknown ids are listed in "missing".
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        ids = parse_id_list(request, limit=settings.BATCH_MAX_IDS)
+        found = post_cache.get_many(ids)
+        posts = hydrate_posts([found[pk] for pk in ids if pk in found], request.user)
+        serializer = PostSerializer(posts, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in found],
+        })
 
 # --- COMMENTS ---
 
 class CommentListCreateView(generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CommentCursorPagination
 
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
-        return Comment.objects.filter(post_id=post_id).order_by('-created_at')
+        # Ordering comes from the cursor paginator (newest first)
+        return Comment.objects.filter(post_id=post_id).select_related('author')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset().values(*COMMENT_VALUES))
+        return self.get_paginated_response(serialize_comments(page))
 
     def perform_create(self, serializer):
         post_id = self.kwargs.get('post_id')
@@ -57,6 +157,50 @@ class CommentListCreateView(generics.ListCreateAPIView):
         # The serializer accepts this because we set read_only=True in serializers.py
         serializer.save(author=self.request.user, post=post)
 
+# --- IMPRESSIONS & STATS ---
+
+class PostImpressionsView(APIView):
+    """
+    POST {"ids": [3, 1, 2]} -> one impression for each listed post, e.g. the
+    posts a client scrolled past, at most one per viewer, post and day.
+    Counted in memory and written in batches (posts/impressions.py), so
+    nothing touches the post rows here.
+    """
+    permission_classes = [IsAuthenticated]
+    rate_limit_scope = 'impressions'
+
+    def post(self, request):
+        serializer = ImpressionsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = impressions.unseen(request.user.id, serializer.validated_data['ids'])
+        if ids:
+            impressions.record(ids)
+        return Response({'recorded': len(ids)}, status=status.HTTP_202_ACCEPTED)
+
+class AuthorStatsView(APIView):
+    """
+    GET ?days=N (default 30, max 365) -> impressions on my posts per day from
+    the AuthorDailyStats rollup, plus lifetime views. Counts still buffered in
+    a worker show up after its next flush.
+    """
+    permission_classes = [IsAuthenticated]
+    max_days = 365
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            raise ValidationError({'days': "Must be a number of days."})
+        days = max(1, min(days, self.max_days))
+        since = timezone.localdate() - timedelta(days=days - 1)
+        rows = (AuthorDailyStats.objects.filter(author=request.user, day__gte=since)
+                .order_by('day').values_list('day', 'impressions'))
+        views = Post.objects.filter(author=request.user).aggregate(views=Sum('view_count'))['views']
+        return Response({
+            'views': views or 0,
+            'days': [{'day': day.isoformat(), 'impressions': count} for day, count in rows],
+        })
+
 # --- ACTIONS (Like, Save, Follow) ---
 
 @api_view(['POST'])
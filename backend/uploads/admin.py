@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import ImageAsset
+
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'status', 'width', 'height', 'created_at')
+    list_filter = ('status',)
+    raw_id_fields = ('owner',)
+    readonly_fields = ('variants', 'placeholder', 'created_at')
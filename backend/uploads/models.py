@@ -0,0 +1,28 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+class ImageAsset(models.Model):
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    )
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="image_assets")
+    original = models.FileField(upload_to="images/originals/%Y/%m/")
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+
+    # Filled by the background worker:
+    # [{"name": "images/variants/...", "width": 640, "height": 480, "format": "webp"}, ...]
+    variants = models.JSONField(default=list, blank=True)
+    # Tiny blurred JPEG as a data: URI, shown while the real image loads (LQIP)
+    placeholder = models.TextField(blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.owner} - {self.original.name} ({self.status})"
@@ -0,0 +1,65 @@
+"""
+Pure Pillow image processing. Runs inside worker processes, so nothing in
+here may touch Django settings, models or the database.
+"""
+import base64
+import io
+import os
+
+from PIL import Image, ImageOps
+
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+PLACEHOLDER_SIZE = 16
+
+
+def _flatten(image):
+    # JPEG has no alpha channel: composite transparent images onto white
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def placeholder_data_uri(image):
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=40, optimize=True)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def build_variants(media_root, original_name, output_dir, widths, formats=('webp', 'jpeg'), quality=80):
+    """
+    Write resized copies of MEDIA_ROOT/original_name and return their metadata.
+
+    Widths larger than the original are skipped, but at least one variant
+    (at the original width) is always produced.
+    """
+    with Image.open(os.path.join(media_root, original_name)) as source:
+        image = _flatten(ImageOps.exif_transpose(source))
+
+    stem = os.path.splitext(os.path.basename(original_name))[0]
+    os.makedirs(os.path.join(media_root, output_dir), exist_ok=True)
+
+    targets = sorted({w for w in widths if w < image.width} | {min(max(widths), image.width)})
+    variants = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            pil_format, extension = FORMATS[fmt]
+            name = f"{output_dir}/{stem}_{width}w.{extension}"
+            resized.save(os.path.join(media_root, name), pil_format, quality=quality, optimize=True)
+            variants.append({'name': name, 'width': width, 'height': height, 'format': fmt})
+
+    return {
+        'width': image.width,
+        'height': image.height,
+        'variants': variants,
+        'placeholder': placeholder_data_uri(image),
+    }
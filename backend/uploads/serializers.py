@@ -0,0 +1,45 @@
+from django.conf import settings
+from rest_framework import serializers
+from .models import ImageAsset
+
+
+class ImageAssetSerializer(serializers.ModelSerializer):
+    """
+    Compact responsive-image payload:
+    {"src", "width", "height", "placeholder", "srcset": {"webp": "url 320w, ...", "jpeg": "..."}}
+    """
+    src = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageAsset
+        fields = ['id', 'status', 'src', 'width', 'height', 'placeholder', 'srcset']
+        read_only_fields = fields
+
+    def _url(self, name):
+        url = settings.MEDIA_URL + name
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_src(self, obj):
+        return self._url(obj.original.name)
+
+    def get_srcset(self, obj):
+        srcset = {}
+        for variant in obj.variants:
+            srcset.setdefault(variant['format'], []).append(f"{self._url(variant['name'])} {variant['width']}w")
+        return {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    image = serializers.ImageField(source='original', write_only=True)
+
+    class Meta:
+        model = ImageAsset
+        fields = ['image']
+
+    def validate_image(self, value):
+        limit = settings.IMAGE_PIPELINE['MAX_UPLOAD_BYTES']
+        if value.size > limit:
+            raise serializers.ValidationError(f"Image is larger than {limit // (1024 * 1024)} MB.")
+        return value
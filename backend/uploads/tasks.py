@@ -0,0 +1,60 @@
+import logging
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from core.workers import process_pool
+from users import profile_page
+from .models import ImageAsset
+from .processing import build_variants
+
+logger = logging.getLogger(__name__)
+
+
+def _save_result(asset_id, compute):
+    try:
+        result = compute()
+    except Exception:
+        logger.exception("Image processing failed for asset %s", asset_id)
+        _update(asset_id, status='failed')
+        return
+    _update(asset_id, status='ready', **result)
+
+
+def _update(asset_id, **fields):
+    asset = ImageAsset.objects.filter(id=asset_id)
+    asset.update(**fields)
+    # update() sends no post_save: drop the owner's cached profile page, which embeds this image
+    owner_id = asset.values_list('owner_id', flat=True).first()
+    if owner_id is not None:
+        profile_page.invalidate(owner_id)
+
+
+def _on_done(asset_id, future):
+    # Runs on the executor's callback thread, outside any request
+    close_old_connections()
+    try:
+        _save_result(asset_id, future.result)
+    finally:
+        connections.close_all()
+
+
+def enqueue_variants(asset):
+    """Generate variants for `asset` in the background; IMAGE_PIPELINE WORKERS=0 runs inline."""
+    config = settings.IMAGE_PIPELINE
+    job = partial(
+        build_variants,
+        str(settings.MEDIA_ROOT),
+        asset.original.name,
+        f"images/variants/{asset.created_at:%Y/%m}",
+        config['WIDTHS'],
+        config['FORMATS'],
+        config['QUALITY'],
+    )
+    if config['WORKERS'] == 0:
+        _save_result(asset.id, job)
+        return
+
+    future = process_pool('images', config['WORKERS']).submit(job)
+    future.add_done_callback(partial(_on_done, asset.id))
@@ -0,0 +1,157 @@
+import io
+import shutil
+import tempfile
+from concurrent.futures import Future
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from users.models import User
+from . import tasks
+from .models import ImageAsset
+from .processing import build_variants
+
+PIPELINE = {
+    'WORKERS': 0,
+    'WIDTHS': [320, 640],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'MAX_UPLOAD_BYTES': 1024 * 1024,
+}
+
+
+def png_bytes(width=800, height=400, mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_PIPELINE=PIPELINE)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class BuildVariantsTests(MediaRootMixin, TestCase):
+    def _write(self, name, data):
+        path = f"{self.media_root}/{name}"
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        return name
+
+    def test_resizes_to_each_smaller_width_in_every_format(self):
+        name = self._write('photo.png', png_bytes(800, 400))
+        result = build_variants(self.media_root, name, 'variants', [320, 640, 1080], ('webp', 'jpeg'))
+
+        self.assertEqual((result['width'], result['height']), (800, 400))
+        # 1080 is wider than the original, so the original width stands in for it
+        self.assertEqual(
+            sorted((v['width'], v['height'], v['format']) for v in result['variants']),
+            [(320, 160, 'jpeg'), (320, 160, 'webp'), (640, 320, 'jpeg'), (640, 320, 'webp'),
+             (800, 400, 'jpeg'), (800, 400, 'webp')],
+        )
+        for variant in result['variants']:
+            with Image.open(f"{self.media_root}/{variant['name']}") as image:
+                self.assertEqual(image.size, (variant['width'], variant['height']))
+                self.assertEqual(image.mode, 'RGB')
+        self.assertTrue(result['placeholder'].startswith('data:image/jpeg;base64,'))
+
+    def test_small_image_still_gets_one_variant(self):
+        name = self._write('tiny.png', png_bytes(100, 50, mode='RGB'))
+        result = build_variants(self.media_root, name, 'variants', [320, 640], ('jpeg',))
+        self.assertEqual([(v['width'], v['format']) for v in result['variants']], [(100, 'jpeg')])
+
+
+class ImageUploadTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, data=None):
+        image = SimpleUploadedFile('photo.png', data or png_bytes(), content_type='image/png')
+        return self.client.post('/api/uploads/images/', {'image': image}, format='multipart')
+
+    def test_inline_upload_returns_202_with_variants(self):
+        response = self._upload()
+
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual(body['status'], 'ready')
+        self.assertEqual((body['width'], body['height']), (800, 400))
+        self.assertEqual(set(body['srcset']), {'webp', 'jpeg'})
+        self.assertIn('/media/images/variants/', body['srcset']['webp'])
+        self.assertTrue(body['placeholder'].startswith('data:image/jpeg'))
+
+        detail = self.client.get(f"/api/uploads/images/{body['id']}/")
+        self.assertEqual(detail.json(), body)
+
+    def test_variant_urls_are_served(self):
+        body = self._upload().json()
+        url = body['srcset']['jpeg'].split(', ')[0].split(' ')[0]
+        with override_settings(DEBUG=False):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(b''.join(response.streaming_content))).width, 320)
+
+    def test_pooled_upload_is_pending_until_the_worker_finishes(self):
+        pool = mock.Mock()
+        with override_settings(IMAGE_PIPELINE={**PIPELINE, 'WORKERS': 2}), \
+                mock.patch.object(tasks, 'process_pool', return_value=pool):
+            response = self._upload()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(response.json()['srcset'], {})
+        pool.submit.assert_called_once()
+        pool.submit.return_value.add_done_callback.assert_called_once()
+
+    def test_oversized_upload_is_rejected(self):
+        with override_settings(IMAGE_PIPELINE={**PIPELINE, 'MAX_UPLOAD_BYTES': 10}):
+            response = self._upload()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_other_users_cannot_poll_an_asset(self):
+        body = self._upload().json()
+        other = User.objects.create_user(email='bob@example.com', password='pw', full_name='Bob')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f"/api/uploads/images/{body['id']}/").status_code, 404)
+
+
+class DoneCallbackTests(TransactionTestCase):
+    # _on_done closes every connection when it returns, which TestCase's wrapping transaction cannot survive
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='alice@example.com', password='pw', full_name='Alice')
+        self.asset = ImageAsset.objects.create(owner=self.user, original='images/originals/photo.png')
+
+    def test_result_marks_the_asset_ready(self):
+        future = Future()
+        future.set_result({'width': 800, 'height': 400, 'variants': [{'name': 'v.jpg'}], 'placeholder': 'data:'})
+
+        with mock.patch.object(tasks.profile_page, 'invalidate') as invalidate:
+            tasks._on_done(self.asset.id, future)
+
+        self.asset.refresh_from_db()
+        self.assertEqual((self.asset.status, self.asset.width, self.asset.variants), ('ready', 800, [{'name': 'v.jpg'}]))
+        invalidate.assert_called_once_with(self.user.id)
+
+    def test_worker_error_marks_the_asset_failed(self):
+        future = Future()
+        future.set_exception(OSError('cannot identify image file'))
+
+        with self.assertLogs('uploads.tasks', 'ERROR'):
+            tasks._on_done(self.asset.id, future)
+
+        self.asset.refresh_from_db()
+        self.assertEqual(self.asset.status, 'failed')
+        self.assertEqual(self.asset.variants, [])
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import ImageUploadView, ImageAssetDetailView
+
+urlpatterns = [
+    path('images/', ImageUploadView.as_view(), name='image-upload'),
+    path('images/<int:pk>/', ImageAssetDetailView.as_view(), name='image-detail'),
+]
@@ -0,0 +1,32 @@
+from rest_framework import generics, permissions, status
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.response import Response
+
+from .models import ImageAsset
+from .serializers import ImageAssetSerializer, ImageUploadSerializer
+from .tasks import enqueue_variants
+
+
+class ImageUploadView(generics.CreateAPIView):
+    """Stores the original and returns 202 immediately; variants are built in the background."""
+    serializer_class = ImageUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        asset = serializer.save(owner=request.user)
+        enqueue_variants(asset)
+        asset.refresh_from_db()
+        data = ImageAssetSerializer(asset, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class ImageAssetDetailView(generics.RetrieveAPIView):
+    # Poll this until status is "ready"
+    serializer_class = ImageAssetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ImageAsset.objects.filter(owner=self.request.user)
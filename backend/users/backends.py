@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import passwords
+
+User = get_user_model()
+
+
+class PooledPasswordBackend(ModelBackend):
+    """ModelBackend whose password checks run in the users.passwords process pool."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            passwords.make_password(password)
+            return None
+        if passwords.check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,21 @@
+from core.cache import ObjectCache
+from .models import User
+
+# Password hashes stay out of Redis and out of every serializer that gets these
+user_cache = ObjectCache(User, defer=('password',))
+
+
+def attach_cached_users(objects, field_name='author'):
+    """Fill a FK to User on each object from the cache instead of lazy-loading it per row."""
+    objects = list(objects)
+    if not objects:
+        return objects
+
+    field = objects[0]._meta.get_field(field_name)
+    pending = [obj for obj in objects if not field.is_cached(obj)]
+    users = user_cache.get_many({getattr(obj, field.attname) for obj in pending})
+    for obj in pending:
+        user = users.get(getattr(obj, field.attname))
+        if user is not None:
+            setattr(obj, field_name, user)
+    return objects
@@ -0,0 +1,62 @@
+from django.db.models import Count, aprefetch_related_objects, prefetch_related_objects
+
+from posts.models import Follow
+
+
+def _counts(queryset, key):
+    return dict(queryset.values(key).annotate(n=Count('id')).values_list(key, 'n'))
+
+
+async def _acounts(queryset, key):
+    # Plain async for: aiterator() runs a values_list() with annotations eagerly on the loop
+    return {pk: n async for pk, n in queryset.values(key).annotate(n=Count('id')).values_list(key, 'n')}
+
+
+def followed_by(viewer, user_ids):
+    """The subset of user_ids that `viewer` follows, in one query."""
+    if viewer is None or not viewer.is_authenticated:
+        return set()
+    return set(Follow.objects.filter(follower_id=viewer.id, following_id__in=user_ids).values_list('following_id', flat=True))
+
+
+def hydrate_users(users, viewer=None):
+    """Batch version of UserSerializer's per-row follow counts and is_following."""
+    if not users:
+        return users
+    ids = [user.id for user in users]
+
+    followers = _counts(Follow.objects.filter(following_id__in=ids), 'following_id')
+    following = _counts(Follow.objects.filter(follower_id__in=ids), 'follower_id')
+    followed_by_viewer = followed_by(viewer, ids)
+
+    for user in users:
+        user._stats = {
+            'followers_count': followers.get(user.id, 0),
+            'following_count': following.get(user.id, 0),
+            'is_following': user.id in followed_by_viewer,
+        }
+    prefetch_related_objects(users, 'profile_image')
+    return users
+
+
+async def ahydrate_users(users, viewer=None):
+    """hydrate_users() for async views."""
+    if not users:
+        return users
+    ids = [user.id for user in users]
+
+    followers = await _acounts(Follow.objects.filter(following_id__in=ids), 'following_id')
+    following = await _acounts(Follow.objects.filter(follower_id__in=ids), 'follower_id')
+    followed_by_viewer = set()
+    if viewer is not None and viewer.is_authenticated:
+        followed_by_viewer = {pk async for pk in Follow.objects.filter(follower_id=viewer.id, following_id__in=ids)
+                              .values_list('following_id', flat=True).aiterator()}
+
+    for user in users:
+        user._stats = {
+            'followers_count': followers.get(user.id, 0),
+            'following_count': following.get(user.id, 0),
+            'is_following': user.id in followed_by_viewer,
+        }
+    await aprefetch_related_objects(users, 'profile_image')
+    return users
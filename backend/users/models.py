@@ -2,12 +2,16 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.db import models
 
 class UserManager(BaseUserManager):
-    def create_user(self, email, password=None, **extra_fields):
+    def create_user(self, email, password=None, password_hash=None, **extra_fields):
         if not email:
             raise ValueError("The Email field must be set")
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        # password_hash: already hashed (users.passwords), skips PBKDF2 here
+        if password_hash:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -27,17 +31,25 @@ class User(AbstractBaseUser, PermissionsMixin):
     full_name = models.CharField(max_length=255)
     # Using URLField because React handles the Cloudinary upload
     profile_pic = models.URLField(max_length=500, blank=True, null=True)
+    # Set when the picture was uploaded to us instead; carries resized variants
+    profile_image = models.ForeignKey("uploads.ImageAsset", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
     bio = models.TextField(blank=True, null=True)
     
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(auto_now_add=True)
-    
+    # Set when the account is deleted; dependents are purged later (core.deletion)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['full_name']
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='user_deleted_idx', condition=models.Q(deleted_at__isnull=False)),
+        ]
+
     def __str__(self):
         return self.email
\ No newline at end of file
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class FollowCursorPagination(CursorPagination):
+    # Keyset on Follow.id: page 1000 of a celebrity's followers costs the same as page 1
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
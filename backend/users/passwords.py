@@ -0,0 +1,46 @@
+"""
+Password hashing in a bounded process pool.
+
+PBKDF2 is pure CPU and holds the GIL, so hashing inside a request thread
+stalls the event loop that serves chat sockets. Registration and login
+send the work to PASSWORD_HASHING['WORKERS'] spawned processes instead;
+WORKERS=0 hashes inline (tests, management commands).
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from core.workers import process_pool
+
+
+def _configure_worker(password_hashers):
+    # Spawned workers only need the hasher list, not the whole project
+    from django.conf import settings as worker_settings
+    if not worker_settings.configured:
+        worker_settings.configure(PASSWORD_HASHERS=password_hashers)
+
+
+def _pool():
+    return process_pool('passwords', settings.PASSWORD_HASHING['WORKERS'],
+                        initializer=_configure_worker, initargs=(list(settings.PASSWORD_HASHERS),))
+
+
+def _call(func, *args):
+    if not settings.PASSWORD_HASHING['WORKERS']:
+        return func(*args)
+    return _pool().submit(func, *args).result(timeout=settings.PASSWORD_HASHING['TIMEOUT'])
+
+
+def make_password(raw_password):
+    return _call(hashers.make_password, raw_password)
+
+
+def check_password(user, raw_password):
+    """user.check_password() with the hashing done in the pool, including the hash upgrade."""
+    if not _call(hashers.check_password, raw_password, user.password):
+        return False
+    hasher = hashers.identify_hasher(user.password)
+    preferred = hashers.get_hasher('default')
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(user.password):
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+    return True
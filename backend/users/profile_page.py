@@ -0,0 +1,57 @@
+"""
+GET /api/users/<id>/profile-page/ in one response.
+
+The viewer-independent part (profile fields, follow counters, post count
+and the first page of posts) is cached per user in the shared cache and
+dropped by users.signals on profile edits, follows and new or deleted
+posts. Like/comment counts and the viewer's own state are added per
+request with a fixed number of queries.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from core.db_routers import read_from_primary
+from posts.fast import POST_VALUES, add_post_stats, post_dicts
+from posts.models import Post
+from .hydration import followed_by, hydrate_users
+from .serializers import UserSerializer
+
+
+def cache_key(user_id):
+    return f"profile-page:{user_id}"
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def _build(user, request):
+    profile = dict(UserSerializer(hydrate_users([user])[0], context={'request': request}).data)
+    del profile['is_following']
+    posts = Post.objects.filter(author_id=user.id).order_by('-created_at', '-id')
+    return {
+        'user': profile,
+        'posts_count': posts.count(),
+        'posts': post_dicts(list(posts.values(*POST_VALUES)[:settings.PROFILE_PAGE_POSTS]), request),
+    }
+
+
+def viewer_independent(user, request):
+    key = cache_key(user.id)
+    page = cache.get(key)
+    if page is None:
+        # Every viewer (the author included) gets this copy, so never build it from a lagging replica
+        with read_from_primary():
+            page = _build(user, request)
+        cache.set(key, page, timeout=settings.PROFILE_PAGE_CACHE_TTL)
+    return page
+
+
+def render(user, request):
+    page = viewer_independent(user, request)
+    return {
+        'user': {**page['user'], 'is_following': user.id in followed_by(request.user, [user.id])},
+        'posts_count': page['posts_count'],
+        'posts': add_post_stats(page['posts'], request.user),
+        'has_more_posts': page['posts_count'] > len(page['posts']),
+    }
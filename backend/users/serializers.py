@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from posts.models import Follow
+from uploads.models import ImageAsset
+from uploads.serializers import ImageAssetSerializer
 
 User = get_user_model()
 
@@ -11,8 +13,13 @@ class UserSerializer(serializers.ModelSerializer):
     
     # 2. Add this missing line for the 'get_is_following' method to work
     is_following = serializers.SerializerMethodField()
-    followers_count = serializers.IntegerField(source='followers.count', read_only=True)
-    following_count = serializers.IntegerField(source='following.count', read_only=True)
+    followers_count = serializers.SerializerMethodField()
+    following_count = serializers.SerializerMethodField()
+    # Uploaded profile picture: write its id, read back src/srcset/placeholder
+    profile_image_id = serializers.PrimaryKeyRelatedField(
+        source='profile_image', queryset=ImageAsset.objects.all(), write_only=True, required=False, allow_null=True
+    )
+    profile_media = ImageAssetSerializer(source='profile_image', read_only=True)
 
     class Meta:
         model = User
@@ -26,7 +33,9 @@ class UserSerializer(serializers.ModelSerializer):
             'bio', 
             'is_following', 
             'followers_count', # <--- Make sure this is here
-            'following_count'  # <--- Make sure this is here
+            'following_count', # <--- Make sure this is here
+            'profile_image_id',
+            'profile_media'
         ]
         read_only_fields = ['email', 'is_following', 'followers_count', 'following_count']
 
@@ -40,15 +49,52 @@ class UserSerializer(serializers.ModelSerializer):
         )
         return user
     
+    def validate_profile_image_id(self, image):
+        request = self.context.get('request')
+        if image is not None and request and image.owner_id != request.user.id:
+            raise serializers.ValidationError("You can only use your own uploads.")
+        return image
+
+    def update(self, instance, validated_data):
+        image = validated_data.get('profile_image')
+        if image is not None and 'profile_pic' not in validated_data:
+            validated_data['profile_pic'] = ImageAssetSerializer(image, context=self.context).data['src']
+        return super().update(instance, validated_data)
+
+    # Values precomputed by users.hydration.hydrate_users win over per-row queries
+    def get_followers_count(self, obj):
+        stats = getattr(obj, '_stats', None)
+        return stats['followers_count'] if stats else obj.followers.count()
+
+    def get_following_count(self, obj):
+        stats = getattr(obj, '_stats', None)
+        return stats['following_count'] if stats else obj.following.count()
+
     def get_is_following(self, obj):
+        stats = getattr(obj, '_stats', None)
+        if stats:
+            return stats['is_following']
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Follow.objects.filter(follower=request.user, following=obj).exists()
         return False
 
+class FollowUserSerializer(serializers.ModelSerializer):
+    """Compact row for follower/following lists; is_following is resolved per page by the view."""
+    profile_media = ImageAssetSerializer(source='profile_image', read_only=True)
+    is_following = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'full_name', 'profile_pic', 'profile_media', 'is_following']
+
+    def get_is_following(self, obj):
+        return obj.id in self.context.get('followed_ids', ())
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         data = super().validate(attrs)
+        data['id'] = self.user.id
         data['full_name'] = self.user.full_name
         data['email'] = self.user.email
         return data
\ No newline at end of file
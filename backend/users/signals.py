@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from posts.models import Follow, Post
+from uploads.models import ImageAsset
+from . import profile_page
+from .cache import user_cache
+from .models import User
+
+# Drop cached rows on every write. The on_commit pass catches readers that
+# re-filled the cache from the old row before the transaction committed.
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+    transaction.on_commit(lambda: user_cache.invalidate(instance.pk))
+
+
+def _drop_profile_pages(*user_ids):
+    for user_id in user_ids:
+        profile_page.invalidate(user_id)
+    transaction.on_commit(lambda: [profile_page.invalidate(user_id) for user_id in user_ids])
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_profile_page(sender, instance, **kwargs):
+    _drop_profile_pages(instance.pk)
+
+
+# Post count and first page of posts (new, soft-deleted or purged posts)
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_author_profile_page(sender, instance, **kwargs):
+    _drop_profile_pages(instance.author_id)
+
+
+# Follower/following counters on both profiles
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_follow_profile_pages(sender, instance, **kwargs):
+    _drop_profile_pages(instance.follower_id, instance.following_id)
+
+
+# Profile picture or post image replaced, reprocessed or deleted
+@receiver([post_save, post_delete], sender=ImageAsset)
+def invalidate_image_owner_profile_page(sender, instance, **kwargs):
+    _drop_profile_pages(instance.owner_id)
@@ -1,3 +1,154 @@
-from django.test import TestCase
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from posts.models import Follow, Post
+from uploads import tasks
+from uploads.models import ImageAsset
+from . import passwords, profile_page
+from .models import User
+
+
+class FollowListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.star = User.objects.create_user(email='star@example.com', password='pw', full_name='Star')
+        self.viewer = User.objects.create_user(email='viewer@example.com', password='pw', full_name='Viewer')
+        self.fans = [User.objects.create_user(email=f'fan{i}@example.com', password='pw', full_name=f'Fan {i}')
+                     for i in range(25)]
+        Follow.objects.bulk_create(Follow(follower=fan, following=self.star) for fan in self.fans)
+        Follow.objects.create(follower=self.viewer, following=self.fans[-1])
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_followers_page_newest_first_with_viewer_follow_state(self):
+        first = self.client.get(f'/api/users/{self.star.id}/followers/').json()
+        self.assertEqual([row['id'] for row in first['results']], [fan.id for fan in reversed(self.fans)][:20])
+        self.assertEqual([row['is_following'] for row in first['results'][:2]], [True, False])
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], [fan.id for fan in reversed(self.fans)][20:])
+        self.assertIsNone(second['next'])
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.client.get(f'/api/users/{self.star.id}/followers/?page_size=1')  # warm the user cache
+        with self.assertNumQueries(2):
+            small = self.client.get(f'/api/users/{self.star.id}/followers/?page_size=2')
+        with self.assertNumQueries(2):
+            large = self.client.get(f'/api/users/{self.star.id}/followers/?page_size=25')
+        self.assertEqual((len(small.json()['results']), len(large.json()['results'])), (2, 25))
+
+    def test_following_list_and_unknown_user(self):
+        response = self.client.get(f'/api/users/{self.viewer.id}/following/')
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.fans[-1].id])
+        self.assertEqual(self.client.get('/api/users/999999/following/').status_code, 404)
+
+
+class ProfilePageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='owner@example.com', password='pw', full_name='Owner')
+        self.viewer = User.objects.create_user(email='viewer@example.com', password='pw', full_name='Viewer')
+        self.posts = [Post.objects.create(author=self.owner, caption=f'p{i}') for i in range(3)]
+        self.posts[0].liked_by.add(self.viewer)
+        Follow.objects.create(follower=self.viewer, following=self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        self.url = f'/api/users/{self.owner.id}/profile-page/'
+
+    def test_one_response_with_counters_follow_state_and_posts(self):
+        page = self.client.get(self.url).json()
+        self.assertEqual((page['user']['full_name'], page['user']['followers_count']), ('Owner', 1))
+        self.assertTrue(page['user']['is_following'])
+        self.assertEqual([post['caption'] for post in page['posts']], ['p2', 'p1', 'p0'])
+        self.assertEqual((page['posts'][2]['likes_count'], page['posts'][2]['is_liked']), (1, True))
+        self.assertEqual((page['posts_count'], page['has_more_posts']), (3, False))
+
+    def test_viewer_independent_part_is_cached(self):
+        self.client.get(self.url)
+        # followed_by + likes, comments, liked, saved for the posts; nothing per profile
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        # Another viewer shares the cached part but gets their own state
+        self.client.force_authenticate(self.owner)
+        self.assertFalse(self.client.get(self.url).json()['user']['is_following'])
+
+    def test_profile_edits_new_posts_and_follows_invalidate(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(self.owner)
+        self.client.patch('/api/users/profile/', {'bio': 'new bio'})
+        self.client.post('/api/posts/posts/', {'caption': 'fresh'})
+        Follow.objects.filter(follower=self.viewer).delete()
+        page = self.client.get(self.url).json()
+        self.assertEqual((page['user']['bio'], page['user']['followers_count']), ('new bio', 0))
+        self.assertEqual((page['posts_count'], page['posts'][0]['caption']), (4, 'fresh'))
+
+
+    def test_image_processing_invalidates(self):
+        asset = ImageAsset.objects.create(owner=self.owner, original='images/originals/a.jpg')
+        Post.all_objects.filter(pk=self.posts[2].pk).update(image=asset)
+        profile_page.invalidate(self.owner.id)
+        self.assertEqual(self.client.get(self.url).json()['posts'][0]['media']['status'], 'pending')
+        tasks._save_result(asset.id, lambda: {'width': 640, 'height': 480})
+        media = self.client.get(self.url).json()['posts'][0]['media']
+        self.assertEqual((media['status'], media['width']), ('ready', 640))
+
+
+class PasswordPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 0, 'TIMEOUT': 10})
+    def test_signup_caches_only_the_hash(self):
+        with mock.patch('users.views.send_otp_email') as send:
+            response = self.client.post('/api/users/register/', {
+                'email': 'new@example.com', 'password': 's3cret-pass', 'full_name': 'New'})
+        self.assertEqual(response.status_code, 200)
+        pending = cache.get('signup_data_new@example.com')
+        self.assertNotIn('s3cret-pass', repr(pending))
+        self.assertTrue(check_password('s3cret-pass', pending['password_hash']))
+        send.assert_called_once_with('new@example.com', pending['otp'])
+
+        self.client.post('/api/users/verify-otp/', {'email': 'new@example.com', 'otp': pending['otp']})
+        self.assertEqual(User.objects.get(email='new@example.com').password, pending['password_hash'])
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 1, 'TIMEOUT': 30})
+    def test_signup_entry_exists_once_the_pooled_hash_returns(self):
+        with mock.patch('users.views.send_otp_email') as send:
+            response = self.client.post('/api/users/register/', {
+                'email': 'pooled@example.com', 'password': 's3cret-pass', 'full_name': 'Pooled'})
+        self.assertEqual(response.status_code, 200)
+        pending = cache.get('signup_data_pooled@example.com')
+        self.assertTrue(check_password('s3cret-pass', pending['password_hash']))
+        send.assert_called_once_with('pooled@example.com', pending['otp'])
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 1, 'TIMEOUT': 30})
+    def test_signup_reports_a_failed_hash(self):
+        broken = Future()
+        broken.set_exception(BrokenProcessPool('worker died'))
+        with mock.patch.object(passwords, '_pool') as pool, mock.patch('users.views.send_otp_email') as send, \
+                self.assertLogs('users.views', 'ERROR'):
+            pool.return_value.submit.return_value = broken
+            response = self.client.post('/api/users/register/', {
+                'email': 'new@example.com', 'password': 's3cret-pass', 'full_name': 'New'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIsNone(cache.get('signup_data_new@example.com'))
+        send.assert_not_called()
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 1, 'TIMEOUT': 30})
+    def test_login_verifies_in_the_process_pool(self):
+        user = User.objects.create_user(email='pool@example.com', password_hash=passwords.make_password('pw-12345'),
+                                        full_name='Pool')
+        ok = self.client.post('/api/users/login/', {'email': 'pool@example.com', 'password': 'pw-12345'})
+        self.assertEqual((ok.status_code, ok.json()['id']), (200, user.id))
+        wrong = self.client.post('/api/users/login/', {'email': 'pool@example.com', 'password': 'nope'})
+        self.assertEqual(wrong.status_code, 401)
+        unknown = self.client.post('/api/users/login/', {'email': 'ghost@example.com', 'password': 'pw-12345'})
+        self.assertEqual(unknown.status_code, 401)
@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import RegisterView, UserProfileView, VerifyOTPView, CustomTokenObtainPairView, FindPeopleView, UserDetailView
+from .views import RegisterView, UserProfileView, VerifyOTPView, CustomTokenObtainPairView, FindPeopleView, UserDetailView, UserBatchView, FollowListView, ProfilePageView, user_detail_async
+from core.asyncapi import async_reads
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
@@ -9,5 +10,9 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('find-people/', FindPeopleView.as_view(), name='find-people'), # <--- New List
-    path('profile/<int:id>/', UserDetailView.as_view(), name='user-detail'), # <--- NEW
+    path('profile/<int:id>/', async_reads(user_detail_async, UserDetailView.as_view()), name='user-detail'), # <--- NEW
+    path('batch/', UserBatchView.as_view(), name='user-batch'),
+    path('<int:id>/followers/', FollowListView.as_view(side='follower'), name='user-followers'),
+    path('<int:id>/following/', FollowListView.as_view(side='following'), name='user-following'),
+    path('<int:id>/profile-page/', ProfilePageView.as_view(), name='user-profile-page'),
 ]
\ No newline at end of file
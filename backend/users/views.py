@@ -2,20 +2,35 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import generics
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.generics import RetrieveUpdateAPIView, RetrieveAPIView
+from rest_framework.generics import RetrieveUpdateDestroyAPIView, RetrieveAPIView
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.conf import settings
+from django.http import Http404
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .serializers import CustomTokenObtainPairSerializer, UserSerializer
+from .serializers import CustomTokenObtainPairSerializer, FollowUserSerializer, UserSerializer
+from .cache import user_cache
+from .hydration import ahydrate_users, followed_by, hydrate_users
+from .pagination import FollowCursorPagination
+from . import passwords, profile_page
+from posts.models import Follow
+from core.params import parse_id_list
+from core.asyncapi import async_api_view
+from core.db_routers import ReplicaReadMixin
+from core.deletion import soft_delete_user
 from .email_service import send_otp_email
+import logging
 import random
 import threading
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    rate_limit_scope = 'register'
 
     def post(self, request):
         email = request.data.get('email')
@@ -30,32 +45,33 @@ class RegisterView(APIView):
 
         otp = str(random.randint(100000, 999999))
 
+        try:
+            # PBKDF2 runs in the password pool; this thread only waits for the result
+            password_hash = passwords.make_password(password)
+        except Exception:
+            logger.exception("Password hashing failed for a registration")
+            return Response({'error': 'Registration failed, please try again'}, status=503)
+
+        # Only the hash is cached. The OTP goes out once the entry exists.
         user_data = {
             'email': email,
-            'password': password,
+            'password_hash': password_hash,
             'full_name': full_name,
             'profile_pic': None,
             'otp': otp
         }
-
         cache.set(f'signup_data_{email}', user_data, timeout=600)
-
-        try:
-            # Send email in background thread (non-blocking)
-            threading.Thread(
-                target=send_otp_email,
-                args=(email, otp)
-            ).start()
-
-            return Response({'message': 'OTP sent to email'}, status=200)
-
-        except Exception as e:
-            cache.delete(f'signup_data_{email}')
-            return Response({'error': f'Email failed: {str(e)}'}, status=500)
+        # Send email in background thread (non-blocking)
+        threading.Thread(
+            target=send_otp_email,
+            args=(email, otp)
+        ).start()
+        return Response({'message': 'OTP sent to email'}, status=200)
 
 
 class VerifyOTPView(APIView):
     permission_classes = [AllowAny]
+    rate_limit_scope = 'register'
 
     def post(self, request):
         email = request.data.get('email')
@@ -70,7 +86,7 @@ class VerifyOTPView(APIView):
             try:
                 User.objects.create_user(
                     email=cached_data['email'],
-                    password=cached_data['password'],
+                    password_hash=cached_data['password_hash'],
                     full_name=cached_data['full_name'],
                     profile_pic=cached_data['profile_pic'],
                     is_active=True
@@ -85,28 +101,110 @@ class VerifyOTPView(APIView):
         return Response({'error': 'Invalid OTP'}, status=400)
 
 
-class FindPeopleView(generics.ListAPIView):
+class FindPeopleView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return User.objects.exclude(id=self.request.user.id)
+        return (User.objects.exclude(id=self.request.user.id).filter(deleted_at__isnull=True)
+                .select_related('profile_image'))
 
 
-class UserProfileView(RetrieveUpdateAPIView):
+class UserProfileView(RetrieveUpdateDestroyAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
         return self.request.user
 
+    def perform_destroy(self, instance):
+        # Deactivated and hidden now; everything the account owns is purged in the background
+        soft_delete_user(instance)
+
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class UserDetailView(RetrieveAPIView):
+class UserDetailView(ReplicaReadMixin, RetrieveAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'id'
+
+    def get_object(self):
+        # Served from the two-tier object cache instead of a query per request
+        user = user_cache.get(self.kwargs['id'])
+        if user is None or user.deleted_at is not None:
+            raise Http404
+        self.check_object_permissions(self.request, user)
+        return user
+
+
+@async_api_view([IsAuthenticated])
+async def user_detail_async(request, id):
+    # Async GET for UserDetailView
+    user = await user_cache.aget(id)
+    if user is None or user.deleted_at is not None:
+        raise Http404
+    await ahydrate_users([user], request.user)
+    return UserSerializer(user, context={'request': request}).data
+
+
+class UserBatchView(APIView):
+    """
+    GET ?ids=3,1,2 -> up to BATCH_MAX_IDS users in the requested order, via the
+    object cache and a fixed number of queries. Unknown ids are listed in "missing".
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        ids = parse_id_list(request, limit=settings.BATCH_MAX_IDS)
+        found = {pk: user for pk, user in user_cache.get_many(ids).items() if user.deleted_at is None}
+        users = hydrate_users([found[pk] for pk in ids if pk in found], request.user)
+        serializer = UserSerializer(users, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in found],
+        })
+
+
+class FollowListView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    GET /api/users/<id>/followers/ and /following/: newest first, cursor-paginated
+    on Follow.id. Users come in via select_related and is_following is one query per page.
+    """
+    serializer_class = FollowUserSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = FollowCursorPagination
+    # 'follower' lists who follows <id>; 'following' lists whom <id> follows
+    side = None
+
+    def get_queryset(self):
+        user = user_cache.get(self.kwargs['id'])
+        if user is None or user.deleted_at is not None:
+            raise Http404
+        lookup = 'following_id' if self.side == 'follower' else 'follower_id'
+        return (Follow.objects.filter(**{lookup: user.id, f'{self.side}__deleted_at__isnull': True})
+                .select_related(f'{self.side}__profile_image'))
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        users = [getattr(follow, self.side) for follow in page]
+        context = self.get_serializer_context()
+        context['followed_ids'] = followed_by(request.user, [user.id for user in users])
+        return self.get_paginated_response(FollowUserSerializer(users, many=True, context=context).data)
+
+
+class ProfilePageView(ReplicaReadMixin, APIView):
+    """
+    GET /api/users/<id>/profile-page/: user, counters, viewer follow state and
+    the first page of their posts. See users/profile_page.py for the caching.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        user = user_cache.get(id)
+        if user is None or user.deleted_at is not None:
+            raise Http404
+        return Response(profile_page.render(user, request))
@@ -12,6 +12,7 @@ import {
   VolumeX,
   Loader2 // Imported Loader icon
 } from 'lucide-react';
+import { reportImpression } from '../impressions';
 
 const PostCard = ({ post, user }) => {
   // --- STATE ---
@@ -24,6 +25,8 @@ const PostCard = ({ post, user }) => {
   // Comment State
   const [showComments, setShowComments] = useState(false);
   const [comments, setComments] = useState([]);
+  const [commentsNext, setCommentsNext] = useState(null); // cursor URL of the next (older) page
+  const [isLoadingComments, setIsLoadingComments] = useState(false);
   const [newComment, setNewComment] = useState('');
   const [commentCount, setCommentCount] = useState(post.comment_count || 0);
   const [isPostingComment, setIsPostingComment] = useState(false);
@@ -31,6 +34,7 @@ const PostCard = ({ post, user }) => {
   // Video State
   const [isMuted, setIsMuted] = useState(true);
   const videoRef = useRef(null);
+  const cardRef = useRef(null);
 
   // Constants
   const API_URL = 'https://connectly-socialmedia-production.up.railway.app';
@@ -94,7 +98,9 @@ const PostCard = ({ post, user }) => {
             const token = localStorage.getItem('access_token');
             const headers = token ? { Authorization: `Bearer ${token}` } : {};
             const res = await axios.get(`${API_URL}/api/posts/${post.id}/comments/`, { headers });
-            setComments(res.data);
+            // Comments are cursor-paginated: { next, previous, results }
+            setComments(Array.isArray(res.data) ? res.data : (res.data.results || []));
+            setCommentsNext(res.data.next || null);
         } catch (err) {
             console.error("Failed to load comments", err);
         }
@@ -102,6 +108,25 @@ const PostCard = ({ post, user }) => {
     setShowComments(!showComments);
   };
 
+  const loadOlderComments = async () => {
+    if (!commentsNext || isLoadingComments) return;
+    setIsLoadingComments(true);
+    try {
+        const token = localStorage.getItem('access_token');
+        const headers = token ? { Authorization: `Bearer ${token}` } : {};
+        const res = await axios.get(commentsNext, { headers });
+        setComments(prev => {
+            const seen = new Set(prev.map(c => c.id));
+            return [...prev, ...res.data.results.filter(c => !seen.has(c.id))];
+        });
+        setCommentsNext(res.data.next || null);
+    } catch (err) {
+        console.error("Failed to load comments", err);
+    } finally {
+        setIsLoadingComments(false);
+    }
+  };
+
   const handlePostComment = async (e) => {
     e.preventDefault();
     if (!newComment.trim() || !user) return;
@@ -145,6 +170,22 @@ const PostCard = ({ post, user }) => {
     return () => observer.disconnect();
   }, [isVideo]);
 
+  // --- IMPRESSION (once, when half the card has been on screen) ---
+  useEffect(() => {
+    if (!user || !cardRef.current) return;
+    const observer = new IntersectionObserver(
+      ([entry]) => {
+        if (entry.isIntersecting) {
+          reportImpression(post.id);
+          observer.disconnect();
+        }
+      },
+      { threshold: 0.5 }
+    );
+    observer.observe(cardRef.current);
+    return () => observer.disconnect();
+  }, [post.id, user]);
+
   const toggleMute = (e) => {
     e?.stopPropagation();
     if (videoRef.current) {
@@ -164,7 +205,7 @@ const PostCard = ({ post, user }) => {
         .custom-scrollbar::-webkit-scrollbar-thumb { background: #cbd5e1; border-radius: 10px; }
       `}</style>
 
-      <div className="bg-white/90 backdrop-blur-sm rounded-3xl shadow-sm border border-gray-100 overflow-hidden mb-6 transition-all duration-300 hover:shadow-md">
+      <div ref={cardRef} className="bg-white/90 backdrop-blur-sm rounded-3xl shadow-sm border border-gray-100 overflow-hidden mb-6 transition-all duration-300 hover:shadow-md">
         
         {/* HEADER */}
         <div className="p-4 flex items-center justify-between">
@@ -263,6 +304,9 @@ const PostCard = ({ post, user }) => {
           {/* Like Count */}
           <div className="font-bold text-sm text-gray-900 mb-2">
              {likes > 0 ? `${likes} likes` : 'Be the first to like this'}
+             {post.view_count > 0 && (
+               <span className="font-normal text-gray-500"> · {post.view_count} views</span>
+             )}
           </div>
 
           {/* View Comments Link */}
@@ -324,6 +368,15 @@ const PostCard = ({ post, user }) => {
                       </div>
                     ))
                 )}
+                {commentsNext && (
+                    <button
+                      onClick={loadOlderComments}
+                      disabled={isLoadingComments}
+                      className="text-xs font-semibold text-gray-500 hover:text-gray-800 disabled:opacity-50"
+                    >
+                      {isLoadingComments ? 'Loading...' : 'Load older comments'}
+                    </button>
+                )}
               </div>
             </div>
           )}
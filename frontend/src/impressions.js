@@ -0,0 +1,36 @@
+// Batches "post was on screen" reports for the impressions endpoint.
+// One request every few seconds instead of one per post; whatever is left
+// goes out when the page is hidden (keepalive lets it outlive the tab).
+const API_URL = 'https://connectly-socialmedia-production.up.railway.app';
+const FLUSH_MS = 5000;
+const MAX_IDS = 100;
+
+let queued = new Set();
+let timer = null;
+
+const flush = () => {
+  clearTimeout(timer);
+  timer = null;
+  const token = localStorage.getItem('access_token');
+  if (!queued.size || !token) return;
+  const ids = [...queued];
+  queued = new Set();
+  for (let i = 0; i < ids.length; i += MAX_IDS) {
+    fetch(`${API_URL}/api/posts/posts/impressions/`, {
+      method: 'POST',
+      keepalive: true,
+      headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+      body: JSON.stringify({ ids: ids.slice(i, i + MAX_IDS) }),
+    }).catch(() => {}); // best effort: a lost batch only undercounts
+  }
+};
+
+export const reportImpression = (postId) => {
+  queued.add(postId);
+  if (!timer) timer = setTimeout(flush, FLUSH_MS);
+};
+
+window.addEventListener('pagehide', flush);
+document.addEventListener('visibilitychange', () => {
+  if (document.visibilityState === 'hidden') flush();
+});
@@ -94,6 +94,7 @@ const Chat = () => {
   const messageEndRef    = useRef(null);
   const typingTimeoutRef = useRef(null);
   const inputRef         = useRef(null);
+  const lastMessageIdRef = useRef(0);
 
   // ── 1. Init: Load User & Contact List ──────────────────────
   useEffect(() => {
@@ -113,6 +114,16 @@ const Chat = () => {
         
         const userList = Array.isArray(res.data) ? res.data : (res.data.results || []);
         setUsers(userList);
+
+        // Who is online right now, in one request for the whole list
+        if (userList.length) {
+          const ids = userList.slice(0, 300).map((u) => u.id).join(',');
+          const presence = await axios.get(
+            `${API_BASE_URL}/api/chat/presence/?ids=${ids}`,
+            { headers: { Authorization: `Bearer ${token}` } }
+          );
+          setOnlineUsers(new Set(presence.data.results.filter((p) => p.online).map((p) => p.user_id)));
+        }
       } catch (err) {
         console.error('Failed to load users:', err);
         setUsers([]); 
@@ -139,6 +150,7 @@ const Chat = () => {
         );
         const msgList = Array.isArray(res.data) ? res.data : (res.data.results || []);
         setMessages(msgList);
+        rememberIds(msgList);
         setUnreadCounts((p) => ({ ...p, [activeUser.id]: 0 }));
       } catch (err) {
         console.error('Failed to fetch history:', err);
@@ -148,99 +160,135 @@ const Chat = () => {
         scrollToBottom();
       }
     };
+    const rememberIds = (list) => {
+      list.forEach((m) => {
+        if (m.id && m.id > lastMessageIdRef.current) lastMessageIdRef.current = m.id;
+      });
+    };
+
+    lastMessageIdRef.current = 0;
     fetchHistory();
 
     // WebSocket Connection
     if (socketRef.current) socketRef.current.close();
 
-    const ws = new WebSocket(
-      `${WS_BASE_URL}/ws/chat/${activeUser.id}/?token=${token}`
-    );
-    socketRef.current = ws;
-
-    ws.onopen = () => {
-      setIsConnected(true);
-      ws.send(JSON.stringify({ type: 'presence', status: 'online' }));
-    };
-    ws.onclose = () => setIsConnected(false);
-    ws.onerror = () => setIsConnected(false);
-
-    ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      switch (data.type) {
-        case 'message':
-          // OPTIMISTIC MERGE:
-          // If message is from ME, find the pending one and update it to 'delivered'
-          if (data.sender_id === currentUser.id) {
-             setMessages((prev) => {
-                // Try to find a message that is 'sending' and has same content
-                const pendingIndex = prev.findIndex(m => m.status === 'sending' && m.content === data.message);
+    let closedByUs = false;
+    let reconnectTimer = null;
+
+    const openSocket = () => {
+      // On reconnect the server replays everything after last_message_id
+      const resume = lastMessageIdRef.current ? `&last_message_id=${lastMessageIdRef.current}` : '';
+      const ws = new WebSocket(
+        `${WS_BASE_URL}/ws/chat/${activeUser.id}/?token=${token}${resume}`
+      );
+      socketRef.current = ws;
+
+      let heartbeat = null;
+      ws.onopen = () => {
+        setIsConnected(true);
+        // Batched online/offline updates for everyone in the sidebar
+        ws.send(JSON.stringify({ type: 'presence_subscribe', ids: users.map((u) => u.id) }));
+        heartbeat = setInterval(() => ws.send(JSON.stringify({ type: 'heartbeat' })), 25000);
+      };
+      ws.onclose = () => {
+        clearInterval(heartbeat);
+        setIsConnected(false);
+        if (!closedByUs) reconnectTimer = setTimeout(openSocket, 2000);
+      };
+      ws.onerror = () => setIsConnected(false);
+
+      ws.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        switch (data.type) {
+          case 'history':
+            rememberIds(data.messages);
+            setMessages((prev) => {
+              const known = new Set(prev.map((m) => m.id));
+              return [...prev, ...data.messages.filter((m) => !known.has(m.id))];
+            });
+            // Too far behind to replay over the socket: reload the page of history
+            if (data.final && data.truncated) fetchHistory();
+            scrollToBottom();
+            break;
+
+          case 'message':
+            rememberIds([data]);
+            // OPTIMISTIC MERGE:
+            // If message is from ME, find the pending one and update it to 'delivered'
+            if (data.sender_id === currentUser.id) {
+               setMessages((prev) => {
+                  // Try to find a message that is 'sending' and has same content
+                  const pendingIndex = prev.findIndex(m => m.status === 'sending' && m.content === data.message);
                 
-                if (pendingIndex !== -1) {
-                   const newArr = [...prev];
-                   newArr[pendingIndex] = { ...newArr[pendingIndex], status: 'delivered', timestamp: new Date().toISOString() };
-                   return newArr;
-                }
-                // If not found (rare), just append
-                return [...prev, {
-                   sender: data.sender_id,
-                   content: data.message,
-                   timestamp: new Date().toISOString(),
-                   status: 'delivered'
-                }];
-             });
-          } else {
-             // Message from OTHER user
-             setMessages((p) => [...p, {
-               sender:    data.sender_id,
-               content:   data.message,
-               timestamp: new Date().toISOString(),
-               status:    'delivered',
-             }]);
+                  if (pendingIndex !== -1) {
+                     const newArr = [...prev];
+                     newArr[pendingIndex] = { ...newArr[pendingIndex], id: data.id, status: 'delivered', timestamp: new Date().toISOString() };
+                     return newArr;
+                  }
+                  // If not found (rare), just append
+                  return [...prev, {
+                     id: data.id,
+                     sender: data.sender_id,
+                     content: data.message,
+                     timestamp: new Date().toISOString(),
+                     status: 'delivered'
+                  }];
+               });
+            } else {
+               // Message from OTHER user
+               setMessages((p) => [...p, {
+                 id:        data.id,
+                 sender:    data.sender_id,
+                 content:   data.message,
+                 timestamp: new Date().toISOString(),
+                 status:    'delivered',
+               }]);
              
-             if (data.sender_id !== activeUser.id) {
-               setUnreadCounts((p) => ({
-                 ...p,
-                 [data.sender_id]: (p[data.sender_id] || 0) + 1,
-               }));
-             }
-          }
-          scrollToBottom();
-          break;
-
-        case 'typing':
-          if (data.user_id !== currentUser.id) {
-            setTypingUsers((p) => new Set(p).add(data.user_id));
-            setTimeout(() => {
-              setTypingUsers((p) => { const n = new Set(p); n.delete(data.user_id); return n; });
-            }, 3000);
-          }
-          break;
-
-        case 'presence':
-          if (data.status === 'online') {
-            setOnlineUsers((p) => new Set(p).add(data.user_id));
-          } else {
-            setOnlineUsers((p) => { const n = new Set(p); n.delete(data.user_id); return n; });
-          }
-          break;
-
-        case 'read':
-          setMessages((p) =>
-            p.map((m) => m.sender === currentUser.id ? { ...m, status: 'read' } : m)
-          );
-          break;
-
-        default:
-          break;
-      }
+               if (data.sender_id !== activeUser.id) {
+                 setUnreadCounts((p) => ({
+                   ...p,
+                   [data.sender_id]: (p[data.sender_id] || 0) + 1,
+                 }));
+               }
+            }
+            scrollToBottom();
+            break;
+
+          case 'typing':
+            if (data.user_id !== currentUser.id) {
+              setTypingUsers((p) => new Set(p).add(data.user_id));
+              setTimeout(() => {
+                setTypingUsers((p) => { const n = new Set(p); n.delete(data.user_id); return n; });
+              }, 3000);
+            }
+            break;
+
+          case 'presence':
+            setOnlineUsers((p) => {
+              const n = new Set(p);
+              data.changes.forEach((c) => (c.online ? n.add(c.user_id) : n.delete(c.user_id)));
+              return n;
+            });
+            break;
+
+          case 'read':
+            setMessages((p) =>
+              p.map((m) => m.sender === currentUser.id ? { ...m, status: 'read' } : m)
+            );
+            break;
+
+          default:
+            break;
+        }
+      };
     };
+    openSocket();
 
     return () => {
-      if (ws.readyState === WebSocket.OPEN) {
-        ws.send(JSON.stringify({ type: 'presence', status: 'offline' }));
-        ws.close();
-      }
+      closedByUs = true;
+      clearTimeout(reconnectTimer);
+      const ws = socketRef.current;
+      if (ws && ws.readyState === WebSocket.OPEN) ws.close();
     };
   }, [activeUser, currentUser]);
 
@@ -29,6 +29,7 @@ const Login = () => {
       // 2. Save User Info
       // Ensure we handle cases where backend might send different field names
       const userData = {
+        id: res.data.id,
         full_name: res.data.full_name || "User",
         email: res.data.email || formData.email,
         // Add profile_pic if your login endpoint returns it, otherwise Home fetches it
@@ -12,6 +12,8 @@ const Profile = () => {
   
   const [profileUser, setProfileUser] = useState(null);
   const [posts, setPosts] = useState([]);
+  const [hasMorePosts, setHasMorePosts] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [isMyProfile, setIsMyProfile] = useState(false);
   const [isFollowing, setIsFollowing] = useState(false);
   
@@ -35,51 +37,26 @@ const Profile = () => {
       setIsMyProfile(isMe);
 
       try {
-        let endpoint = isMe 
-          ? 'https://connectly-socialmedia-production.up.railway.app/api/users/profile/' 
-          : `https://connectly-socialmedia-production.up.railway.app/api/users/${id}/`; // You might need to create this endpoint if it doesn't exist, see note below*
-
-        // *Quick Fix for now: Use the 'find-people' list to get data if standard endpoint fails, 
-        // OR better: Update backend to allow fetching specific user.
-        // For now, let's assume we fetch "My Profile" standardly, but for others we might need a specific view.
-        
-        // ACTUALLY: Let's use the standard "Get User" logic. 
-        // If the backend doesn't have a specific "Get User by ID" view yet, we can filter locally or add it.
-        // Let's try the cleanest approach: Re-using the profile view if it's me.
-        
-        if (isMe) {
-            const res = await axios.get('https://connectly-socialmedia-production.up.railway.app/api/users/profile/', {
-                headers: { Authorization: `Bearer ${token}` }
-            });
-            setProfileUser(res.data);
-            setNewName(res.data.full_name);
-            setNewBio(res.data.bio || '');
-        } else {
-            // Fetch "Other" user. 
-            // NOTE: We need to ensure we have an endpoint for this. 
-            // If not, we can use the "Find People" endpoint and filter (temporary) or build a DetailView (proper).
-            // Let's assume we build the proper view in Step 2.
-            const res = await axios.get(`https://connectly-socialmedia-production.up.railway.app/api/users/profile/${id}/`, {
+        // One request: user, counters, follow state and the first page of posts
+        let userId = isMe ? currentUser?.id : id;
+        if (!userId) {
+            // Sessions from before the login response carried the id
+            const me = await axios.get('https://connectly-socialmedia-production.up.railway.app/api/users/profile/', {
                 headers: { Authorization: `Bearer ${token}` }
             });
-            setProfileUser(res.data);
-            setIsFollowing(res.data.is_following);
+            userId = me.data.id;
         }
-
-        // Fetch Posts
-        const postRes = await axios.get('https://connectly-socialmedia-production.up.railway.app/api/posts/', {
+        const res = await axios.get(`https://connectly-socialmedia-production.up.railway.app/api/users/${userId}/profile-page/`, {
             headers: { Authorization: `Bearer ${token}` }
         });
-        
-        // Filter posts by this user's name (or ID if available in serializer)
-        // Note: Ideally filter by ID. For now filtering by Name as per previous code.
-        const userPosts = postRes.data.filter(p => {
-            // We need to match the post author to the profile user
-            // If we fetched the profile, use its name.
-            // If waiting for profile, this might be tricky.
-            return true; // We will filter inside the render or after profile loads
-        });
-        setPosts(postRes.data.filter(p => p.author === (isMe ? currentUser.id : parseInt(id))).reverse());
+        setProfileUser(res.data.user);
+        setIsFollowing(res.data.user.is_following);
+        setPosts(res.data.posts);
+        setHasMorePosts(res.data.has_more_posts);
+        if (isMe) {
+            setNewName(res.data.user.full_name);
+            setNewBio(res.data.user.bio || '');
+        }
 
       } catch (err) {
         console.error("Error loading profile", err);
@@ -89,6 +66,23 @@ const Profile = () => {
     fetchData();
   }, [id, navigate]);
 
+  // --- 1b. Rest of the posts (the profile page only embeds the first few) ---
+  const loadMorePosts = async () => {
+    setLoadingMore(true);
+    try {
+        const token = localStorage.getItem('access_token');
+        const res = await axios.get(`https://connectly-socialmedia-production.up.railway.app/api/posts/posts/?author=${profileUser.id}`, {
+            headers: { Authorization: `Bearer ${token}` }
+        });
+        setPosts(res.data);
+        setHasMorePosts(false);
+    } catch (err) {
+        console.error("Error loading posts", err);
+    } finally {
+        setLoadingMore(false);
+    }
+  };
+
   // --- 2. Follow / Unfollow ---
   const handleFollow = async () => {
     // Optimistic
@@ -241,6 +235,15 @@ const Profile = () => {
                 ))
             )}
         </div>
+        {hasMorePosts && (
+            <button
+                onClick={loadMorePosts}
+                disabled={loadingMore}
+                className="w-full py-3 rounded-full font-bold text-blue-600 bg-white shadow-sm hover:bg-blue-50 transition disabled:opacity-50"
+            >
+                {loadingMore ? 'Loading...' : 'Load more posts'}
+            </button>
+        )}
 
       </div>
     </div>